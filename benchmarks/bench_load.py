@@ -0,0 +1,139 @@
+"""Measure the polling throughput of TedFleet against simulated gateways.
+
+Run with `poetry run python benchmarks/bench_load.py --gateways 200`. The
+gateways are served by a separate process (see tedpy.simulator) so that they
+don't compete with the poller for the event loop. With `--workers N`, the
+gateways are polled by a ShardedFleet of N worker processes.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, List
+
+from tedpy import ShardedFleet, TedFleet
+from tedpy.simulator import start_gateways
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures"
+
+
+async def spawn_simulator(args: argparse.Namespace) -> "asyncio.subprocess.Process":
+    """Start the simulator process, returning once every gateway is listening."""
+    return await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "tedpy.simulator",
+        "--templates",
+        str(FIXTURES),
+        "--model",
+        args.model,
+        "--count",
+        str(args.gateways),
+        "--mtus",
+        str(args.mtus),
+        "--spyders",
+        str(args.spyders),
+        "--latency",
+        str(args.latency),
+        "--latency-jitter",
+        str(args.latency_jitter),
+        "--failure-rate",
+        str(args.failure_rate),
+        stdout=asyncio.subprocess.PIPE,
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Poll the simulated gateways for the requested duration and report."""
+    process = None
+    gateways = []
+    if args.in_process:
+        gateways = await start_gateways(
+            args.gateways,
+            templates=FIXTURES,
+            model=args.model,
+            mtus=args.mtus,
+            spyders=args.spyders,
+            latency=args.latency,
+            latency_jitter=args.latency_jitter,
+            failure_rate=args.failure_rate,
+        )
+        hosts = [gateway.address for gateway in gateways]
+    else:
+        process = await spawn_simulator(args)
+        assert process.stdout is not None
+        hosts = [
+            (await process.stdout.readline()).decode().strip()
+            for _ in range(args.gateways)
+        ]
+
+    latencies: List[float] = []
+    errors = 0
+    try:
+        if args.workers:
+            fleet: Any = ShardedFleet(hosts, args.workers, interval=args.interval)
+        else:
+            fleet = TedFleet(hosts, interval=args.interval)
+        async with fleet:
+            start = time.perf_counter()
+            deadline = start + args.duration
+            async for result in fleet:
+                if result.error is not None:
+                    errors += 1
+                else:
+                    latencies.append(result.latency)
+                if time.perf_counter() >= deadline:
+                    break
+            elapsed = time.perf_counter() - start
+    finally:
+        for gateway in gateways:
+            await gateway.close()
+        if process is not None:
+            process.terminate()
+            await process.wait()
+
+    polls = len(latencies) + errors
+    print("gateways:      {}".format(args.gateways))
+    print("polls:         {} ({:.1f}/s)".format(polls, polls / elapsed))
+    print("errors:        {}".format(errors))
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        print(
+            "latency (ms):  p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+                quantiles[49] * 1000,
+                quantiles[94] * 1000,
+                quantiles[98] * 1000,
+                max(latencies) * 1000,
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gateways", type=int, default=100)
+    parser.add_argument("--model", choices=["TED5000", "TED6000"], default="TED6000")
+    parser.add_argument("--mtus", type=int, default=3)
+    parser.add_argument("--spyders", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="poll from this many worker processes (see tedpy.sharding)",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="serve the gateways from the polling process",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
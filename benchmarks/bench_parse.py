@@ -0,0 +1,66 @@
+"""Compare the dedicated endpoint parsers against xmltodict.
+
+Run with `poetry run python benchmarks/bench_parse.py`.
+"""
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Tuple
+
+import xmltodict
+
+from tedpy import parsers
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures"
+
+CASES = [
+    ("ted5000/liveData.xml", parsers.parse_live_data),
+    ("ted6000/dashData_total.xml", parsers.parse_dash_data),
+    ("ted6000/systemOverview.xml", parsers.parse_system_overview),
+    ("ted6000/spyderData.xml", parsers.parse_spyder_data),
+]
+
+
+def measure(
+    parse: Callable[[str], Any], text: str, number: int
+) -> Tuple[float, int, int]:
+    """Return the mean time (in µs), peak and retained bytes of one parse."""
+    seconds = timeit.timeit(lambda: parse(text), number=number)
+    tracemalloc.start()
+    result = parse(text)  # noqa: F841 (kept alive to measure retained memory)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds / number * 1e6, peak, retained
+
+
+def main(number: int = 2000) -> None:
+    print(
+        "{:<28} {:>10} {:>10} {:>8} {:>19} {:>19}".format(
+            "document",
+            "xmltodict",
+            "tedpy",
+            "speedup",
+            "peak B (old/new)",
+            "retained B (old/new)",
+        )
+    )
+    for name, parse in CASES:
+        text = (FIXTURES / name).read_text()
+        base_time, base_peak, base_kept = measure(xmltodict.parse, text, number)
+        fast_time, fast_peak, fast_kept = measure(parse, text, number)
+        print(
+            "{:<28} {:>8.1f}µs {:>8.1f}µs {:>7.1f}x {:>9}/{:<9} {:>9}/{:<9}".format(
+                name,
+                base_time,
+                fast_time,
+                base_time / fast_time,
+                base_peak,
+                fast_peak,
+                base_kept,
+                fast_kept,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Benchmark startup, the parse, derive and full poll paths, writing JSON results.
+
+Run with `poetry run python benchmarks/bench_suite.py --output results.json`,
+and pass `--compare old.json` to print the change against an earlier run.
+Full polls are made against simulated gateways served over local sockets.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import xmltodict
+
+from tedpy import TED, TED5000, TED6000, MetricsExporter, parsers
+from tedpy.simulator import start_gateways
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures"
+
+# Imports timed in a new interpreter, as run by a short-lived script
+STARTUP_CASES = [
+    ("startup/python", "pass"),
+    ("startup/import", "import tedpy"),
+    ("startup/dataclasses", "from tedpy import EnergyYield, TedSnapshot"),
+    ("startup/TED6000", "from tedpy import TED6000"),
+    ("startup/createTED", "from tedpy import createTED"),
+]
+
+PARSE_CASES = [
+    ("ted5000/liveData.xml", parsers.parse_live_data),
+    ("ted5000/systemSettings.xml", xmltodict.parse),
+    ("ted6000/dashData_total.xml", parsers.parse_dash_data),
+    ("ted6000/systemOverview.xml", parsers.parse_system_overview),
+    ("ted6000/spyderData.xml", parsers.parse_spyder_data),
+    ("ted6000/systemSettings.xml", xmltodict.parse),
+]
+
+
+def _fixture(name: str) -> str:
+    return (FIXTURES / name).read_text()
+
+
+def measure(
+    name: str, func: Callable[[], Any], number: int, repeat: int = 5
+) -> Dict[str, Any]:
+    """Return the timings (in µs per call) and memory use of a function."""
+    times = [
+        t / number * 1e6 for t in timeit.repeat(func, number=number, repeat=repeat)
+    ]
+    tracemalloc.start()
+    result = func()  # noqa: F841 (kept alive to measure retained memory)
+    retained, peak = tracemalloc.get_traced_memory()
+    blocks = sum(
+        stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+    )
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "mean_us": statistics.mean(times),
+        "min_us": min(times),
+        "stdev_us": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "calls": number * repeat,
+        "peak_bytes": peak,
+        "retained_bytes": retained,
+        "retained_blocks": blocks,
+    }
+
+
+def offline_ted5000() -> TED5000:
+    """Return a TED5000 loaded with the fixtures, without any network access."""
+    ted = TED5000("127.0.0.1")
+    ted.endpoint_settings_results = xmltodict.parse(
+        _fixture("ted5000/systemSettings.xml")
+    )
+    ted.endpoint_data_results = parsers.parse_live_data(
+        _fixture("ted5000/liveData.xml")
+    )
+    ted._parse_mtus()
+    ted.snapshot = ted._build_snapshot()
+    return ted
+
+
+def offline_ted6000() -> TED6000:
+    """Return a TED6000 loaded with the fixtures, without any network access."""
+    ted = TED6000("127.0.0.1")
+    ted.endpoint_settings_results = xmltodict.parse(
+        _fixture("ted6000/systemSettings.xml")
+    )
+    ted.endpoint_rate_results = xmltodict.parse(_fixture("ted6000/rate.xml"))
+    ted.endpoint_mtu_results = parsers.parse_system_overview(
+        _fixture("ted6000/systemOverview.xml")
+    )
+    ted.endpoint_spyder_results = parsers.parse_spyder_data(
+        _fixture("ted6000/spyderData.xml")
+    )
+    dash = parsers.parse_dash_data(_fixture("ted6000/dashData_total.xml"))
+    ted.endpoint_dash_results = {d: dash for d in range(3)}
+    ted._parse_mtus()
+    ted._parse_spyders()
+    ted.endpoint_mtudash_results = {
+        mtu.position: parsers.parse_dash_data(
+            _fixture("ted6000/dashData_mtu%d.xml" % mtu.position)
+        )
+        for mtu in ted.mtus
+    }
+    ted.snapshot = ted._build_snapshot()
+    return ted
+
+
+def read_everything(ted: TED) -> None:
+    """Read every value through the public accessors, as a poller would."""
+    ted.energy()
+    ted.consumption()
+    ted.production()
+    for mtu in ted.mtus:
+        mtu.energy()
+        mtu.power()
+    for spyder in ted.spyders:
+        for group in spyder.ctgroups:
+            group.energy()
+
+
+def rebuild_snapshot(ted: TED) -> Any:
+    """Decode a snapshot from scratch, as after every endpoint changed."""
+    ted.snapshot = None
+    snapshot = ted._build_snapshot()
+    ted.snapshot = snapshot
+    return snapshot
+
+
+def rebuild_topology(ted: TED) -> None:
+    """Rebuild the MTU and spyder lists from the settings."""
+    if isinstance(ted, TED6000):
+        ted._parse_mtus()
+        ted._parse_spyders()
+    else:
+        assert isinstance(ted, TED5000)
+        ted._parse_mtus()
+
+
+def bench_offline(number: int) -> List[Dict[str, Any]]:
+    """Run the benchmarks that don't make requests."""
+    results = []
+    for name, parse in PARSE_CASES:
+        text = _fixture(name)
+        results.append(measure("parse/" + name, lambda: parse(text), number))
+
+    for ted in (offline_ted5000(), offline_ted6000()):
+        model = type(ted).__name__
+        results += [
+            measure("topology/" + model, lambda: rebuild_topology(ted), number),
+            measure("derive/" + model, lambda: rebuild_snapshot(ted), number),
+            measure("accessors/" + model, lambda: read_everything(ted), number),
+        ]
+
+    # Scrapes of unchanged snapshots, and of snapshots that all changed
+    teds = [offline_ted6000() for _ in range(100)]
+    exporter = MetricsExporter(teds)
+    results.append(measure("scrape/TED6000/100", exporter.render, number // 10))
+    results.append(
+        measure(
+            "scrape-changed/TED6000/100",
+            lambda: [rebuild_snapshot(ted) for ted in teds] and exporter.render(),
+            number // 10,
+        )
+    )
+    return results
+
+
+def bench_startup(runs: int) -> List[Dict[str, Any]]:
+    """Time new interpreters running the imports of each case."""
+    results = []
+    for name, code in STARTUP_CASES:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True)
+            times.append((time.perf_counter() - start) * 1e6)
+        results.append(
+            {
+                "name": name,
+                "mean_us": statistics.mean(times),
+                "min_us": min(times),
+                "stdev_us": statistics.stdev(times) if len(times) > 1 else 0.0,
+                "calls": runs,
+            }
+        )
+    return results
+
+
+async def bench_update(gateways: int, rounds: int, model: str) -> Dict[str, Any]:
+    """Time rounds of concurrent update() calls against simulated gateways."""
+    servers = await start_gateways(gateways, templates=FIXTURES, model=model, seed=0)
+    cls = TED5000 if model == "TED5000" else TED6000
+    teds = [cls(server.address) for server in servers]
+    try:
+        await asyncio.gather(*(ted.update() for ted in teds))  # Warm up
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await asyncio.gather(*(ted.update() for ted in teds))
+            times.append((time.perf_counter() - start) * 1e6)
+
+        tracemalloc.start()
+        await asyncio.gather(*(ted.update() for ted in teds))
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        requests = sum(sum(server.requests.values()) for server in servers)
+    finally:
+        for ted in teds:
+            await ted.close()
+        for server in servers:
+            await server.close()
+
+    return {
+        "name": "update/{}/{}".format(model, gateways),
+        "mean_us": statistics.mean(times),
+        "min_us": min(times),
+        "stdev_us": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "calls": rounds,
+        "peak_bytes": peak,
+        "retained_bytes": retained,
+        "requests_per_update": requests / (gateways * (rounds + 2)),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path) -> None:
+    """Print the ratio of the mean times to those of an earlier run."""
+    baseline = {r["name"]: r for r in json.loads(baseline_path.read_text())["results"]}
+    for result in results:
+        old = baseline.get(result["name"])
+        if old is None:
+            continue
+        print(
+            "{:<36} {:>12.1f}µs {:>12.1f}µs {:>7.2f}x".format(
+                result["name"],
+                old["mean_us"],
+                result["mean_us"],
+                result["mean_us"] / old["mean_us"],
+            )
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, help="file to write the JSON to")
+    parser.add_argument("--compare", type=Path, help="earlier JSON results")
+    parser.add_argument("--number", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--startup-runs", type=int, default=20)
+    parser.add_argument(
+        "--gateways", type=int, nargs="+", default=[1, 10, 100], metavar="N"
+    )
+    args = parser.parse_args(argv)
+
+    results = bench_startup(args.startup_runs)
+    results += bench_offline(args.number)
+    for model in ("TED5000", "TED6000"):
+        for gateways in args.gateways:
+            results.append(asyncio.run(bench_update(gateways, args.rounds, model)))
+
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
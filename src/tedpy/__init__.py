@@ -1,27 +1,119 @@
-"""Module to read energy consumption from a TED energy meter."""
-import httpx
-
-from .dataclasses import (
-    EnergyYield,
-    MtuType,
-    Power,
-    SystemType,
-    TedCt,
-    TedCtGroup,
-    TedMtu,
-    TedSpyder,
-)
-from .ted import TED
-from .ted5000 import TED5000
-from .ted6000 import TED6000
-
-TED_CLASSES = [TED5000, TED6000]
-
-
-async def createTED(host: str, async_client: httpx.AsyncClient = None) -> TED:
-    """Create the appropriate TED client."""
-    for cls in TED_CLASSES:
-        ted = cls(host, async_client)
-        if await ted.check():
-            return ted
-    raise ValueError("Host is not a supported TED device.")
+"""Module to read energy consumption from a TED energy meter.
+
+The public names are imported from their modules on first use, so that e.g.
+the dataclasses and snapshots can be used without loading the HTTP client.
+"""
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .aggregation import EnergyTable
+    from .analytics import RunningStats, SeriesStats, TedAnalytics
+    from .dataclasses import (
+        EnergyYield,
+        MtuType,
+        Power,
+        SystemType,
+        TedCt,
+        TedCtGroup,
+        TedMtu,
+        TedSpyder,
+    )
+    from .detection import TED_CLASSES, createTED
+    from .exporter import MetricsExporter
+    from .fleet import FleetResult, HostStats, TedFleet
+    from .history import Bucket, HistoryWindow, SeriesBuffer, TedHistory
+    from .instrumentation import (
+        FetchEvent,
+        HistogramInstrumentation,
+        Instrumentation,
+        MultiInstrumentation,
+        SpanInstrumentation,
+    )
+    from .probe_cache import ProbeCache, ProbeCacheEntry
+    from .retry import (
+        CircuitBreaker,
+        CircuitOpenError,
+        DeadlineExceeded,
+        RetryPolicy,
+    )
+    from .sharding import HashRing, ShardedFleet, WorkerError
+    from .snapshot import TedSnapshot
+    from .storage import LogRecord, ReadingLog
+    from .streaming import Backpressure
+    from .subscriptions import ChangeEvent, Subscription, TedSubscriptions
+    from .sync import EventLoopThread, SyncTED
+    from .ted import PROBE_TIMEOUT, TED
+    from .ted5000 import TED5000
+    from .ted6000 import TED6000, MtuEnergySource
+
+# Module of each public name
+_EXPORTS = {
+    "EnergyTable": "aggregation",
+    "RunningStats": "analytics",
+    "SeriesStats": "analytics",
+    "TedAnalytics": "analytics",
+    "EnergyYield": "dataclasses",
+    "MtuType": "dataclasses",
+    "Power": "dataclasses",
+    "SystemType": "dataclasses",
+    "TedCt": "dataclasses",
+    "TedCtGroup": "dataclasses",
+    "TedMtu": "dataclasses",
+    "TedSpyder": "dataclasses",
+    "MetricsExporter": "exporter",
+    "FleetResult": "fleet",
+    "HostStats": "fleet",
+    "TedFleet": "fleet",
+    "Bucket": "history",
+    "HistoryWindow": "history",
+    "SeriesBuffer": "history",
+    "TedHistory": "history",
+    "FetchEvent": "instrumentation",
+    "HistogramInstrumentation": "instrumentation",
+    "Instrumentation": "instrumentation",
+    "MultiInstrumentation": "instrumentation",
+    "SpanInstrumentation": "instrumentation",
+    "ProbeCache": "probe_cache",
+    "ProbeCacheEntry": "probe_cache",
+    "CircuitBreaker": "retry",
+    "CircuitOpenError": "retry",
+    "DeadlineExceeded": "retry",
+    "RetryPolicy": "retry",
+    "HashRing": "sharding",
+    "ShardedFleet": "sharding",
+    "WorkerError": "sharding",
+    "TedSnapshot": "snapshot",
+    "LogRecord": "storage",
+    "ReadingLog": "storage",
+    "Backpressure": "streaming",
+    "ChangeEvent": "subscriptions",
+    "Subscription": "subscriptions",
+    "TedSubscriptions": "subscriptions",
+    "EventLoopThread": "sync",
+    "SyncTED": "sync",
+    "PROBE_TIMEOUT": "ted",
+    "TED": "ted",
+    "TED5000": "ted5000",
+    "TED6000": "ted6000",
+    "MtuEnergySource": "ted6000",
+    "TED_CLASSES": "detection",
+    "createTED": "detection",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Import a public name from its module on first use."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """List the public names, including those not imported yet."""
+    return sorted(set(globals()) | set(_EXPORTS))
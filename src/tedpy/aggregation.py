@@ -0,0 +1,194 @@
+"""Group-by sums of the energy readings of many MTUs and ctgroups."""
+from array import array
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .dataclasses import EnergyYield, MtuType, SystemType
+
+if TYPE_CHECKING:
+    from .ted import TED
+
+# Columns that rows can be grouped by, besides the energy values
+KEY_COLUMNS = ("gateway", "position", "mtu_type", "system_type", "tag")
+
+
+def _many(teds: Union["TED", Iterable["TED"]]) -> Iterable["TED"]:
+    """Return the TEDs, given one or many (TEDs aren't iterable)."""
+    return teds if isinstance(teds, Iterable) else [teds]
+
+
+class EnergyTable:
+    """Energy readings of many MTUs or ctgroups, packed into columns.
+
+    The now, daily and mtd values of every row are stored in contiguous 64-bit
+    arrays, next to key columns describing where each reading comes from. Sums
+    grouped by a key column are computed in one pass over the arrays, using
+    NumPy if it is installed. Tables are built from the latest snapshot of each
+    TED with from_mtus() or from_ctgroups().
+    """
+
+    def __init__(self) -> None:
+        """Init an empty table."""
+        self.now = array("q")
+        self.daily = array("q")
+        self.mtd = array("q")
+        self.gateway: List[str] = []
+        self.position: List[Any] = []
+        self.mtu_type: List[Optional[MtuType]] = []
+        self.system_type: List[SystemType] = []
+        self.tag: List[Optional[str]] = []
+        self._codes: Dict[str, Tuple[List[Hashable], array]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.now)
+
+    def append(
+        self,
+        energy: EnergyYield,
+        gateway: str,
+        position: Any,
+        mtu_type: Optional[MtuType],
+        system_type: SystemType,
+        tag: Optional[str] = None,
+    ) -> None:
+        """Add a row to the table."""
+        self.now.append(energy.now)
+        self.daily.append(energy.daily)
+        self.mtd.append(energy.mtd)
+        self.gateway.append(gateway)
+        self.position.append(position)
+        self.mtu_type.append(mtu_type)
+        self.system_type.append(system_type)
+        self.tag.append(tag)
+        self._codes.clear()
+
+    @classmethod
+    def from_mtus(cls, teds: Union["TED", Iterable["TED"]]) -> "EnergyTable":
+        """Return a table with one row per MTU of every updated TED."""
+        table = cls()
+        for ted in _many(teds):
+            snapshot = ted.snapshot
+            if snapshot is None:
+                continue
+            system_type = ted.system_type
+            for mtu in ted.mtus:
+                table.append(
+                    snapshot.mtu_energy[mtu.position],
+                    ted.host,
+                    mtu.position,
+                    mtu.type,
+                    system_type,
+                )
+        return table
+
+    @classmethod
+    def from_ctgroups(
+        cls,
+        teds: Union["TED", Iterable["TED"]],
+        tags: Optional[Mapping[Tuple[str, int, int], str]] = None,
+    ) -> "EnergyTable":
+        """Return a table with one row per ctgroup of every updated TED.
+
+        Tags are looked up by (host, spyder position, ctgroup position). The
+        MTU type of a ctgroup is the type of the MTU its spyder is attached to.
+        """
+        table = cls()
+        tags = tags or {}
+        for ted in _many(teds):
+            snapshot = ted.snapshot
+            if snapshot is None:
+                continue
+            system_type = ted.system_type
+            mtu_types = {mtu.id: mtu.type for mtu in ted.mtus}
+            for spyder in ted.spyders:
+                mtu_type = mtu_types.get(spyder.mtu_parent)
+                for group in spyder.ctgroups:
+                    key = (group.spyder_position, group.position)
+                    table.append(
+                        snapshot.ctgroup_energy[key],
+                        ted.host,
+                        key,
+                        mtu_type,
+                        system_type,
+                        tags.get((ted.host, *key)),
+                    )
+        return table
+
+    def total(self) -> EnergyYield:
+        """Return the sum of every row."""
+        return EnergyYield(sum(self.now), sum(self.daily), sum(self.mtd))
+
+    def group_by(
+        self, column: Union[str, Callable[[int], Hashable]]
+    ) -> Dict[Hashable, EnergyYield]:
+        """Return the sum of the rows sharing each value of a key column.
+
+        column is one of KEY_COLUMNS, or a function mapping a row index to the
+        key of its group.
+        """
+        labels, codes = self._factorize(column)
+        nows, dailies, mtds = _grouped_sums(
+            codes, len(labels), (self.now, self.daily, self.mtd)
+        )
+        return {
+            label: EnergyYield(now, daily, mtd)
+            for label, now, daily, mtd in zip(labels, nows, dailies, mtds)
+        }
+
+    def _factorize(
+        self, column: Union[str, Callable[[int], Hashable]]
+    ) -> Tuple[List[Hashable], array]:
+        """Return the distinct keys of a column and the key index of every row."""
+        if isinstance(column, str) and column in self._codes:
+            return self._codes[column]
+        if isinstance(column, str):
+            if column not in KEY_COLUMNS:
+                raise ValueError("unknown column {}".format(column))
+            keys: Iterable[Hashable] = getattr(self, column)
+        else:
+            keys = map(column, range(len(self)))
+
+        indexes: Dict[Hashable, int] = {}
+        codes = array("q", [indexes.setdefault(k, len(indexes)) for k in keys])
+        factorized = (list(indexes), codes)
+        if isinstance(column, str):
+            self._codes[column] = factorized
+        return factorized
+
+
+def _grouped_sums(
+    codes: array, groups: int, columns: Iterable[array]
+) -> List[List[int]]:
+    """Return the sum of each column per group of rows."""
+    try:
+        import numpy
+    except ImportError:
+        pass
+    else:
+        indexes = numpy.frombuffer(codes, numpy.int64)
+        results = []
+        for column in columns:
+            sums = numpy.zeros(groups, numpy.int64)
+            numpy.add.at(sums, indexes, numpy.frombuffer(column, numpy.int64))
+            results.append(sums.tolist())
+        return results
+
+    results = []
+    for column in columns:
+        sums = [0] * groups
+        for code, value in zip(codes, column):
+            sums[code] += value
+        results.append(sums)
+    return results
@@ -0,0 +1,233 @@
+"""Running statistics derived from the readings of successive updates.
+
+Every series (the system, each MTU and each ctgroup) keeps a constant amount
+of state, updated with each snapshot, so no history has to be scanned. Day
+and month rollovers are detected from the date of the gateway's clock, when
+the daily and month to date energy reset, rather than from the energy
+decreasing, which generation and net series also do while exporting.
+"""
+import math
+from collections import deque
+from datetime import date, datetime
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple, Union
+
+from .dataclasses import EnergyYield
+from .snapshot import TedSnapshot
+
+
+class SeriesStats(NamedTuple):
+    """Statistics of a series. Powers are in W, and costs in the price's currency.
+
+    rate is the average power since the previous sample, from the increase of
+    the daily energy (which the gateway reports in whole Wh, so it is coarse
+    over short intervals). demand is the average power over the last complete
+    demand interval, and the peaks are the highest demand of the day and month.
+    """
+
+    power: int
+    rate: float
+    ewma: float
+    max: int
+    demand: float
+    peak_demand_day: float
+    peak_demand_month: float
+    cost_today: float
+    cost_month: float
+
+
+class RunningStats:
+    """Statistics of one series, updated in constant (amortized) time."""
+
+    __slots__ = (
+        "ewma_seconds",
+        "max_seconds",
+        "demand_interval",
+        "timestamp",
+        "day",
+        "last",
+        "rate",
+        "ewma",
+        "_maxima",
+        "_interval_end",
+        "_interval_energy",
+        "demand",
+        "peak_demand_day",
+        "peak_demand_month",
+        "cost_today",
+        "cost_month",
+    )
+
+    def __init__(
+        self, ewma_seconds: float, max_seconds: float, demand_interval: float
+    ) -> None:
+        """Init the statistics, before any sample."""
+        self.ewma_seconds = ewma_seconds
+        self.max_seconds = max_seconds
+        self.demand_interval = demand_interval
+        self.timestamp: Optional[float] = None
+        # Date of the gateway's clock at the last sample
+        self.day: Optional[date] = None
+        self.last = EnergyYield(0, 0, 0)
+        self.rate = 0.0
+        self.ewma = 0.0
+        # (timestamp, power) of the samples that can still become the maximum
+        self._maxima: Deque[Tuple[float, int]] = deque()
+        self._interval_end = 0.0
+        self._interval_energy = 0.0
+        self.demand = 0.0
+        self.peak_demand_day = 0.0
+        self.peak_demand_month = 0.0
+        self.cost_today = 0.0
+        self.cost_month = 0.0
+
+    def add(
+        self,
+        timestamp: float,
+        energy: EnergyYield,
+        price: float = 0.0,
+        gateway_time: Optional[datetime] = None,
+    ) -> None:
+        """Add a sample, with the price of a kWh (if costs are computed).
+
+        Rollovers are only detected if the gateway time of the sample is given.
+        """
+        previous = self.timestamp
+        day = gateway_time.date() if gateway_time is not None else self.day
+        if previous is None:
+            self.timestamp = timestamp
+            self.day = day
+            self.last = energy
+            self.ewma = energy.now
+            self._maxima.append((timestamp, energy.now))
+            self._interval_end = self._next_interval(timestamp)
+            return
+        elapsed = timestamp - previous
+        if elapsed <= 0:
+            return  # Same or older sample
+
+        used = energy.daily - self.last.daily
+        last_day = self.day
+        if day != last_day and day is not None and last_day is not None:
+            used = energy.daily  # Since midnight
+            if timestamp >= self._interval_end:
+                # The interval that ended belongs to the previous day, whose
+                # energy after the last sample is not known
+                self._end_interval(self._interval_energy)
+                self._interval_energy = 0.0
+                self._interval_end = self._next_interval(timestamp)
+            if (day.year, day.month) != (last_day.year, last_day.month):
+                self.peak_demand_month = 0.0
+                self.cost_month = 0.0
+            self.peak_demand_day = 0.0
+            self.cost_today = 0.0
+        self.timestamp = timestamp
+        self.day = day
+        self.last = energy
+
+        self.rate = used * 3600 / elapsed
+        alpha = 1 - math.exp(-elapsed / self.ewma_seconds)
+        self.ewma += alpha * (energy.now - self.ewma)
+
+        maxima = self._maxima
+        while maxima and maxima[-1][1] <= energy.now:
+            maxima.pop()
+        maxima.append((timestamp, energy.now))
+        while maxima[0][0] <= timestamp - self.max_seconds:
+            maxima.popleft()
+
+        if timestamp < self._interval_end:
+            self._interval_energy += used
+        else:
+            # Split the energy between the intervals, in proportion to time
+            before = used * (self._interval_end - previous) / elapsed
+            self._end_interval(self._interval_energy + before)
+            self._interval_energy = used - before
+            self._interval_end = self._next_interval(timestamp)
+
+        if price:
+            cost = used * price / 1000
+            self.cost_today += cost
+            self.cost_month += cost
+
+    def _next_interval(self, timestamp: float) -> float:
+        """Return the end of the demand interval holding timestamp."""
+        return (timestamp // self.demand_interval + 1) * self.demand_interval
+
+    def _end_interval(self, energy: float) -> None:
+        """Record the demand of a complete interval in which energy Wh were used."""
+        self.demand = energy * 3600 / self.demand_interval
+        self.peak_demand_day = max(self.peak_demand_day, self.demand)
+        self.peak_demand_month = max(self.peak_demand_month, self.demand)
+
+    def stats(self) -> SeriesStats:
+        """Return the current statistics."""
+        return SeriesStats(
+            self.last.now,
+            self.rate,
+            self.ewma,
+            self._maxima[0][1] if self._maxima else 0,
+            self.demand,
+            self.peak_demand_day,
+            self.peak_demand_month,
+            self.cost_today,
+            self.cost_month,
+        )
+
+
+class TedAnalytics:
+    """Running statistics of the system, every MTU and every ctgroup.
+
+    Set TED.analytics to an instance to add every snapshot produced by
+    update(). The EWMA of the power has a time constant of ewma_seconds, the
+    maximum power is over the last max_seconds, and demand is averaged over
+    demand_interval seconds (aligned to the clock, 15 minutes by default).
+    Costs are only computed if a price per kWh is given, either as a number
+    or as a function called for every snapshot (e.g. reading TED6000.rate()).
+    """
+
+    def __init__(
+        self,
+        ewma_seconds: float = 60.0,
+        max_seconds: float = 3600.0,
+        demand_interval: float = 900.0,
+        price: Union[None, float, Callable[[], float]] = None,
+    ) -> None:
+        """Init the analytics."""
+        self.ewma_seconds = ewma_seconds
+        self.max_seconds = max_seconds
+        self.demand_interval = demand_interval
+        self.price = price
+        self.system = self._new_stats()
+        self.mtus: Dict[int, RunningStats] = {}
+        self.ctgroups: Dict[Tuple[int, int], RunningStats] = {}
+
+    def _new_stats(self) -> RunningStats:
+        return RunningStats(self.ewma_seconds, self.max_seconds, self.demand_interval)
+
+    def mtu(self, position: int) -> SeriesStats:
+        """Return the statistics of an MTU."""
+        return self.mtus[position].stats()
+
+    def ctgroup(self, spyder_position: int, position: int) -> SeriesStats:
+        """Return the statistics of a ctgroup."""
+        return self.ctgroups[(spyder_position, position)].stats()
+
+    def append(self, snapshot: TedSnapshot) -> None:
+        """Update the statistics of every series with a snapshot."""
+        price = self.price() if callable(self.price) else self.price or 0.0
+        timestamp = snapshot.timestamp
+        gateway_time = snapshot.gateway_time
+        self.system.add(timestamp, snapshot.energy, price, gateway_time)
+
+        mtus = self.mtus
+        for position, energy in snapshot.mtu_energy.items():
+            stats = mtus.get(position)
+            if stats is None:
+                stats = mtus[position] = self._new_stats()
+            stats.add(timestamp, energy, price, gateway_time)
+        ctgroups = self.ctgroups
+        for key, energy in snapshot.ctgroup_energy.items():
+            stats = ctgroups.get(key)
+            if stats is None:
+                stats = ctgroups[key] = self._new_stats()
+            stats.add(timestamp, energy, price, gateway_time)
@@ -1,13 +1,17 @@
 """Classes for representing parts of a TED device."""
 from __future__ import annotations
 
+import functools
+import sys
 from dataclasses import dataclass
 from enum import Enum
-from typing import TYPE_CHECKING, List, NamedTuple
+from typing import TYPE_CHECKING, Any, List, NamedTuple, Sequence, TypeVar
 
 if TYPE_CHECKING:
     from . import TED
 
+T = TypeVar("T")
+
 
 class MtuType(Enum):
     """TED Defined MTU configuration types."""
@@ -25,21 +29,25 @@ class EnergyYield(NamedTuple):
     daily: int
     mtd: int
 
-    def __add__(self, other: tuple) -> EnergyYield:
+    def __add__(self, other: Any) -> EnergyYield:
         """Add two EnergyYield objects by adding each energy total."""
-        if not isinstance(other, EnergyYield):
-            raise ValueError("only EnergyYields can be added to EnergyYields")
-        return EnergyYield(
-            self.now + other.now, self.daily + other.daily, self.mtd + other.mtd
-        )
-
-    def __sub__(self, other: tuple) -> EnergyYield:
+        try:
+            return EnergyYield(
+                self.now + other.now, self.daily + other.daily, self.mtd + other.mtd
+            )
+        except AttributeError:
+            raise ValueError("only EnergyYields can be added to EnergyYields") from None
+
+    def __sub__(self, other: Any) -> EnergyYield:
         """Subtract two EnergyYield objects by subtracting each energy total."""
-        if not isinstance(other, EnergyYield):
-            raise ValueError("only EnergyYields can be subtracted from EnergyYields")
-        return EnergyYield(
-            self.now - other.now, self.daily - other.daily, self.mtd - other.mtd
-        )
+        try:
+            return EnergyYield(
+                self.now - other.now, self.daily - other.daily, self.mtd - other.mtd
+            )
+        except AttributeError:
+            raise ValueError(
+                "only EnergyYields can be subtracted from EnergyYields"
+            ) from None
 
 
 class Power(NamedTuple):
@@ -62,6 +70,16 @@ class SystemType(Enum):
 class TedMtu:
     """MTU panel for the energy meter."""
 
+    __slots__ = (
+        "id",
+        "position",
+        "description",
+        "type",
+        "power_cal_factor",
+        "voltage_cal_factor",
+        "_ted",
+    )
+
     id: str
     position: int
     description: str
@@ -79,10 +97,12 @@ class TedMtu:
         return self._ted._mtu_power(self)
 
 
-@dataclass
+@dataclass(frozen=True)
 class TedCt:
     """Individual reading on a Spyder."""
 
+    __slots__ = ("position", "description", "type", "multiplier")
+
     position: int
     description: str
     type: int
@@ -93,6 +113,8 @@ class TedCt:
 class TedCtGroup:
     """Group of readings on a Spyder."""
 
+    __slots__ = ("position", "spyder_position", "description", "member_cts", "_ted")
+
     position: int
     spyder_position: int
     description: str
@@ -108,7 +130,32 @@ class TedCtGroup:
 class TedSpyder:
     """Spyder unit for the energy meter."""
 
+    __slots__ = ("position", "secondary", "mtu_parent", "ctgroups")
+
     position: int
     secondary: int
     mtu_parent: str
     ctgroups: List[TedCtGroup]
+
+
+def intern_str(text: Any) -> Any:
+    """Intern a setting read from the gateway, which may be None if empty."""
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+@functools.lru_cache(maxsize=4096)
+def shared_ct(position: int, description: str, type: int, multiplier: int) -> TedCt:
+    """Return a TedCt, shared by every spyder with the same CT settings."""
+    return TedCt(position, intern_str(description), type, multiplier)
+
+
+def reuse_equal(previous: Sequence[T], current: List[T]) -> List[T]:
+    """Replace the items of current equal to those of previous by the latter.
+
+    Objects of the unchanged parts of a topology (and references held to them)
+    are thereby kept when the configuration changes.
+    """
+    for index, item in enumerate(current[: len(previous)]):
+        if previous[index] == item:
+            current[index] = previous[index]
+    return current
@@ -0,0 +1,75 @@
+"""Detection of the model of a TED gateway."""
+import asyncio
+from typing import List, Optional
+
+import httpx
+
+from .probe_cache import ProbeCache
+from .ted import PROBE_TIMEOUT, TED
+from .ted5000 import TED5000
+from .ted6000 import TED6000
+
+TED_CLASSES = [TED5000, TED6000]
+
+
+async def createTED(
+    host: str,
+    async_client: httpx.AsyncClient = None,
+    limits: httpx.Limits = None,
+    probe_cache: ProbeCache = None,
+    probe_timeout: float = PROBE_TIMEOUT,
+) -> TED:
+    """Create the appropriate TED client.
+
+    Every supported model is probed concurrently, and the first one that
+    matches is returned. If a probe_cache is given, hosts found in it are
+    not probed, and newly detected hosts are added to it.
+    """
+    if probe_cache is not None:
+        entry = probe_cache.get(host)
+        classes = {cls.__name__: cls for cls in TED_CLASSES}
+        if entry is not None and entry.model in classes:
+            return classes[entry.model](host, async_client, limits)
+
+    teds = {
+        asyncio.ensure_future(ted.check(probe_timeout)): ted
+        for ted in (cls(host, async_client, limits) for cls in TED_CLASSES)
+    }
+    found: Optional[TED] = None
+    errors: List[BaseException] = []
+    pending = set(teds)
+    try:
+        while pending and found is None:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    errors.append(error)
+                elif task.result() and found is None:
+                    found = teds[task]
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for ted in teds.values():
+            if ted is not found:
+                await ted.close()
+
+    if found is None:
+        if errors:
+            raise errors[0]
+        raise ValueError("Host is not a supported TED device.")
+
+    if probe_cache is not None:
+        probe_cache.set(host, type(found).__name__, _probed_gateway_id(found))
+    return found
+
+
+def _probed_gateway_id(ted: TED) -> Optional[str]:
+    """Return the gateway id if the probe already fetched the settings."""
+    try:
+        return ted.gateway_id
+    except (TypeError, KeyError):
+        return None
@@ -0,0 +1,303 @@
+"""OpenMetrics exporter serving the latest readings of one or many TEDs.
+
+A scrape never reads the TEDs through their accessors. The lines of each
+gateway are rendered from byte templates built when its topology changes,
+and only for the parts of its snapshot that changed since the last scrape
+(snapshots share the mappings of unchanged parts), so that serving a scrape
+is mostly joining cached buffers.
+
+Run `python -m tedpy.exporter HOST [HOST ...]` to poll gateways and serve
+their readings on /metrics.
+"""
+import argparse
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .fleet import TedFleet
+from .server import HttpServer, Response
+from .snapshot import TedSnapshot
+from .ted import TED
+
+CONTENT_TYPE = b"application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Metric families, in the order they are served: (name, type, unit, help)
+FAMILIES = [
+    ("ted_gateway", "info", "", "Gateway of a TED."),
+    ("ted_snapshot_timestamp_seconds", "gauge", "seconds", "Time of the readings."),
+    ("ted_power_watts", "gauge", "watts", "Current power."),
+    ("ted_energy_today_watthours", "gauge", "watthours", "Energy used today."),
+    ("ted_energy_month_watthours", "gauge", "watthours", "Energy used this month."),
+    ("ted_mtu_power_watts", "gauge", "watts", "Current power of an MTU."),
+    ("ted_mtu_energy_today_watthours", "gauge", "watthours", "Energy used today."),
+    ("ted_mtu_energy_month_watthours", "gauge", "watthours", "Energy this month."),
+    ("ted_mtu_apparent_power_voltamperes", "gauge", "voltamperes", "Apparent power."),
+    ("ted_mtu_power_factor_percent", "gauge", "percent", "Power factor of an MTU."),
+    ("ted_mtu_voltage_volts", "gauge", "volts", "Voltage of an MTU."),
+    ("ted_ctgroup_power_watts", "gauge", "watts", "Current power of a ctgroup."),
+    ("ted_ctgroup_energy_today_watthours", "gauge", "watthours", "Energy today."),
+    ("ted_ctgroup_energy_month_watthours", "gauge", "watthours", "Energy this month."),
+]
+
+_HEADERS = [
+    (
+        "# TYPE {0} {1}\n{2}# HELP {0} {3}\n".format(
+            name, type_, "# UNIT {} {}\n".format(name, unit) if unit else "", help_
+        ).encode()
+    )
+    for name, type_, unit, help_ in FAMILIES
+]
+_INDEX = {family[0]: index for index, family in enumerate(FAMILIES)}
+
+# Families rendered from each part of a snapshot, with the format of the values
+_SYSTEM = [
+    ("ted_power_watts", b"%d"),
+    ("ted_energy_today_watthours", b"%d"),
+    ("ted_energy_month_watthours", b"%d"),
+]
+_MTU_ENERGY = [
+    ("ted_mtu_power_watts", b"%d"),
+    ("ted_mtu_energy_today_watthours", b"%d"),
+    ("ted_mtu_energy_month_watthours", b"%d"),
+]
+_MTU_POWER = [
+    ("ted_mtu_apparent_power_voltamperes", b"%d"),
+    ("ted_mtu_power_factor_percent", b"%.1f"),
+    ("ted_mtu_voltage_volts", b"%.1f"),
+]
+_CTGROUP_ENERGY = [
+    ("ted_ctgroup_power_watts", b"%d"),
+    ("ted_ctgroup_energy_today_watthours", b"%d"),
+    ("ted_ctgroup_energy_month_watthours", b"%d"),
+]
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value, and % for the byte templates."""
+    text = "" if value is None else str(value)
+    text = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return text.replace("%", "%%")
+
+
+def _sample(name: str, labels: Sequence[Tuple[str, Any]], value: bytes) -> bytes:
+    """Return the template of a sample line."""
+    rendered = ",".join('{}="{}"'.format(key, _escape(val)) for key, val in labels)
+    return "{}{{{}}} ".format(name, rendered).encode() + value + b"\n"
+
+
+def _same_objects(state: List[Tuple[Any, ...]], other: List[Tuple[Any, ...]]) -> bool:
+    """Return whether two lists hold tuples of the same objects."""
+    return len(state) == len(other) and all(
+        a is b for items, others in zip(state, other) for a, b in zip(items, others)
+    )
+
+
+class _Part:
+    """Templates of the families rendered from one mapping of a snapshot."""
+
+    __slots__ = ("keys", "templates", "source", "rendered")
+
+    def __init__(
+        self,
+        keys: List[Any],
+        labels: List[List[Tuple[str, Any]]],
+        families: List[Tuple[str, bytes]],
+    ) -> None:
+        """Build a template per family, with one line per key."""
+        self.keys = keys
+        self.templates = [
+            (_INDEX[name], b"".join(_sample(name, lbl, value) for lbl in labels))
+            for name, value in families
+        ]
+        self.source: Any = None
+        self.rendered: List[Tuple[int, bytes]] = []
+
+    def render(self, source: Any) -> List[Tuple[int, bytes]]:
+        """Return the lines of every family, rendering them if source changed."""
+        if source is not self.source:
+            try:
+                rows = [source[key] for key in self.keys]
+            except KeyError:  # The topology changed since the snapshot was taken
+                self.rendered = []
+            else:
+                self.rendered = [
+                    (index, template % tuple(row[column] for row in rows))
+                    for column, (index, template) in enumerate(self.templates)
+                ]
+            self.source = source
+        return self.rendered
+
+
+class _GatewayMetrics:
+    """Cached lines of one TED, rebuilt when its topology changes."""
+
+    def __init__(self, ted: TED) -> None:
+        """Build the templates of the TED's current topology."""
+        self.mtus = ted.mtus
+        self.spyders = ted.spyders
+        gateway = [("gateway", ted.host)]
+        gateway_id: Optional[str] = None
+        description: Optional[str] = None
+        try:
+            gateway_id, description = ted.gateway_id, ted.gateway_description
+        except (TypeError, KeyError):
+            pass
+        info = gateway + [
+            ("id", gateway_id),
+            ("description", description),
+            ("model", type(ted).__name__),
+        ]
+        self.info = (_INDEX["ted_gateway"], _sample("ted_gateway_info", info, b"1"))
+        self.timestamp = _sample("ted_snapshot_timestamp_seconds", gateway, b"%.3f")
+
+        kinds = ["net", "consumption", "production"]
+        self.system = _Part(
+            [0, 1, 2], [gateway + [("kind", kind)] for kind in kinds], _SYSTEM
+        )
+        positions = [mtu.position for mtu in ted.mtus]
+        mtu_labels = [
+            gateway + [("mtu", mtu.position), ("description", mtu.description)]
+            for mtu in ted.mtus
+        ]
+        self.mtu_energy = _Part(positions, mtu_labels, _MTU_ENERGY)
+        self.mtu_power = _Part(positions, mtu_labels, _MTU_POWER)
+        groups = [group for spyder in ted.spyders for group in spyder.ctgroups]
+        self.ctgroup_energy = _Part(
+            [(group.spyder_position, group.position) for group in groups],
+            [
+                gateway
+                + [
+                    ("spyder", group.spyder_position),
+                    ("group", group.position),
+                    ("description", group.description),
+                ]
+                for group in groups
+            ],
+            _CTGROUP_ENERGY,
+        )
+        self.snapshot: Optional[TedSnapshot] = None
+        self.rendered: List[Tuple[int, bytes]] = []
+
+    def render(self, snapshot: TedSnapshot) -> List[Tuple[int, bytes]]:
+        """Return the (family index, lines) of the snapshot."""
+        if snapshot is self.snapshot:
+            return self.rendered
+        system = (snapshot.energy, snapshot.consumption, snapshot.production)
+        timestamp = self.timestamp % snapshot.timestamp
+        self.rendered = [
+            self.info,
+            (_INDEX["ted_snapshot_timestamp_seconds"], timestamp),
+            *self.system.render(system),
+            *self.mtu_energy.render(snapshot.mtu_energy),
+            *self.mtu_power.render(snapshot.mtu_power),
+            *self.ctgroup_energy.render(snapshot.ctgroup_energy),
+        ]
+        self.snapshot = snapshot
+        return self.rendered
+
+
+class MetricsExporter:
+    """Serve the latest snapshot of every TED in OpenMetrics text format.
+
+    The TEDs are those passed in, and those of a fleet (read at every scrape,
+    since a fleet connects to its gateways while polling). The TEDs are not
+    updated by the exporter; TEDs without a snapshot are left out.
+    """
+
+    def __init__(
+        self, teds: Iterable[TED] = (), fleet: Optional[TedFleet] = None
+    ) -> None:
+        """Init the exporter."""
+        self.teds: List[TED] = list(teds)
+        self.fleet = fleet
+        self._gateways: Dict[TED, _GatewayMetrics] = {}
+        # The last scrape, and the (TED, snapshot, mtus, spyders) it was of
+        self._rendered = b""
+        self._rendered_state: List[Tuple[TED, Any, Any, Any]] = []
+        self._server = HttpServer(self._respond)
+
+    def render(self) -> bytes:
+        """Return the metrics of every TED."""
+        teds = self.teds
+        if self.fleet is not None:
+            teds = teds + list(self.fleet.teds.values())
+        state = [(ted, ted.snapshot, ted.mtus, ted.spyders) for ted in teds]
+        if _same_objects(state, self._rendered_state):
+            return self._rendered
+
+        families: List[List[bytes]] = [[header] for header in _HEADERS]
+        gateways = {}
+        for ted in teds:
+            snapshot = ted.snapshot
+            if snapshot is None:
+                continue
+            gateway = self._gateways.get(ted)
+            if (
+                gateway is None
+                or gateway.mtus is not ted.mtus
+                or gateway.spyders is not ted.spyders
+            ):
+                gateway = _GatewayMetrics(ted)
+            gateways[ted] = gateway
+            for index, lines in gateway.render(snapshot):
+                families[index].append(lines)
+        self._gateways = gateways  # Forget the TEDs that are gone
+        self._rendered = b"".join([b"".join(lines) for lines in families]) + b"# EOF\n"
+        self._rendered_state = state
+        return self._rendered
+
+    @property
+    def address(self) -> str:
+        """Return the host:port the metrics are served on."""
+        return self._server.address
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Serve the metrics on /metrics, on a free port unless one is given."""
+        await self._server.start(host, port)
+
+    async def close(self) -> None:
+        """Stop serving and close every open connection."""
+        await self._server.close()
+
+    async def __aenter__(self) -> "MetricsExporter":
+        """Start serving when entering the context."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Stop serving when leaving the context."""
+        await self.close()
+
+    async def _respond(self, method: str, target: str) -> Response:
+        """Return the response to a request."""
+        if target.split("?")[0] == "/metrics" and method == "GET":
+            return 200, CONTENT_TYPE, self.render()
+        return 404, b"text/plain", b""
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    async with TedFleet(args.hosts, interval=args.interval) as fleet:
+        exporter = MetricsExporter(fleet=fleet)
+        await exporter.start(args.host, args.port)
+        print("Serving on http://{}/metrics".format(exporter.address), flush=True)
+        try:
+            async for _ in fleet:  # Errors are kept in fleet.stats
+                pass
+        finally:
+            await exporter.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Poll gateways and serve their readings until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("hosts", nargs="+", metavar="HOST")
+    parser.add_argument("--host", default="127.0.0.1", help="address to serve on")
+    parser.add_argument("--port", type=int, default=9117)
+    parser.add_argument("--interval", type=float, default=10.0)
+    try:
+        asyncio.run(_serve(parser.parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Concurrent poller for many TED gateways."""
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import httpx
+
+from .detection import createTED
+from .retry import RetryPolicy
+from .snapshot import TedSnapshot
+from .ted import TED
+
+
+class FleetResult(NamedTuple):
+    """Outcome of polling a single gateway once."""
+
+    host: str
+    ted: Optional[TED]
+    snapshot: Optional[TedSnapshot]
+    error: Optional[Exception]
+    latency: float
+
+
+@dataclass
+class HostStats:
+    """Latency and error statistics for a polled gateway."""
+
+    polls: int = 0
+    errors: int = 0
+    last_latency: float = 0.0
+    max_latency: float = 0.0
+    total_latency: float = 0.0
+    last_error: Optional[Exception] = None
+
+    @property
+    def mean_latency(self) -> float:
+        """Return the mean latency of all polls."""
+        return self.total_latency / self.polls if self.polls else 0.0
+
+    def record(self, latency: float, error: Optional[Exception]) -> None:
+        """Add the outcome of a poll to the statistics."""
+        self.polls += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+        if error is not None:
+            self.errors += 1
+            self.last_error = error
+
+
+class TedFleet:
+    """Poll many TED gateways concurrently over one shared connection pool.
+
+    Each gateway is polled on its own schedule, every interval seconds or every
+    polling_delay seconds reported by the gateway, whichever is longer. Start
+    times are spread randomly over the first interval so that the gateways
+    aren't all polled at once. The results of every poll are yielded by
+    iterating over the fleet with `async for`; if they aren't consumed, only the
+    latest max_queued results are kept.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        interval: float = 1.0,
+        async_client: httpx.AsyncClient = None,
+        max_in_flight: int = 32,
+        max_in_flight_per_device: int = 2,
+        jitter: bool = True,
+        max_queued: int = 1000,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        """Init the fleet. Polling starts with start() or `async with`.
+
+        If a retry_policy is given, it is used by every gateway (each with its
+        own circuit breaker).
+        """
+        self.hosts = list(dict.fromkeys(host.lower() for host in hosts))
+        self.interval = interval
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_device = max_in_flight_per_device
+        self.jitter = jitter
+        self.max_queued = max_queued
+        self.retry_policy = retry_policy
+
+        self.teds: Dict[str, TED] = {}
+        self.stats: Dict[str, HostStats] = {host: HostStats() for host in self.hosts}
+
+        self._async_client: Optional[httpx.AsyncClient] = async_client
+        self._owns_client = async_client is None
+        self._limiter: Optional[asyncio.Semaphore] = None
+        self._results: "Optional[asyncio.Queue[Optional[FleetResult]]]" = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Return the httpx client shared by every gateway."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                )
+            )
+        return self._async_client
+
+    async def start(self) -> None:
+        """Start polling every gateway."""
+        if self._tasks:
+            return
+        self._limiter = asyncio.Semaphore(self.max_in_flight)
+        self._results = asyncio.Queue()
+        self._tasks = [
+            asyncio.ensure_future(self._poll_host(host)) for host in self.hosts
+        ]
+
+    async def close(self) -> None:
+        """Stop polling and close the connection pool if owned by the fleet."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._owns_client and self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._results is not None:
+            self._results.put_nowait(None)
+
+    async def __aenter__(self) -> "TedFleet":
+        """Start polling when entering the context."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Stop polling when leaving the context."""
+        await self.close()
+
+    def __aiter__(self) -> "TedFleet":
+        """Iterate over the results of every poll."""
+        return self
+
+    async def __anext__(self) -> FleetResult:
+        """Return the next poll result, waiting for one if necessary."""
+        if self._results is None:
+            raise RuntimeError("start() must be called before reading results")
+        result = await self._results.get()
+        if result is None:
+            self._results.put_nowait(None)  # Wake up other iterators as well
+            raise StopAsyncIteration
+        return result
+
+    def _publish(self, result: FleetResult) -> None:
+        """Queue a result, dropping the oldest one if the queue is full."""
+        assert self._results is not None
+        if self._results.qsize() >= self.max_queued:
+            self._results.get_nowait()
+        self._results.put_nowait(result)
+
+    async def _connect(self, host: str) -> TED:
+        """Detect the gateway's model and configure its request limits."""
+        assert self._limiter is not None
+        async with self._limiter:
+            ted = await createTED(host, self.async_client)
+        ted.request_limiters = [
+            asyncio.Semaphore(self.max_in_flight_per_device),
+            self._limiter,
+        ]
+        if self.retry_policy is not None:
+            ted.retry_policy = self.retry_policy
+        return ted
+
+    async def _poll_host(self, host: str) -> None:
+        """Poll a single gateway forever."""
+        loop = asyncio.get_event_loop()
+        if self.jitter:
+            await asyncio.sleep(random.uniform(0, self.interval))
+
+        next_poll = loop.time()
+        while True:
+            start = loop.time()
+            ted = self.teds.get(host)
+            error: Optional[Exception] = None
+            try:
+                if ted is None:
+                    ted = self.teds[host] = await self._connect(host)
+                await ted.update()
+            except Exception as err:  # Reported through the results and stats
+                error = err
+            latency = loop.time() - start
+
+            self.stats[host].record(latency, error)
+            snapshot = ted.snapshot if ted is not None and error is None else None
+            self._publish(FleetResult(host, ted, snapshot, error, latency))
+
+            interval = self.interval
+            if ted is not None and error is None:
+                interval = max(interval, ted.polling_delay)
+            # Schedule from the previous deadline so that time spent fetching
+            # doesn't accumulate, skipping polls that are already overdue.
+            next_poll += interval
+            now = loop.time()
+            if next_poll < now:
+                next_poll = now
+            await asyncio.sleep(next_poll - now)
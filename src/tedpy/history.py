@@ -0,0 +1,208 @@
+"""Fixed-capacity history of the readings from successive updates."""
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .snapshot import TedSnapshot
+
+# 32-bit columns keep a day of samples per second of an MTU under 3 MB
+ENERGY_COLUMNS = (("now", "i"), ("daily", "i"), ("mtd", "i"))
+POWER_COLUMNS = (("apparent_power", "i"), ("power_factor", "f"), ("voltage", "f"))
+
+
+class Bucket(NamedTuple):
+    """Aggregated values of a column over a time interval."""
+
+    start: float
+    min: float
+    max: float
+    mean: float
+    samples: int
+
+
+class HistoryWindow:
+    """Read-only view of the samples of a series between two times.
+
+    The samples are stored in a ring buffer, so a window covers at most two
+    contiguous segments of the underlying arrays. segments() returns memoryviews
+    of those without copying.
+    """
+
+    def __init__(self, series: "SeriesBuffer", start: int, stop: int) -> None:
+        """Init the view of the samples with logical indexes [start, stop)."""
+        self._series = series
+        self._start = start
+        self._stop = stop
+
+    def __len__(self) -> int:
+        """Return the number of samples in the window."""
+        return self._stop - self._start
+
+    def segments(self, column: str) -> List[memoryview]:
+        """Return zero-copy views of the column, in chronological order."""
+        return [
+            memoryview(self._series._columns[column])[start:stop]
+            for start, stop in self._series._physical_ranges(self._start, self._stop)
+        ]
+
+    def column(self, column: str) -> Union[memoryview, array]:
+        """Return the column as one sequence, only copying it if it wraps around."""
+        segments = self.segments(column)
+        if len(segments) == 1:
+            return segments[0]
+        values = array(self._series._columns[column].typecode)
+        for segment in segments:
+            values.frombytes(segment.tobytes())
+        return values
+
+    def as_numpy(self, column: str) -> Any:
+        """Return the column as a NumPy array (requires numpy to be installed)."""
+        import numpy
+
+        segments = [numpy.frombuffer(s, s.format) for s in self.segments(column)]
+        if len(segments) == 1:
+            return segments[0]
+        return numpy.concatenate(segments)
+
+    def downsample(self, column: str, bucket_seconds: float) -> List[Bucket]:
+        """Return the min, max and mean of the column per bucket of time."""
+        buckets: List[Bucket] = []
+        times = self.segments("timestamp")
+        values = self.segments(column)
+        bucket_start = 0.0
+        low = high = total = 0.0
+        count = 0
+        for time_segment, value_segment in zip(times, values):
+            for timestamp, value in zip(time_segment, value_segment):
+                if count and timestamp >= bucket_start + bucket_seconds:
+                    buckets.append(
+                        Bucket(bucket_start, low, high, total / count, count)
+                    )
+                    count = 0
+                if not count:
+                    bucket_start = timestamp - timestamp % bucket_seconds
+                    low = high = total = value
+                    count = 1
+                    continue
+                low = min(low, value)
+                high = max(high, value)
+                total += value
+                count += 1
+        if count:
+            buckets.append(Bucket(bucket_start, low, high, total / count, count))
+        return buckets
+
+
+class SeriesBuffer:
+    """Ring buffer of timestamped samples, stored as one array per column."""
+
+    def __init__(self, capacity: int, columns: Sequence[Tuple[str, str]]) -> None:
+        """Init the buffer with (name, array typecode) columns."""
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._columns: Dict[str, array] = {
+            name: array(typecode, bytes(array(typecode).itemsize * capacity))
+            for name, typecode in (("timestamp", "d"), *columns)
+        }
+        self._arrays = list(self._columns.values())
+        self._head = 0  # Physical index of the oldest sample
+        self._size = 0
+
+    @property
+    def columns(self) -> List[str]:
+        """Return the names of the columns, including the timestamp."""
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        """Return the number of samples stored."""
+        return self._size
+
+    def append(self, timestamp: float, *values: float) -> None:
+        """Add a sample, overwriting the oldest one if the buffer is full."""
+        index = (self._head + self._size) % self.capacity
+        if self._size == self.capacity:
+            self._head = (self._head + 1) % self.capacity
+        else:
+            self._size += 1
+        self._arrays[0][index] = timestamp
+        for column, value in zip(self._arrays[1:], values):
+            column[index] = value
+
+    def window(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> HistoryWindow:
+        """Return the samples with start <= timestamp < end."""
+        first = 0 if start is None else self._bisect(start)
+        stop = self._size if end is None else self._bisect(end)
+        return HistoryWindow(self, first, max(first, stop))
+
+    def latest(self, count: int) -> HistoryWindow:
+        """Return the last count samples."""
+        return HistoryWindow(self, max(0, self._size - count), self._size)
+
+    def _bisect(self, timestamp: float) -> int:
+        """Return the logical index of the first sample at or after timestamp."""
+        times = self._arrays[0]
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if times[(self._head + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _physical_ranges(self, start: int, stop: int) -> List[Tuple[int, int]]:
+        """Return the physical index ranges holding logical indexes [start, stop)."""
+        if start >= stop:
+            return [(0, 0)]
+        first = (self._head + start) % self.capacity
+        last = first + (stop - start)
+        if last <= self.capacity:
+            return [(first, last)]
+        return [(first, self.capacity), (0, last - self.capacity)]
+
+
+class TedHistory:
+    """History of the system, per-MTU and per-ctgroup readings.
+
+    Each series keeps the last capacity samples. Set TED.history to an instance
+    to append every snapshot produced by update().
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Init the history."""
+        self.capacity = capacity
+        self.system = SeriesBuffer(capacity, ENERGY_COLUMNS)
+        self.mtus: Dict[int, SeriesBuffer] = {}
+        self.ctgroups: Dict[Tuple[int, int], SeriesBuffer] = {}
+
+    def mtu(self, position: int) -> SeriesBuffer:
+        """Return the energy and power history of an MTU."""
+        return self.mtus[position]
+
+    def ctgroup(self, spyder_position: int, position: int) -> SeriesBuffer:
+        """Return the energy history of a ctgroup."""
+        return self.ctgroups[(spyder_position, position)]
+
+    def append(self, snapshot: TedSnapshot) -> None:
+        """Add the readings of a snapshot to every series."""
+        timestamp = snapshot.timestamp
+        self.system.append(timestamp, *snapshot.energy)
+
+        mtus = self.mtus
+        for position, energy in snapshot.mtu_energy.items():
+            power = snapshot.mtu_power[position]
+            series = mtus.get(position)
+            if series is None:
+                series = mtus[position] = SeriesBuffer(
+                    self.capacity, ENERGY_COLUMNS + POWER_COLUMNS
+                )
+            series.append(timestamp, *energy, *power)
+
+        ctgroups = self.ctgroups
+        for key, energy in snapshot.ctgroup_energy.items():
+            series = ctgroups.get(key)
+            if series is None:
+                series = ctgroups[key] = SeriesBuffer(self.capacity, ENERGY_COLUMNS)
+            series.append(timestamp, *energy)
@@ -0,0 +1,293 @@
+"""Hooks receiving the timings of the requests and update phases of a TED.
+
+Set TED.instrumentation to an Instrumentation to receive them. When it is None
+(the default), no timings are taken at all.
+"""
+import bisect
+import math
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class FetchEvent(NamedTuple):
+    """Timings (in seconds) and size of a request to a gateway endpoint.
+
+    queued is the time spent waiting for the TED's request_limiters. connect,
+    wait (from sending the request to receiving the response headers) and
+    download are those of the last attempt, and are None if the transport
+    doesn't report them (or no new connection was made, for connect). hedged
+    is whether a second, hedged request was sent.
+    """
+
+    host: str
+    url: str
+    status: Optional[int]
+    size: int
+    attempts: int
+    duration: float
+    queued: float
+    connect: Optional[float]
+    wait: Optional[float]
+    download: Optional[float]
+    error: Optional[BaseException]
+    hedged: bool = False
+
+
+class Instrumentation:
+    """Receiver of the timings of a TED, which ignores all of them.
+
+    Subclasses override the methods for the events they are interested in.
+    Phases are "update" (the whole update), "config" (refreshing the
+    configuration), "topology" (rebuilding the MTU and Spyder lists) and
+    "derive" (decoding the snapshot).
+    """
+
+    def on_fetch(self, event: FetchEvent) -> None:
+        """Receive the outcome of a request, after any retries."""
+
+    def on_parse(self, host: str, url: str, size: int, duration: float) -> None:
+        """Receive the time spent parsing a response of size bytes."""
+
+    def on_phase(self, host: str, phase: str, duration: float) -> None:
+        """Receive the time spent in a phase of an update."""
+
+
+class RequestTrace:
+    """Collects the connection events reported by httpcore for one request."""
+
+    __slots__ = ("times",)
+
+    def __init__(self) -> None:
+        """Init the trace."""
+        self.times: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        """Record the time of an event (called through httpx's trace extension)."""
+        self.times[event_name] = time.perf_counter()
+
+    def _between(self, start: str, end: str) -> Optional[float]:
+        times = self.times
+        if start in times and end in times:
+            return times[end] - times[start]
+        return None
+
+    def phases(self) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """Return the connect, wait and download times of the request."""
+        for prefix in ("http11", "http2"):
+            wait = self._between(
+                prefix + ".send_request_headers.started",
+                prefix + ".receive_response_headers.complete",
+            )
+            if wait is not None:
+                break
+        return (
+            self._between(
+                "connection.connect_tcp.started", "connection.connect_tcp.complete"
+            ),
+            wait,
+            self._between(
+                prefix + ".receive_response_headers.complete",
+                prefix + ".receive_response_body.complete",
+            ),
+        )
+
+
+class Histogram:
+    """Histogram with logarithmically spaced buckets.
+
+    The buckets of durations start from 1µs (BOUNDS), and those of sizes from
+    1 byte (BYTE_BOUNDS).
+    """
+
+    # Upper bounds of the buckets, 4 per power of ten
+    BOUNDS = [10 ** (exp / 4) * 1e-6 for exp in range(4 * 14)]
+    BYTE_BOUNDS = [10 ** (exp / 4) for exp in range(4 * 10)]
+
+    def __init__(self, bounds: Optional[List[float]] = None) -> None:
+        """Init an empty histogram, with the buckets of durations by default."""
+        self.bounds = self.BOUNDS if bounds is None else bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        """Return the mean of the values."""
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Return an upper bound of the q-quantile (0 <= q <= 1) of the values."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+
+def _endpoint(url: str) -> str:
+    """Return the path of a url, which identifies the endpoint."""
+    return urlsplit(url).path
+
+
+class HistogramInstrumentation(Instrumentation):
+    """Aggregate every timing into in-memory histograms.
+
+    Histograms are keyed by (metric, endpoint path) for requests and parses,
+    and by (phase, "") for update phases. Metrics are "fetch", "queued",
+    "connect", "wait", "download", "bytes" and "parse". Retries and failed
+    requests, and hedged requests, are counted per endpoint path in retries,
+    errors and hedges.
+    """
+
+    def __init__(self) -> None:
+        """Init empty histograms."""
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.retries: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.hedges: Counter = Counter()
+
+    def histogram(self, metric: str, endpoint: str = "") -> Histogram:
+        """Return the histogram of a metric, creating it if necessary."""
+        key = (metric, endpoint)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            bounds = Histogram.BYTE_BOUNDS if metric == "bytes" else None
+            histogram = self.histograms[key] = Histogram(bounds)
+        return histogram
+
+    def on_fetch(self, event: FetchEvent) -> None:
+        """Add the timings of a request to the histograms."""
+        endpoint = _endpoint(event.url)
+        self.histogram("fetch", endpoint).observe(event.duration)
+        self.histogram("queued", endpoint).observe(event.queued)
+        for metric, value in (
+            ("connect", event.connect),
+            ("wait", event.wait),
+            ("download", event.download),
+        ):
+            if value is not None:
+                self.histogram(metric, endpoint).observe(value)
+        self.histogram("bytes", endpoint).observe(event.size)
+        if event.attempts > 1:
+            self.retries[endpoint] += event.attempts - 1
+        if event.error is not None:
+            self.errors[endpoint] += 1
+        if event.hedged:
+            self.hedges[endpoint] += 1
+
+    def on_parse(self, host: str, url: str, size: int, duration: float) -> None:
+        """Add the time spent parsing a response to the histograms."""
+        self.histogram("parse", _endpoint(url)).observe(duration)
+
+    def on_phase(self, host: str, phase: str, duration: float) -> None:
+        """Add the time spent in a phase to the histograms."""
+        self.histogram(phase).observe(duration)
+
+
+class Span(NamedTuple):
+    """A finished span, with times in nanoseconds since the epoch."""
+
+    name: str
+    start_time: int
+    end_time: int
+    attributes: Dict[str, Any]
+
+
+class SpanInstrumentation(Instrumentation):
+    """Report every timing as a span, in the style of OpenTelemetry.
+
+    If an OpenTelemetry tracer is given, the spans are started and ended on it
+    (with their real start and end times). Otherwise, the last max_spans
+    spans are kept in spans.
+    """
+
+    def __init__(self, tracer: Any = None, max_spans: int = 10000) -> None:
+        """Init the instrumentation."""
+        self.tracer = tracer
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def _emit(self, name: str, duration: float, attributes: Dict[str, Any]) -> None:
+        end_time = time.time_ns()
+        start_time = end_time - int(duration * 1e9)
+        if self.tracer is None:
+            self.spans.append(Span(name, start_time, end_time, attributes))
+            return
+        span = self.tracer.start_span(
+            name, start_time=start_time, attributes=attributes
+        )
+        span.end(end_time=end_time)
+
+    def on_fetch(self, event: FetchEvent) -> None:
+        """Report a request as a span."""
+        attributes: Dict[str, Any] = {
+            "server.address": event.host,
+            "url.full": event.url,
+            "http.response.body.size": event.size,
+            "tedpy.attempts": event.attempts,
+            "tedpy.queued": event.queued,
+            "tedpy.hedged": event.hedged,
+        }
+        if event.status is not None:
+            attributes["http.response.status_code"] = event.status
+        if event.error is not None:
+            attributes["error.type"] = type(event.error).__name__
+        for name in ("connect", "wait", "download"):
+            value = getattr(event, name)
+            if value is not None:
+                attributes["tedpy." + name] = value
+        self._emit("GET " + _endpoint(event.url), event.duration, attributes)
+
+    def on_parse(self, host: str, url: str, size: int, duration: float) -> None:
+        """Report the parsing of a response as a span."""
+        self._emit(
+            "parse " + _endpoint(url),
+            duration,
+            {"server.address": host, "url.full": url, "tedpy.size": size},
+        )
+
+    def on_phase(self, host: str, phase: str, duration: float) -> None:
+        """Report a phase of an update as a span."""
+        self._emit(phase, duration, {"server.address": host})
+
+
+class MultiInstrumentation(Instrumentation):
+    """Forward every timing to several instrumentations."""
+
+    def __init__(self, *instrumentations: Instrumentation) -> None:
+        """Init the instrumentation."""
+        self.instrumentations: List[Instrumentation] = list(instrumentations)
+
+    def on_fetch(self, event: FetchEvent) -> None:
+        """Forward a request's timings."""
+        for instrumentation in self.instrumentations:
+            instrumentation.on_fetch(event)
+
+    def on_parse(self, host: str, url: str, size: int, duration: float) -> None:
+        """Forward a parse's timings."""
+        for instrumentation in self.instrumentations:
+            instrumentation.on_parse(host, url, size, duration)
+
+    def on_phase(self, host: str, phase: str, duration: float) -> None:
+        """Forward a phase's timings."""
+        for instrumentation in self.instrumentations:
+            instrumentation.on_phase(host, phase, duration)
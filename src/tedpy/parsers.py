@@ -0,0 +1,217 @@
+"""Parsers for the live data documents returned by the TED endpoints.
+
+Each known document is parsed in one pass with the C ElementTree parser, and
+only the fields read by the TED classes are extracted and converted to ints.
+If a document does not match the expected schema (e.g. on an unknown firmware
+version), it is parsed with xmltodict instead.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TypeVar
+from xml.etree import ElementTree
+
+from .dataclasses import EnergyYield
+
+T = TypeVar("T")
+
+
+class LiveMtuData(NamedTuple):
+    """Live readings for a single TED5000 MTU."""
+
+    energy: EnergyYield
+    apparent_power: int
+    voltage: int  # Tenths of a volt
+
+
+class LiveData(NamedTuple):
+    """Live readings from the TED5000 LiveData.xml endpoint."""
+
+    gateway_time: datetime
+    total: EnergyYield
+    mtus: Dict[int, LiveMtuData]
+
+
+class MtuOverview(NamedTuple):
+    """Live readings for a single TED6000 MTU from SystemOverview.xml."""
+
+    value: int
+    apparent_power: int
+    power_factor: int  # Tenths of a percent
+    voltage: int  # Tenths of a volt
+
+
+class SpyderData(NamedTuple):
+    """Live readings from the TED6000 SpyderData.xml endpoint."""
+
+    total: Optional[EnergyYield]
+    groups: List[List[EnergyYield]]
+
+
+def _int(text: Optional[str]) -> int:
+    """Convert the text of an element to an int, treating empty text as 0."""
+    return int(text) if text else 0
+
+
+def _find(element: ElementTree.Element, path: str) -> ElementTree.Element:
+    """Return the subelement at path, raising ValueError if it is missing."""
+    found = element.find(path)
+    if found is None:
+        raise ValueError("missing element %s" % path)
+    return found
+
+
+def _field(element: ElementTree.Element, path: str) -> int:
+    """Return the int of the subelement at path, raising ValueError if it is missing."""
+    return _int(_find(element, path).text)
+
+
+def _energy(element: ElementTree.Element, now: str, tdy: str, mtd: str) -> EnergyYield:
+    return EnergyYield(_field(element, now), _field(element, tdy), _field(element, mtd))
+
+
+def parse_xml(text: str) -> Any:
+    """Parse a document into dicts with xmltodict, which is imported on first use."""
+    import xmltodict
+
+    return xmltodict.parse(text)
+
+
+def _with_fallback(
+    fallback: Callable[[Any], T]
+) -> Callable[[Callable[[ElementTree.Element], T]], Callable[[str], T]]:
+    """Use xmltodict and the fallback extractor if the fast parser fails."""
+
+    def decorator(parse: Callable[[ElementTree.Element], T]) -> Callable[[str], T]:
+        def wrapper(text: str) -> T:
+            try:
+                return parse(ElementTree.fromstring(text))
+            except (ElementTree.ParseError, AttributeError, TypeError, ValueError):
+                return fallback(parse_xml(text))
+
+        wrapper.__name__ = parse.__name__
+        wrapper.__doc__ = parse.__doc__
+        return wrapper
+
+    return decorator
+
+
+def _dict_energy(doc: Any, now: str, tdy: str, mtd: str) -> EnergyYield:
+    return EnergyYield(_int(doc[now]), _int(doc[tdy]), _int(doc[mtd]))
+
+
+def _dict_live_data(doc: Any) -> LiveData:
+    data = doc["LiveData"]
+    time = data["GatewayTime"]
+    mtus = {}
+    for key, power in data["Power"].items():
+        if key.startswith("MTU"):
+            mtus[int(key[3:])] = LiveMtuData(
+                _dict_energy(power, "PowerNow", "PowerTDY", "PowerMTD"),
+                _int(power["KVA"]),
+                _int(data["Voltage"][key]["VoltageNow"]),
+            )
+    return LiveData(
+        datetime(
+            _int(time["Year"]) + 2000,
+            _int(time["Month"]),
+            _int(time["Day"]),
+            _int(time["Hour"]),
+            _int(time["Minute"]),
+            _int(time["Second"]),
+        ),
+        _dict_energy(data["Power"]["Total"], "PowerNow", "PowerTDY", "PowerMTD"),
+        mtus,
+    )
+
+
+@_with_fallback(_dict_live_data)
+def parse_live_data(root: ElementTree.Element) -> LiveData:
+    """Parse the TED5000 LiveData.xml document."""
+    time = _find(root, "GatewayTime")
+    power = _find(root, "Power")
+    voltage = _find(root, "Voltage")
+    mtus = {}
+    for mtu in power:
+        if mtu.tag.startswith("MTU"):
+            mtus[int(mtu.tag[3:])] = LiveMtuData(
+                _energy(mtu, "PowerNow", "PowerTDY", "PowerMTD"),
+                _field(mtu, "KVA"),
+                _field(_find(voltage, mtu.tag), "VoltageNow"),
+            )
+    return LiveData(
+        datetime(
+            _field(time, "Year") + 2000,
+            _field(time, "Month"),
+            _field(time, "Day"),
+            _field(time, "Hour"),
+            _field(time, "Minute"),
+            _field(time, "Second"),
+        ),
+        _energy(_find(power, "Total"), "PowerNow", "PowerTDY", "PowerMTD"),
+        mtus,
+    )
+
+
+def _dict_dash_data(doc: Any) -> EnergyYield:
+    return _dict_energy(doc["DashData"], "Now", "TDY", "MTD")
+
+
+@_with_fallback(_dict_dash_data)
+def parse_dash_data(root: ElementTree.Element) -> EnergyYield:
+    """Parse the TED6000 DashData.xml document."""
+    if root.tag != "DashData":
+        raise ValueError("not a DashData document")
+    return _energy(root, "Now", "TDY", "MTD")
+
+
+def _dict_system_overview(doc: Any) -> Dict[int, MtuOverview]:
+    return {
+        int(key[3:]): MtuOverview(
+            _int(mtu["Value"]), _int(mtu["KVA"]), _int(mtu["PF"]), _int(mtu["Voltage"])
+        )
+        for key, mtu in doc["DialDataDetail"]["MTUVal"].items()
+    }
+
+
+@_with_fallback(_dict_system_overview)
+def parse_system_overview(root: ElementTree.Element) -> Dict[int, MtuOverview]:
+    """Parse the TED6000 SystemOverview.xml document."""
+    return {
+        int(mtu.tag[3:]): MtuOverview(
+            _field(mtu, "Value"),
+            _field(mtu, "KVA"),
+            _field(mtu, "PF"),
+            _field(mtu, "Voltage"),
+        )
+        for mtu in _find(root, "MTUVal")
+    }
+
+
+def _dict_spyder_data(doc: Any) -> SpyderData:
+    data = doc["SpyderData"]
+    spyders = data.get("Spyder") or []
+    if not isinstance(spyders, list):
+        spyders = [spyders]
+    groups = []
+    for spyder in spyders:
+        spyder_groups = spyder["Group"]
+        if not isinstance(spyder_groups, list):
+            spyder_groups = [spyder_groups]
+        groups.append([_dict_energy(g, "Now", "TDY", "MTD") for g in spyder_groups])
+    total = None
+    if data.get("DashData"):
+        total = _dict_energy(data["DashData"], "Now", "TDY", "MTD")
+    return SpyderData(total, groups)
+
+
+@_with_fallback(_dict_spyder_data)
+def parse_spyder_data(root: ElementTree.Element) -> SpyderData:
+    """Parse the TED6000 SpyderData.xml document."""
+    if root.tag != "SpyderData":
+        raise ValueError("not a SpyderData document")
+    groups = [
+        [_energy(group, "Now", "TDY", "MTD") for group in spyder.iterfind("Group")]
+        for spyder in root.iterfind("Spyder")
+    ]
+    dash = root.find("DashData")
+    total = None if dash is None else _energy(dash, "Now", "TDY", "MTD")
+    return SpyderData(total, groups)
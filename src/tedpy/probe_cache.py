@@ -0,0 +1,62 @@
+"""On-disk cache of the detected model of each TED host."""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProbeCacheEntry(NamedTuple):
+    """Detected model and gateway id of a host."""
+
+    model: str
+    gateway_id: Optional[str]
+
+
+class ProbeCache:
+    """JSON file mapping host names to their detected TED model.
+
+    createTED() skips model detection for hosts found in the cache. Entries
+    are never expired, so remove() a host after replacing its gateway.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """Init the cache, loading any entries already stored at path."""
+        self.path = Path(path)
+        self._entries: Dict[str, ProbeCacheEntry] = {}
+        try:
+            with open(self.path, "r") as read_in:
+                data = json.load(read_in)
+            self._entries = {
+                host: ProbeCacheEntry(entry["model"], entry.get("gateway_id"))
+                for host, entry in data.items()
+            }
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError, AttributeError):
+            _LOGGER.warning("Ignoring invalid TED probe cache %s", self.path)
+
+    def get(self, host: str) -> Optional[ProbeCacheEntry]:
+        """Return the cached entry for a host."""
+        return self._entries.get(host.lower())
+
+    def set(self, host: str, model: str, gateway_id: Optional[str]) -> None:
+        """Store the model of a host and write the cache to disk."""
+        self._entries[host.lower()] = ProbeCacheEntry(model, gateway_id)
+        self._save()
+
+    def remove(self, host: str) -> None:
+        """Forget a host and write the cache to disk."""
+        if self._entries.pop(host.lower(), None) is not None:
+            self._save()
+
+    def _save(self) -> None:
+        """Atomically replace the cache file with the current entries."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as write_out:
+            json.dump(
+                {host: e._asdict() for host, e in self._entries.items()}, write_out
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,100 @@
+"""Retry, timeout and circuit breaking policy for the requests of a TED."""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet, Mapping, Optional
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The deadline of an update passed before a request could be made."""
+
+
+class CircuitOpenError(Exception):
+    """Requests to a gateway are suspended after too many failures."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How requests are timed out, retried and hedged.
+
+    Every request is attempted up to attempts times, on transport errors,
+    timeouts and retry_statuses, waiting an exponentially increasing delay
+    (with full jitter) between attempts. Each attempt times out after the
+    timeout of its endpoint path (or timeout), and update() as a whole after
+    deadline seconds. Requests to hedged_endpoints that haven't completed
+    after hedge_after seconds are sent a second time, and the first response
+    wins. After failure_threshold consecutive failed requests, the circuit
+    breaker of the TED rejects requests for reset_timeout seconds.
+    """
+
+    attempts: int = 3
+    timeout: float = 30.0
+    endpoint_timeouts: Mapping[str, float] = field(default_factory=dict)
+    deadline: Optional[float] = None
+    backoff: float = 0.1
+    max_backoff: float = 2.0
+    jitter: bool = True
+    retry_statuses: FrozenSet[int] = frozenset({502, 503, 504})
+    hedge_after: Optional[float] = None
+    hedged_endpoints: FrozenSet[str] = frozenset({"/api/DashData.xml"})
+    failure_threshold: Optional[int] = None
+    reset_timeout: float = 30.0
+
+    def timeout_for(self, endpoint: str) -> float:
+        """Return the timeout of a request to an endpoint path."""
+        return self.endpoint_timeouts.get(endpoint, self.timeout)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Return the delay before retrying after a failed attempt (from 0)."""
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def new_breaker(self) -> Optional["CircuitBreaker"]:
+        """Return a circuit breaker for a gateway, if circuit breaking is on."""
+        if self.failure_threshold is None:
+            return None
+        return CircuitBreaker(self.failure_threshold, self.reset_timeout)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """Count the consecutive failures of a gateway to suspend requests to it.
+
+    The breaker opens after failure_threshold failures. Once reset_timeout
+    seconds have passed, it lets requests through again (half-open) until
+    one of them succeeds, closing it, or fails, opening it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        """Init the breaker in the closed state."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """Return "closed", "open" or "half-open"."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent."""
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the breaker if there were too many."""
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
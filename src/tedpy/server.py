@@ -0,0 +1,83 @@
+"""Minimal HTTP/1.1 server, serving the responses of a callback.
+
+It only reads the request line and the Connection header, which is all the
+exporter and the simulator need, and keeps connections alive between requests.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Status, content type and body of a response
+Response = Tuple[int, bytes, bytes]
+
+# Responds to the method and target of a request
+Handler = Callable[[str, str], Awaitable[Response]]
+
+_REASONS = {200: b"OK", 404: b"Not Found", 500: b"Internal Server Error"}
+
+
+class HttpServer:
+    """Serve the responses returned by handler for each request."""
+
+    def __init__(self, handler: Handler) -> None:
+        """Init the server. Serving starts with start()."""
+        self.handler = handler
+        self._server: Optional[asyncio.Server] = None
+        self._connections: Dict[asyncio.StreamWriter, "asyncio.Task[Any]"] = {}
+
+    @property
+    def address(self) -> str:
+        """Return the host:port the server listens on."""
+        if self._server is None:
+            raise RuntimeError("start() must be called first")
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return "{}:{}".format(host, port)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Start serving, on a free port unless one is given."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def close(self) -> None:
+        """Stop serving and close every open connection."""
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in self._connections:
+            writer.close()
+        await asyncio.gather(*self._connections.values(), return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer the requests sent over one connection."""
+        task = asyncio.current_task()
+        assert task is not None
+        self._connections[writer] = task
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    if header.lower().startswith(b"connection: close"):
+                        keep_alive = False
+                method, target = request_line.decode("latin-1").split(" ")[:2]
+                status, content_type, body = await self.handler(method, target)
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n"
+                    % (status, _REASONS[status], content_type, len(body))
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            del self._connections[writer]
+            writer.close()
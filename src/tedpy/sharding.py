@@ -0,0 +1,269 @@
+"""Poller spreading many TED gateways over a pool of worker processes.
+
+Hosts are assigned to workers by consistent hashing, so that changing the
+number of workers only moves a fraction of them. Each worker polls its shard
+with a TedFleet, parsing the responses itself, and sends every result to the
+parent through a pipe as a compact binary message rather than pickled objects.
+"""
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import struct
+import threading
+from datetime import datetime
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .dataclasses import EnergyYield, Power
+from .fleet import FleetResult, HostStats, TedFleet
+from .snapshot import TedSnapshot
+
+# Kinds of messages
+SNAPSHOT = 0
+ERROR = 1
+
+# kind, latency and length of the host, followed by the host
+_MESSAGE = struct.Struct("<BdH")
+# timestamp, gateway time, energy, consumption, production, MTU and ctgroup counts
+_SNAPSHOT = struct.Struct("<dd9iHH")
+# position, energy, apparent power, power factor and voltage
+_MTU = struct.Struct("<B3iidd")
+# spyder position, position and energy
+_CTGROUP = struct.Struct("<BB3i")
+
+
+class WorkerError(Exception):
+    """Error of a poll in a worker, with the type and message of the original."""
+
+
+class HashRing:
+    """Consistent hashing of keys (hosts) to nodes (workers).
+
+    Every node is placed at replicas points of the ring, and a key belongs to
+    the node of the first point at or after its hash.
+    """
+
+    def __init__(self, nodes: Iterable[int], replicas: int = 100) -> None:
+        """Init the ring of nodes."""
+        points = sorted(
+            (_hash("{}-{}".format(node, replica)), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        if not points:
+            raise ValueError("A hash ring needs at least one node")
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+
+    def node(self, key: str) -> int:
+        """Return the node of a key."""
+        index = bisect.bisect_left(self._hashes, _hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def encode_snapshot(snapshot: TedSnapshot) -> bytes:
+    """Return the binary form of a snapshot.
+
+    Its stale ages are not included, since they are keyed by endpoint and are
+    only set by partial updates.
+    """
+    mtu_power = snapshot.mtu_power
+    parts = [
+        _SNAPSHOT.pack(
+            snapshot.timestamp,
+            snapshot.gateway_time.timestamp(),
+            *snapshot.energy,
+            *snapshot.consumption,
+            *snapshot.production,
+            len(snapshot.mtu_energy),
+            len(snapshot.ctgroup_energy),
+        )
+    ]
+    for position, energy in snapshot.mtu_energy.items():
+        parts.append(_MTU.pack(position, *energy, *mtu_power[position]))
+    for (spyder, position), energy in snapshot.ctgroup_energy.items():
+        parts.append(_CTGROUP.pack(spyder, position, *energy))
+    return b"".join(parts)
+
+
+def decode_snapshot(data: bytes, offset: int = 0) -> TedSnapshot:
+    """Return the snapshot encoded in data at offset."""
+    fields = _SNAPSHOT.unpack_from(data, offset)
+    offset += _SNAPSHOT.size
+    mtu_energy: Dict[int, EnergyYield] = {}
+    mtu_power: Dict[int, Power] = {}
+    for _ in range(fields[11]):
+        position, now, daily, mtd, *power = _MTU.unpack_from(data, offset)
+        offset += _MTU.size
+        mtu_energy[position] = EnergyYield(now, daily, mtd)
+        mtu_power[position] = Power(*power)
+    ctgroup_energy: Dict[Tuple[int, int], EnergyYield] = {}
+    for _ in range(fields[12]):
+        spyder, position, *energy = _CTGROUP.unpack_from(data, offset)
+        offset += _CTGROUP.size
+        ctgroup_energy[(spyder, position)] = EnergyYield(*energy)
+    return TedSnapshot(
+        fields[0],
+        datetime.fromtimestamp(fields[1]),
+        EnergyYield(*fields[2:5]),
+        EnergyYield(*fields[5:8]),
+        EnergyYield(*fields[8:11]),
+        mtu_energy,
+        mtu_power,
+        ctgroup_energy,
+    )
+
+
+def encode_result(result: FleetResult) -> bytes:
+    """Return the message sent by a worker for the result of a poll."""
+    host = result.host.encode()
+    if result.snapshot is not None:
+        header = _MESSAGE.pack(SNAPSHOT, result.latency, len(host))
+        return header + host + encode_snapshot(result.snapshot)
+    error = "{}: {}".format(type(result.error).__name__, result.error).encode()
+    return _MESSAGE.pack(ERROR, result.latency, len(host)) + host + error
+
+
+def decode_result(data: bytes) -> FleetResult:
+    """Return the result of a poll sent by a worker. Its ted is always None."""
+    kind, latency, length = _MESSAGE.unpack_from(data)
+    offset = _MESSAGE.size + length
+    host = data[_MESSAGE.size : offset].decode()
+    if kind == SNAPSHOT:
+        return FleetResult(host, None, decode_snapshot(data, offset), None, latency)
+    error = WorkerError(data[offset:].decode())
+    return FleetResult(host, None, None, error, latency)
+
+
+def _work(hosts: List[str], options: Dict[str, Any], connection: Connection) -> None:
+    """Poll a shard of the gateways in a worker process, until terminated."""
+
+    async def poll() -> None:
+        async with TedFleet(hosts, **options) as fleet:
+            async for result in fleet:
+                connection.send_bytes(encode_result(result))
+
+    asyncio.run(poll())
+
+
+class ShardedFleet:
+    """Poll many TED gateways from a pool of worker processes.
+
+    The gateways are split between worker processes (one per CPU by
+    default), each polling its shard with a TedFleet configured with
+    fleet_options (such as interval). The results of every poll are yielded by
+    iterating over the fleet with `async for`, as FleetResults without a ted
+    (the TEDs stay in the workers) and with WorkerErrors as errors. If they
+    aren't consumed, only the latest max_queued results are kept.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        workers: Optional[int] = None,
+        max_queued: int = 1000,
+        **fleet_options: Any
+    ) -> None:
+        """Init the fleet. Polling starts with start() or `async with`."""
+        self.hosts = list(dict.fromkeys(host.lower() for host in hosts))
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.fleet_options = fleet_options
+        self.stats: Dict[str, HostStats] = {host: HostStats() for host in self.hosts}
+
+        ring = HashRing(range(self.workers))
+        self.shards: List[List[str]] = [[] for _ in range(self.workers)]
+        for host in self.hosts:
+            self.shards[ring.node(host)].append(host)
+
+        self._processes: List[Any] = []
+        self._connections: List[Connection] = []
+        self._readers: List[threading.Thread] = []
+        self._results: "Optional[asyncio.Queue[Optional[FleetResult]]]" = None
+
+    async def start(self) -> None:
+        """Start the worker processes."""
+        if self._processes:
+            return
+        loop = asyncio.get_event_loop()
+        self._results = asyncio.Queue()
+        # Forking a process running an event loop isn't safe
+        context = multiprocessing.get_context("spawn")
+        for shard in self.shards:
+            if not shard:
+                continue
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_work, args=(shard, self.fleet_options, sender), daemon=True
+            )
+            process.start()
+            sender.close()
+            reader = threading.Thread(
+                target=self._read, args=(receiver, loop), daemon=True
+            )
+            reader.start()
+            self._processes.append(process)
+            self._connections.append(receiver)
+            self._readers.append(reader)
+
+    def _read(self, connection: Connection, loop: asyncio.AbstractEventLoop) -> None:
+        """Decode the results sent by a worker, until it exits."""
+        while True:
+            try:
+                data = connection.recv_bytes()
+            except (EOFError, OSError):
+                return
+            loop.call_soon_threadsafe(self._publish, decode_result(data))
+
+    def _publish(self, result: FleetResult) -> None:
+        """Queue a result, dropping the oldest one if the queue is full."""
+        self.stats[result.host].record(result.latency, result.error)
+        assert self._results is not None
+        if self._results.qsize() >= self.max_queued:
+            self._results.get_nowait()
+        self._results.put_nowait(result)
+
+    async def close(self) -> None:
+        """Stop the worker processes."""
+        loop = asyncio.get_event_loop()
+        for process in self._processes:
+            process.terminate()
+        for process, reader in zip(self._processes, self._readers):
+            await loop.run_in_executor(None, process.join)
+            await loop.run_in_executor(None, reader.join)
+        for connection in self._connections:
+            connection.close()
+        self._processes = []
+        self._connections = []
+        self._readers = []
+        if self._results is not None:
+            self._results.put_nowait(None)
+
+    async def __aenter__(self) -> "ShardedFleet":
+        """Start polling when entering the context."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Stop polling when leaving the context."""
+        await self.close()
+
+    def __aiter__(self) -> "ShardedFleet":
+        """Iterate over the results of every poll."""
+        return self
+
+    async def __anext__(self) -> FleetResult:
+        """Return the next poll result, waiting for one if necessary."""
+        if self._results is None:
+            raise RuntimeError("start() must be called before reading results")
+        result = await self._results.get()
+        if result is None:
+            self._results.put_nowait(None)  # Wake up other iterators as well
+            raise StopAsyncIteration
+        return result
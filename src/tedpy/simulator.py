@@ -0,0 +1,411 @@
+"""Local simulator of TED5000 and TED6000 gateways, for tests and load tests.
+
+Each SimulatedGateway serves the gateway API over HTTP on a local port. The
+documents are rendered from templates laid out like tests/fixtures, with the
+readings replaced by values that evolve over time. Latency and failures can be
+injected to exercise the client under adverse conditions.
+
+Run `python -m tedpy.simulator --count 100` to serve many gateways at once.
+"""
+import argparse
+import asyncio
+import copy
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+from urllib.parse import parse_qsl, urlsplit
+from xml.etree import ElementTree
+
+from .dataclasses import EnergyYield
+from .server import HttpServer, Response
+
+Element = ElementTree.Element
+
+# Period of the simulated variations of power, in seconds
+PERIOD = 300.0
+
+# Readings of MTUs that are not connected in the templates, in tenths
+DEFAULT_VOLTAGE = 1200
+DEFAULT_POWER_FACTOR = 950
+
+
+class _Channel:
+    """Simulated readings of one MTU, ctgroup or total."""
+
+    __slots__ = ("base", "phase", "daily", "mtd", "kva_ratio")
+
+    def __init__(
+        self, rng: random.Random, now: int, daily: int, mtd: int, kva: int = 0
+    ) -> None:
+        """Init the channel, starting from the given readings."""
+        self.base = now or rng.randint(100, 5000)
+        self.phase = rng.uniform(0, 2 * math.pi)
+        self.daily = daily
+        self.mtd = mtd
+        self.kva_ratio = kva / now if now and kva else rng.uniform(1.0, 1.2)
+
+    def reading(self, elapsed: float) -> EnergyYield:
+        """Return the readings after elapsed seconds."""
+        now = self.base * (
+            1 + 0.2 * math.sin(2 * math.pi * elapsed / PERIOD + self.phase)
+        )
+        used = int(self.base * elapsed / 3600)
+        return EnergyYield(int(now), self.daily + used, self.mtd + used)
+
+
+def _sum(readings: Sequence[EnergyYield]) -> EnergyYield:
+    return EnergyYield(
+        sum(r.now for r in readings),
+        sum(r.daily for r in readings),
+        sum(r.mtd for r in readings),
+    )
+
+
+def _element(root: Element, path: str) -> Element:
+    found = root.find(path)
+    if found is None:
+        raise ValueError("missing element {} in template".format(path))
+    return found
+
+
+def _int(element: Element, path: str) -> int:
+    return int(element.findtext(path) or 0)
+
+
+def _compile(root: Element, fields: Sequence[Element]) -> str:
+    """Serialize a document, replacing the text of fields with placeholders.
+
+    The result is formatted with str.format(), one argument per field.
+    """
+    for element in root.iter():
+        if element.text:
+            element.text = element.text.replace("{", "{{").replace("}", "}}")
+    for index, element in enumerate(fields):
+        element.text = "{%d}" % index
+    return ElementTree.tostring(root, encoding="unicode")
+
+
+class SimulatedGateway:
+    """HTTP server imitating a single TED gateway."""
+
+    def __init__(
+        self,
+        templates: Union[str, Path],
+        model: str = "TED6000",
+        mtus: int = 3,
+        spyders: int = 1,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Init the gateway with up to 4 MTUs (and for a TED6000, spyders).
+
+        templates is a directory containing ted5000/ and ted6000/ documents
+        laid out like tests/fixtures. Each response is delayed by latency
+        seconds (normally distributed with a standard deviation of
+        latency_jitter), and failure_rate of the responses are errors.
+        """
+        if model not in ("TED5000", "TED6000"):
+            raise ValueError("unknown model {}".format(model))
+        if not 1 <= mtus <= 4:
+            raise ValueError("a gateway supports 1 to 4 MTUs")
+        if model == "TED6000" and not 0 <= spyders <= mtus:
+            raise ValueError("a gateway supports at most one spyder per MTU")
+
+        self.model = model
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.requests: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._templates = Path(templates) / model.lower()
+        self._start = time.monotonic()
+        self._server = HttpServer(self._respond)
+        self._routes: Dict[str, Callable[[Dict[str, str]], str]] = {}
+        if model == "TED5000":
+            self._init_ted5000(mtus)
+        else:
+            self._init_ted6000(mtus, spyders)
+
+    def _load(self, name: str) -> Element:
+        return ElementTree.parse(self._templates / name).getroot()
+
+    def _set_gateway_id(self, settings: Element) -> None:
+        gateway_id = settings.find("Gateway/GatewayID")
+        if gateway_id is not None:
+            gateway_id.text = "%06X" % self._rng.getrandbits(24)
+
+    def _init_ted5000(self, mtus: int) -> None:
+        settings = self._load("systemSettings.xml")
+        settings.findall("NumberMTU")[0].text = str(mtus)
+        self._set_gateway_id(settings)
+        settings_text = ElementTree.tostring(settings, encoding="unicode")
+
+        live = self._load("liveData.xml")
+        positions = range(1, mtus + 1)
+        self._mtus = [
+            _Channel(
+                self._rng,
+                _int(live, "Power/MTU%d/PowerNow" % i),
+                _int(live, "Power/MTU%d/PowerTDY" % i),
+                _int(live, "Power/MTU%d/PowerMTD" % i),
+                _int(live, "Power/MTU%d/KVA" % i),
+            )
+            for i in positions
+        ]
+        self._voltages = [
+            _int(live, "Voltage/MTU%d/VoltageNow" % i) or DEFAULT_VOLTAGE
+            for i in positions
+        ]
+        fields = [_element(live, "GatewayTime/" + name) for name in _TIME_FIELDS]
+        for name in ("Total", *("MTU%d" % i for i in positions)):
+            power = _element(live, "Power/" + name)
+            fields += [_element(power, n) for n in ("PowerNow", "PowerTDY", "PowerMTD")]
+            if name != "Total":
+                fields += [
+                    _element(power, "KVA"),
+                    _element(live, "Voltage/%s/VoltageNow" % name),
+                ]
+        live_template = _compile(live, fields)
+
+        def live_data(query: Dict[str, str]) -> str:
+            elapsed = time.monotonic() - self._start
+            now = datetime.now()
+            values: List[Any] = [
+                now.hour,
+                now.minute,
+                now.month,
+                now.day,
+                now.year % 100,
+                now.second,
+            ]
+            readings = [mtu.reading(elapsed) for mtu in self._mtus]
+            values += _sum(readings)
+            for mtu, reading, voltage in zip(self._mtus, readings, self._voltages):
+                kva = int(reading.now * mtu.kva_ratio)
+                values += (*reading, kva, voltage + self._rng.randint(-5, 5))
+            return live_template.format(*values)
+
+        self._routes = {
+            "/api/SystemSettings.xml": lambda query: settings_text,
+            "/api/LiveData.xml": live_data,
+        }
+
+    def _init_ted6000(self, mtus: int, spyders: int) -> None:
+        settings = self._load("systemSettings.xml")
+        settings.findall("NumberMTU")[0].text = str(mtus)
+        self._set_gateway_id(settings)
+        spyder_settings = _element(settings, "Spyders")
+        slots = list(spyder_settings)
+        for index, slot in enumerate(slots[:spyders]):
+            if index > 0:  # Configure every spyder like the first one
+                spyder_settings.remove(slot)
+                slot = copy.deepcopy(slots[0])
+                spyder_settings.insert(index, slot)
+            slot.findall("Enabled")[0].text = "1"
+        for slot in slots[spyders:]:
+            slot.findall("Enabled")[0].text = "0"
+        settings_text = ElementTree.tostring(settings, encoding="unicode")
+
+        overview = self._load("systemOverview.xml")
+        dashes = {}
+        for i in range(1, mtus + 1):
+            path = self._templates / ("dashData_mtu%d.xml" % i)
+            if path.exists():
+                dashes[i] = ElementTree.parse(path).getroot()
+        self._mtus = [
+            _Channel(
+                self._rng,
+                _int(overview, "MTUVal/MTU%d/Value" % i),
+                _int(dashes[i], "TDY") if i in dashes else 0,
+                _int(dashes[i], "MTD") if i in dashes else 0,
+                _int(overview, "MTUVal/MTU%d/KVA" % i),
+            )
+            for i in range(1, mtus + 1)
+        ]
+        self._power = [
+            (
+                _int(overview, "MTUVal/MTU%d/PF" % i) or DEFAULT_POWER_FACTOR,
+                _int(overview, "MTUVal/MTU%d/Voltage" % i) or DEFAULT_VOLTAGE,
+            )
+            for i in range(1, mtus + 1)
+        ]
+        mtu_values = _element(overview, "MTUVal")
+        fields = []
+        for mtu in list(mtu_values)[:mtus]:
+            fields += [
+                _element(mtu, name) for name in ("Value", "KVA", "PF", "Voltage")
+            ]
+        for mtu in list(mtu_values)[mtus:]:
+            mtu_values.remove(mtu)
+        overview_template = _compile(overview, fields)
+
+        spyder_data = self._load("spyderData.xml")
+        template_spyders = spyder_data.findall("Spyder")
+        for spyder in template_spyders[spyders:]:
+            spyder_data.remove(spyder)
+        self._ctgroups = [
+            [
+                _Channel(self._rng, 0, _int(group, "TDY"), _int(group, "MTD"))
+                for group in spyder.iterfind("Group")
+            ]
+            for spyder in template_spyders[:spyders]
+        ]
+        dash = spyder_data.find("DashData")
+        fields = [] if dash is None else [_element(dash, n) for n in _DASH_FIELDS]
+        for spyder in template_spyders[:spyders]:
+            for group in spyder.iterfind("Group"):
+                fields += [_element(group, n) for n in _DASH_FIELDS]
+        spyder_template = _compile(spyder_data, fields)
+
+        dash_data = self._load("dashData_total.xml")
+        dash_template = _compile(
+            dash_data, [_element(dash_data, n) for n in _DASH_FIELDS]
+        )
+
+        def system_overview(query: Dict[str, str]) -> str:
+            elapsed = time.monotonic() - self._start
+            values: List[int] = []
+            for mtu, (pf, voltage) in zip(self._mtus, self._power):
+                now = mtu.reading(elapsed).now
+                kva = int(now * mtu.kva_ratio)
+                values += (now, kva, pf, voltage + self._rng.randint(-5, 5))
+            return overview_template.format(*values)
+
+        def spyder_data_(query: Dict[str, str]) -> str:
+            elapsed = time.monotonic() - self._start
+            groups = [[g.reading(elapsed) for g in s] for s in self._ctgroups]
+            values: List[int] = []
+            if dash is not None:
+                values += _sum([g for spyder in groups for g in spyder])
+            for spyder in groups:
+                for reading in spyder:
+                    values += reading
+            return spyder_template.format(*values)
+
+        def dash_data_(query: Dict[str, str]) -> str:
+            elapsed = time.monotonic() - self._start
+            if query.get("D") == "255":
+                mtu = int(query.get("M", 0))
+                if not 1 <= mtu <= len(self._mtus):
+                    return dash_template.format(0, 0, 0)
+                return dash_template.format(*self._mtus[mtu - 1].reading(elapsed))
+            if query.get("D") == "2":  # Generation is not simulated
+                return dash_template.format(0, 0, 0)
+            total = _sum([mtu.reading(elapsed) for mtu in self._mtus])
+            return dash_template.format(*total)
+
+        self._routes = {
+            "/api/SystemSettings.xml": lambda query: settings_text,
+            "/api/Rate.xml": lambda query: "<Rate><Time>%d</Time></Rate>" % time.time(),
+            "/api/SystemOverview.xml": system_overview,
+            "/api/SpyderData.xml": spyder_data_,
+            "/api/DashData.xml": dash_data_,
+        }
+
+    def render(self, target: str) -> Optional[str]:
+        """Return the document served at target, or None if there is none."""
+        url = urlsplit(target)
+        route = self._routes.get(url.path)
+        if route is None:
+            return None
+        return route(dict(parse_qsl(url.query)))
+
+    @property
+    def address(self) -> str:
+        """Return the host:port to pass to createTED() or TedFleet."""
+        return self._server.address
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Start serving, on a free port unless one is given."""
+        await self._server.start(host, port)
+
+    async def close(self) -> None:
+        """Stop serving and close every open connection."""
+        await self._server.close()
+
+    async def __aenter__(self) -> "SimulatedGateway":
+        """Start serving when entering the context."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Stop serving when leaving the context."""
+        await self.close()
+
+    async def _respond(self, method: str, target: str) -> Response:
+        """Return the response to a request, after the injected latency."""
+        self.requests[urlsplit(target).path] += 1
+        if self.latency or self.latency_jitter:
+            delay = self._rng.gauss(self.latency, self.latency_jitter)
+            await asyncio.sleep(max(delay, 0.0))
+        if self._rng.random() < self.failure_rate:
+            return 500, b"text/xml", b""
+        document = self.render(target)
+        if document is None:
+            return 404, b"text/xml", b""
+        return 200, b"text/xml", document.encode()
+
+
+_TIME_FIELDS = ("Hour", "Minute", "Month", "Day", "Year", "Second")
+_DASH_FIELDS = ("Now", "TDY", "MTD")
+
+
+async def start_gateways(count: int, **kwargs: Any) -> List[SimulatedGateway]:
+    """Start count simulated gateways, passing kwargs to each."""
+    seed = kwargs.pop("seed", None)
+    gateways = [
+        SimulatedGateway(seed=None if seed is None else seed + i, **kwargs)
+        for i in range(count)
+    ]
+    for gateway in gateways:
+        await gateway.start()
+    return gateways
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    gateways = [
+        SimulatedGateway(
+            args.templates,
+            args.model,
+            args.mtus,
+            args.spyders,
+            args.latency,
+            args.latency_jitter,
+            args.failure_rate,
+            i,
+        )
+        for i in range(args.count)
+    ]
+    for i, gateway in enumerate(gateways):
+        await gateway.start(args.host, args.port + i if args.port else 0)
+        print(gateway.address, flush=True)
+    await asyncio.Event().wait()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Serve simulated gateways until interrupted, printing their addresses."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", default="tests/fixtures")
+    parser.add_argument("--model", choices=["TED5000", "TED6000"], default="TED6000")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="first port to use")
+    parser.add_argument("--mtus", type=int, default=3)
+    parser.add_argument("--spyders", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    try:
+        asyncio.run(_serve(parser.parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
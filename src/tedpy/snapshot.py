@@ -0,0 +1,153 @@
+"""Immutable snapshot of the readings decoded from a TED update."""
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, FrozenSet, Mapping, NamedTuple, Optional, Tuple, TypeVar
+
+from .dataclasses import EnergyYield, Power
+
+K = TypeVar("K")
+
+_NOTHING_STALE: Mapping[Any, float] = MappingProxyType({})
+
+
+class TedSnapshot:
+    """Readings for the system, every MTU and every ctgroup at one point in time.
+
+    MTUs are keyed by their position, and ctgroups by a tuple of their spyder's
+    position and their own position.
+
+    If some endpoints failed in a partial update (see TED.partial_updates),
+    stale maps them (as (attr, params) tuples) to the age in seconds of their
+    data, which is from the last update where they succeeded.
+    """
+
+    __slots__ = (
+        "timestamp",
+        "gateway_time",
+        "energy",
+        "consumption",
+        "production",
+        "mtu_energy",
+        "mtu_power",
+        "ctgroup_energy",
+        "stale",
+    )
+
+    timestamp: float
+    gateway_time: datetime
+    energy: EnergyYield
+    consumption: EnergyYield
+    production: EnergyYield
+    mtu_energy: Mapping[int, EnergyYield]
+    mtu_power: Mapping[int, Power]
+    ctgroup_energy: Mapping[Tuple[int, int], EnergyYield]
+    stale: Mapping[Any, float]
+
+    def __init__(
+        self,
+        timestamp: float,
+        gateway_time: datetime,
+        energy: EnergyYield,
+        consumption: EnergyYield,
+        production: EnergyYield,
+        mtu_energy: Mapping[int, EnergyYield],
+        mtu_power: Mapping[int, Power],
+        ctgroup_energy: Mapping[Tuple[int, int], EnergyYield],
+        stale: Optional[Mapping[Any, float]] = None,
+    ) -> None:
+        """Init the snapshot, taking ownership of (not copying) the mappings.
+
+        Mappings from a previous snapshot may be passed in to share them.
+        """
+        setattr_ = object.__setattr__
+        setattr_(self, "timestamp", timestamp)
+        setattr_(self, "gateway_time", gateway_time)
+        setattr_(self, "energy", energy)
+        setattr_(self, "consumption", consumption)
+        setattr_(self, "production", production)
+        setattr_(self, "mtu_energy", _readonly(mtu_energy))
+        setattr_(self, "mtu_power", _readonly(mtu_power))
+        setattr_(self, "ctgroup_energy", _readonly(ctgroup_energy))
+        setattr_(self, "stale", _NOTHING_STALE if not stale else _readonly(stale))
+
+    def replace(self, **changes: Any) -> "TedSnapshot":
+        """Return a new snapshot with some fields replaced, sharing the rest."""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return TedSnapshot(**fields)
+
+    def same_readings(self, other: "TedSnapshot") -> bool:
+        """Return whether both snapshots hold the same readings, ignoring time."""
+        return (
+            self.energy == other.energy
+            and self.consumption == other.consumption
+            and self.production == other.production
+            and self.mtu_energy == other.mtu_energy
+            and self.mtu_power == other.mtu_power
+            and self.ctgroup_energy == other.ctgroup_energy
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Disallow modifying the snapshot."""
+        raise AttributeError("TedSnapshot is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        """Disallow modifying the snapshot."""
+        raise AttributeError("TedSnapshot is immutable")
+
+    def __repr__(self) -> str:
+        """Return a representation of the system readings."""
+        return "TedSnapshot(timestamp={}, energy={}, consumption={}, production={})".format(
+            self.timestamp, self.energy, self.consumption, self.production
+        )
+
+
+def _readonly(mapping: Mapping[K, Any]) -> Mapping[K, Any]:
+    """Return a read-only view of a mapping, unless it already is one."""
+    if isinstance(mapping, MappingProxyType):
+        return mapping
+    return MappingProxyType(mapping)  # type: ignore
+
+
+class TedChanges(NamedTuple):
+    """Parts of the readings that changed between two consecutive snapshots."""
+
+    config: bool
+    system: bool
+    mtus: FrozenSet[int]
+    ctgroups: FrozenSet[Tuple[int, int]]
+
+    def __bool__(self) -> bool:
+        """Return whether anything changed."""
+        return self.config or self.system or bool(self.mtus) or bool(self.ctgroups)
+
+
+def _changed_keys(old: Mapping[K, Any], new: Mapping[K, Any]) -> FrozenSet[K]:
+    """Return the keys whose values differ between two mappings."""
+    if old is new:  # Shared because the underlying data didn't change
+        return frozenset()
+    return frozenset(
+        key for key in old.keys() | new.keys() if old.get(key) != new.get(key)
+    )
+
+
+def diff_snapshots(
+    old: Optional[TedSnapshot], new: TedSnapshot, config_changed: bool = False
+) -> TedChanges:
+    """Return which parts of the readings changed from old to new."""
+    if old is None:
+        return TedChanges(
+            True,
+            True,
+            frozenset(new.mtu_energy),
+            frozenset(new.ctgroup_energy),
+        )
+    return TedChanges(
+        config_changed,
+        old.energy != new.energy
+        or old.consumption != new.consumption
+        or old.production != new.production,
+        _changed_keys(old.mtu_energy, new.mtu_energy)
+        | _changed_keys(old.mtu_power, new.mtu_power),
+        _changed_keys(old.ctgroup_energy, new.ctgroup_energy),
+    )
@@ -0,0 +1,265 @@
+"""Append-only binary log of the readings of many TEDs, for long histories.
+
+Every snapshot is written as fixed-width records: one for the system, one per
+MTU and one per ctgroup. Records are buffered and appended to one file per
+gateway and UTC day, and read back through memory maps, bisecting on the
+timestamps so that a time window only touches the pages it covers.
+"""
+import bisect
+import mmap
+import os
+import re
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Generator, Iterator, List, NamedTuple, Optional, Union
+
+from .snapshot import TedSnapshot
+
+MAGIC = b"TEDLOG\x00\x01"
+
+# Kinds of records
+SYSTEM = 0
+MTU = 1
+CTGROUP = 2
+
+# The power factor (signed) and voltage are stored in tenths, clamped to the
+# range of their fields (a power factor computed from a small KVA can exceed it)
+RECORD = struct.Struct("<dBBBxiiiihH")
+_TIMESTAMP = struct.Struct("<d")
+
+
+class LogRecord(NamedTuple):
+    """A reading of the system, an MTU or a ctgroup.
+
+    spyder is only set for ctgroups, and the power fields only for MTUs.
+    """
+
+    timestamp: float
+    kind: int
+    spyder: int
+    position: int
+    now: int
+    daily: int
+    mtd: int
+    apparent_power: int
+    power_factor: float
+    voltage: float
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return min(max(value, low), high)
+
+
+def _gateway_dir(gateway: str) -> str:
+    """Return the directory name of a gateway (such as a host:port)."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", gateway)
+
+
+def _day(timestamp: float) -> str:
+    """Return the UTC day of a timestamp, which names the file of its records."""
+    return time.strftime("%Y%m%d", time.gmtime(timestamp))
+
+
+class _Writer:
+    """Buffered appender of the records of one gateway."""
+
+    __slots__ = ("directory", "buffer", "day", "day_end", "flushed")
+
+    def __init__(self, directory: Path) -> None:
+        """Init the writer, with nothing buffered."""
+        self.directory = directory
+        self.buffer = bytearray()
+        self.day = ""
+        self.day_end = 0.0
+        self.flushed = time.monotonic()
+
+    def flush(self) -> None:
+        """Append the buffered records to the file of their day."""
+        if self.buffer:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / (self.day + ".tedlog"), "ab") as log:
+                if log.tell() == 0:
+                    log.write(MAGIC)
+                log.write(self.buffer)
+            self.buffer.clear()
+        self.flushed = time.monotonic()
+
+
+class ReadingLog:
+    """Log of the readings of many gateways in a directory.
+
+    Set TED.reading_log to an instance to append every snapshot produced by
+    update(). Records are written once flush_bytes of them are buffered for a
+    gateway, or flush_interval seconds after its last write, and by flush()
+    and close(). A record takes RECORD.size (32) bytes.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        flush_bytes: int = 64 * 1024,
+        flush_interval: float = 10.0,
+    ) -> None:
+        """Init the log, creating directory when the first records are written."""
+        self.directory = Path(directory)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._writers: Dict[str, _Writer] = {}
+
+    def append(self, gateway: str, snapshot: TedSnapshot) -> None:
+        """Add the readings of a snapshot of a gateway."""
+        writer = self._writers.get(gateway)
+        if writer is None:
+            writer = _Writer(self.directory / _gateway_dir(gateway))
+            self._writers[gateway] = writer
+        timestamp = snapshot.timestamp
+        if timestamp >= writer.day_end or not writer.day:
+            writer.flush()  # Records of a new day go to a new file
+            writer.day = _day(timestamp)
+            writer.day_end = (timestamp // 86400 + 1) * 86400
+
+        # Packed apart, so that a snapshot that fails to pack isn't partly logged
+        buffer = bytearray()
+        pack = RECORD.pack
+        buffer += pack(timestamp, SYSTEM, 0, 0, *snapshot.energy, 0, 0, 0)
+        mtu_power = snapshot.mtu_power
+        for position, energy in snapshot.mtu_energy.items():
+            power = mtu_power[position]
+            buffer += pack(
+                timestamp,
+                MTU,
+                0,
+                position,
+                *energy,
+                power.apparent_power,
+                _clamp(round(power.power_factor * 10), -0x8000, 0x7FFF),
+                _clamp(round(power.voltage * 10), 0, 0xFFFF),
+            )
+        for (spyder, position), energy in snapshot.ctgroup_energy.items():
+            buffer += pack(timestamp, CTGROUP, spyder, position, *energy, 0, 0, 0)
+        writer.buffer += buffer
+
+        if (
+            len(writer.buffer) >= self.flush_bytes
+            or time.monotonic() - writer.flushed >= self.flush_interval
+        ):
+            writer.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records of every gateway."""
+        for writer in self._writers.values():
+            writer.flush()
+
+    def close(self) -> None:
+        """Write the buffered records."""
+        self.flush()
+
+    def gateways(self) -> List[str]:
+        """Return the (directory names of the) gateways in the log."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(path.name for path in self.directory.iterdir() if path.is_dir())
+
+    def query(
+        self,
+        gateway: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        kind: Optional[int] = None,
+    ) -> Generator[LogRecord, None, None]:
+        """Yield the records of a gateway with start <= timestamp < end.
+
+        Only the records of kind are yielded if it is given. Records still
+        buffered for the gateway are written first.
+        """
+        for view in self._windows(gateway, start, end):
+            with view:
+                for fields in RECORD.iter_unpack(view):
+                    if kind is None or fields[1] == kind:
+                        yield LogRecord._make(
+                            (*fields[:8], fields[8] / 10, fields[9] / 10)
+                        )
+
+    def as_numpy(
+        self, gateway: str, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Any:
+        """Return the records as a NumPy structured array (requires numpy).
+
+        The power factor and voltage are in tenths, as stored.
+        """
+        import numpy
+
+        dtype = numpy.dtype(
+            {
+                "names": LogRecord._fields,
+                "formats": ["<f8", "u1", "u1", "u1", "<i4", "<i4", "<i4", "<i4"]
+                + ["<i2", "<u2"],
+                "offsets": [0, 8, 9, 10, 12, 16, 20, 24, 28, 30],
+                "itemsize": RECORD.size,
+            }
+        )
+        arrays = []
+        for view in self._windows(gateway, start, end):
+            with view:
+                arrays.append(numpy.frombuffer(view, dtype).copy())
+        if not arrays:
+            return numpy.empty(0, dtype)
+        return numpy.concatenate(arrays)
+
+    def _windows(
+        self, gateway: str, start: Optional[float], end: Optional[float]
+    ) -> Iterator[memoryview]:
+        """Yield views of the mapped records in the window, file by file."""
+        writer = self._writers.get(gateway)
+        if writer is not None:
+            writer.flush()
+        directory = self.directory / _gateway_dir(gateway)
+        if not directory.is_dir():
+            return
+        first_day = None if start is None else _day(start)
+        last_day = None if end is None else _day(end)
+        for path in sorted(directory.glob("*.tedlog")):
+            day = path.stem
+            if (first_day is not None and day < first_day) or (
+                last_day is not None and day > last_day
+            ):
+                continue
+            size = os.path.getsize(path)
+            # A partly written last record (after a crash) is ignored
+            count = (size - len(MAGIC)) // RECORD.size
+            if count <= 0:
+                continue
+            with open(path, "rb") as log, mmap.mmap(
+                log.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                if mapped[: len(MAGIC)] != MAGIC:
+                    raise ValueError("{} is not a reading log".format(path))
+                records = memoryview(mapped)[len(MAGIC) :]
+                try:
+                    timestamps = _Timestamps(records, count)
+                    low = 0 if start is None else bisect.bisect_left(timestamps, start)
+                    high = count if end is None else bisect.bisect_left(timestamps, end)
+                    if low < high:
+                        yield records[low * RECORD.size : high * RECORD.size]
+                finally:
+                    records.release()
+
+
+class _Timestamps:
+    """Sequence of the timestamps of mapped records, for bisect."""
+
+    __slots__ = ("records", "count")
+
+    def __init__(self, records: memoryview, count: int) -> None:
+        """Init the sequence of the first count records."""
+        self.records = records
+        self.count = count
+
+    def __len__(self) -> int:
+        """Return the number of records."""
+        return self.count
+
+    def __getitem__(self, index: int) -> float:
+        """Return the timestamp of a record."""
+        return _TIMESTAMP.unpack_from(self.records, index * RECORD.size)[0]
@@ -0,0 +1,99 @@
+"""Scheduled streaming of snapshots from a TED."""
+from __future__ import annotations
+
+import asyncio
+import math
+from enum import Enum
+from typing import TYPE_CHECKING, AsyncGenerator, Optional, Union
+
+from .snapshot import TedSnapshot
+
+if TYPE_CHECKING:
+    from .ted import TED
+
+
+class Backpressure(Enum):
+    """What to do with new snapshots when the consumer falls behind."""
+
+    DROP_OLDEST = "drop_oldest"  # Discard the oldest queued snapshot
+    LATEST_ONLY = "latest_only"  # Only keep the most recent snapshot
+    BLOCK = "block"  # Pause polling until the consumer catches up
+
+
+def next_deadline(now: float, interval: float) -> float:
+    """Return the first multiple of interval (which must be positive) after now."""
+    return (math.floor(now / interval) + 1) * interval
+
+
+def stream(
+    ted: TED,
+    interval: Optional[float] = None,
+    backpressure: Backpressure = Backpressure.LATEST_ONLY,
+    maxsize: int = 16,
+    only_changed: bool = False,
+) -> AsyncGenerator[TedSnapshot, None]:
+    """Poll the TED on a fixed schedule and yield each snapshot.
+
+    Polls are aligned to multiples of interval on the event loop clock, so the
+    time spent fetching doesn't cause drift; polls that would start late are
+    skipped. If interval is None, the gateway's polling delay (or 1 second,
+    if longer) is used. Polling runs in a separate task, so a slow consumer
+    doesn't delay it; queued snapshots are handled according to backpressure.
+    If only_changed is set, snapshots whose readings equal the previously
+    yielded ones are skipped. Errors raised by update() end the stream.
+    """
+    # Checked here, since the generator only runs once iterated
+    if interval is not None and interval <= 0:
+        raise ValueError("interval must be positive")
+    return _stream(ted, interval, backpressure, maxsize, only_changed)
+
+
+async def _stream(
+    ted: TED,
+    interval: Optional[float],
+    backpressure: Backpressure,
+    maxsize: int,
+    only_changed: bool,
+) -> AsyncGenerator[TedSnapshot, None]:
+    loop = asyncio.get_event_loop()
+    size = 1 if backpressure == Backpressure.LATEST_ONLY else maxsize
+    queue: asyncio.Queue[Union[TedSnapshot, Exception]] = asyncio.Queue(size)
+
+    async def publish(item: Union[TedSnapshot, Exception]) -> None:
+        if backpressure == Backpressure.BLOCK:
+            await queue.put(item)
+            return
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def produce() -> None:
+        period = interval
+        last: Optional[TedSnapshot] = None
+        while True:
+            try:
+                await ted.update()
+            except Exception as err:
+                await publish(err)
+                return
+            snapshot = ted.snapshot
+            assert snapshot is not None
+            if not (only_changed and last is not None and snapshot.same_readings(last)):
+                last = snapshot
+                await publish(snapshot)
+
+            if period is None:
+                period = max(ted.polling_delay, 1.0)
+            now = loop.time()
+            await asyncio.sleep(next_deadline(now, period) - now)
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
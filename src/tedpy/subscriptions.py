@@ -0,0 +1,293 @@
+"""Subscriptions to changes of single readings, with deadbands and bands.
+
+Subscriptions are indexed by the part they watch (the system, an MTU or a
+ctgroup) and by field, and only the parts listed in the TedChanges of an
+update are looked up, so the work per update grows with what changed rather
+than with the number of MTUs, ctgroups or subscriptions.
+"""
+import asyncio
+import logging
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .snapshot import TedChanges, TedSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+# Parts of the readings
+SYSTEM = "system"
+MTU = "mtu"
+CTGROUP = "ctgroup"
+
+_ENERGY_FIELDS = ("now", "daily", "mtd")
+_POWER_FIELDS = ("apparent_power", "power_factor", "voltage")
+
+Getter = Callable[[TedSnapshot, Any], Any]
+
+
+def _total(name: str, index: int) -> Getter:
+    """Return the getter of a field of a system total."""
+    return lambda snapshot, key: getattr(snapshot, name)[index]
+
+
+def _reading(name: str, index: int) -> Getter:
+    """Return the getter of a field of the readings of an MTU or ctgroup.
+
+    It returns None if the MTU or ctgroup has no readings.
+    """
+
+    def get(snapshot: TedSnapshot, key: Any) -> Any:
+        reading = getattr(snapshot, name).get(key)
+        return None if reading is None else reading[index]
+
+    return get
+
+
+# Getters of the fields of each part, by name
+_FIELDS: Dict[str, Dict[str, Getter]] = {
+    SYSTEM: {
+        **{field: _total("energy", i) for i, field in enumerate(_ENERGY_FIELDS)},
+        **{
+            "{}_{}".format(total, field): _total(total, i)
+            for total in ("consumption", "production")
+            for i, field in enumerate(_ENERGY_FIELDS)
+        },
+    },
+    MTU: {
+        **{field: _reading("mtu_energy", i) for i, field in enumerate(_ENERGY_FIELDS)},
+        **{field: _reading("mtu_power", i) for i, field in enumerate(_POWER_FIELDS)},
+    },
+    CTGROUP: {
+        field: _reading("ctgroup_energy", i) for i, field in enumerate(_ENERGY_FIELDS)
+    },
+}
+
+
+class ChangeEvent(NamedTuple):
+    """Change of a field of the system, an MTU or a ctgroup.
+
+    key is None for the system, the position of an MTU, or the spyder's
+    position and the position of a ctgroup. previous is the last value
+    reported to the subscription (None for the first one).
+    """
+
+    timestamp: float
+    part: str
+    key: Any
+    field: str
+    previous: Optional[float]
+    value: float
+
+
+class Subscription:
+    """Subscription to a field of the system, an MTU or a ctgroup.
+
+    Events are passed to the callback if one was given, and can otherwise be
+    iterated over with `async for` (keeping the latest max_queued of them).
+    """
+
+    def __init__(
+        self,
+        subscriptions: "TedSubscriptions",
+        part: str,
+        key: Any,
+        field: str,
+        callback: Optional[Callable[[ChangeEvent], Any]],
+        deadband: Optional[float],
+        band: Optional[Tuple[float, float]],
+        max_queued: int,
+    ) -> None:
+        """Init the subscription."""
+        self.part = part
+        self.key = key
+        self.field = field
+        self.callback = callback
+        self.deadband = deadband
+        self.band = band
+        self.max_queued = max_queued
+        self._subscriptions: Optional[TedSubscriptions] = subscriptions
+        # Last value reported for each key (there may be many with no key)
+        self._reported: Dict[Any, Any] = {}
+        self._queue: "Optional[asyncio.Queue[Optional[ChangeEvent]]]" = None
+        if callback is None:
+            self._queue = asyncio.Queue()
+
+    def _changed(self, previous: Any, value: Any) -> bool:
+        """Return whether a new value passes the filters."""
+        if self.deadband is None and self.band is None:
+            return value != previous
+        if self.deadband is not None and abs(value - previous) > self.deadband:
+            return True
+        if self.band is not None:
+            low, high = self.band
+            return (low <= previous <= high) != (low <= value <= high)
+        return False
+
+    def _offer(self, snapshot: TedSnapshot, key: Any, value: Any) -> None:
+        """Report a value if it is the first or passes the filters."""
+        previous = self._reported.get(key)
+        if previous is not None and not self._changed(previous, value):
+            return
+        self._reported[key] = value
+        event = ChangeEvent(
+            snapshot.timestamp, self.part, key, self.field, previous, value
+        )
+        if self.callback is not None:
+            try:
+                self.callback(event)
+            except Exception:  # Other subscriptions are still notified
+                _LOGGER.exception("Error in the callback of %s", event)
+            return
+        assert self._queue is not None
+        if self._queue.qsize() >= self.max_queued:
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+
+    def cancel(self) -> None:
+        """Stop receiving events, ending the iteration over them."""
+        if self._subscriptions is not None:
+            self._subscriptions._remove(self)
+            self._subscriptions = None
+            if self._queue is not None:
+                self._queue.put_nowait(None)
+
+    def __aiter__(self) -> AsyncIterator[ChangeEvent]:
+        """Iterate over the events, until the subscription is cancelled."""
+        if self._queue is None:
+            raise RuntimeError("Events are passed to the callback")
+        return self
+
+    async def __anext__(self) -> ChangeEvent:
+        """Return the next event, waiting for one if necessary."""
+        assert self._queue is not None
+        event = await self._queue.get()
+        if event is None:
+            self._queue.put_nowait(None)  # Wake up other iterators as well
+            raise StopAsyncIteration
+        return event
+
+
+class TedSubscriptions:
+    """Subscriptions to the readings of a TED.
+
+    Set TED.subscriptions to an instance to check the subscriptions after
+    every update(). By default, an event is sent whenever the value of the
+    field changes. With a deadband, it is only sent once the value differs
+    from the last one sent by more than deadband; with a band (low, high),
+    when the value leaves or comes back into the band (or either, if both
+    are given). The first value is always sent.
+    """
+
+    def __init__(self) -> None:
+        """Init the subscriptions."""
+        # Subscriptions by part, key (None for every MTU or ctgroup) and field
+        self._index: Dict[str, Dict[Any, Dict[str, List[Subscription]]]] = {
+            SYSTEM: {},
+            MTU: {},
+            CTGROUP: {},
+        }
+
+    def system(self, field: str, **options: Any) -> Subscription:
+        """Subscribe to a field of the system.
+
+        The fields are now, daily and mtd (of the net energy), and the same
+        prefixed by consumption_ or production_. See subscribe() for options.
+        """
+        return self.subscribe(SYSTEM, None, field, **options)
+
+    def mtu(self, position: Optional[int], field: str, **options: Any) -> Subscription:
+        """Subscribe to a field of an MTU (or every MTU if position is None).
+
+        The fields are now, daily, mtd, apparent_power, power_factor and
+        voltage. See subscribe() for options.
+        """
+        return self.subscribe(MTU, position, field, **options)
+
+    def ctgroup(
+        self,
+        spyder_position: Optional[int],
+        position: Optional[int],
+        field: str,
+        **options: Any
+    ) -> Subscription:
+        """Subscribe to a field of a ctgroup (or every ctgroup if positions are None).
+
+        The fields are now, daily and mtd. See subscribe() for options.
+        """
+        key = None if position is None else (spyder_position, position)
+        return self.subscribe(CTGROUP, key, field, **options)
+
+    def subscribe(
+        self,
+        part: str,
+        key: Any,
+        field: str,
+        callback: Optional[Callable[[ChangeEvent], Any]] = None,
+        deadband: Optional[float] = None,
+        band: Optional[Tuple[float, float]] = None,
+        max_queued: int = 1000,
+    ) -> Subscription:
+        """Subscribe to a field of a part (SYSTEM, MTU or CTGROUP) of the readings.
+
+        Events are passed to callback, or iterated over with `async for` on the
+        subscription if there is none (which must then be created in the
+        event loop).
+        """
+        if field not in _FIELDS[part]:
+            raise ValueError("Unknown field of the {}: {}".format(part, field))
+        subscription = Subscription(
+            self, part, key, field, callback, deadband, band, max_queued
+        )
+        fields = self._index[part].setdefault(key, {})
+        fields.setdefault(field, []).append(subscription)
+        return subscription
+
+    def _remove(self, subscription: Subscription) -> None:
+        """Remove a subscription from the index."""
+        keys = self._index[subscription.part]
+        fields = keys[subscription.key]
+        fields[subscription.field].remove(subscription)
+        if not fields[subscription.field]:
+            del fields[subscription.field]
+            if not fields:
+                del keys[subscription.key]
+
+    def publish(self, snapshot: TedSnapshot, changes: TedChanges) -> None:
+        """Send the events of the parts of a snapshot that changed."""
+        index = self._index
+        if changes.system and index[SYSTEM]:
+            self._publish(snapshot, SYSTEM, index[SYSTEM], (None,))
+        if changes.mtus and index[MTU]:
+            self._publish(snapshot, MTU, index[MTU], changes.mtus)
+        if changes.ctgroups and index[CTGROUP]:
+            self._publish(snapshot, CTGROUP, index[CTGROUP], changes.ctgroups)
+
+    def _publish(
+        self,
+        snapshot: TedSnapshot,
+        part: str,
+        keys: Dict[Any, Dict[str, List[Subscription]]],
+        changed: Any,
+    ) -> None:
+        """Offer the values of the changed keys of a part to their subscriptions."""
+        getters = _FIELDS[part]
+        every = keys.get(None) if part != SYSTEM else None
+        for key in changed:
+            for fields in (keys.get(key), every):
+                if not fields:
+                    continue
+                # Copied, since callbacks may cancel subscriptions
+                for field, subscriptions in list(fields.items()):
+                    value = getters[field](snapshot, key)
+                    if value is None:
+                        continue  # The MTU or ctgroup was removed
+                    for subscription in list(subscriptions):
+                        subscription._offer(snapshot, key, value)
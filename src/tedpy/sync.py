@@ -0,0 +1,175 @@
+"""Blocking client of a TED, for synchronous code and threads.
+
+The TEDs run on one event loop in a background thread, sharing a connection
+pool, so that synchronous callers don't set up a loop and a client per call.
+Blocking calls are submitted to the loop, where concurrent updates of a TED
+are coalesced into one, and the latest snapshot can be read without the loop.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+
+from .detection import createTED
+from .snapshot import TedSnapshot
+from .ted import DEFAULT_LIMITS, TED
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class EventLoopThread:
+    """Event loop run by a daemon thread, with a connection pool for its TEDs."""
+
+    def __init__(self, limits: Optional[httpx.Limits] = None) -> None:
+        """Init the loop and start its thread."""
+        self.loop = asyncio.new_event_loop()
+        self.client = httpx.AsyncClient(limits=limits or DEFAULT_LIMITS)
+        self._thread = threading.Thread(
+            target=self._run, name="tedpy-event-loop", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the loop, blocking until it completes.
+
+        If it doesn't complete in timeout seconds, it is cancelled and
+        concurrent.futures.TimeoutError is raised.
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run() would block the event loop it waits for")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """Cancel the tasks left on the loop, close the pool and stop the thread."""
+        if self.loop.is_closed():
+            return
+        self.run(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    async def _shutdown(self) -> None:
+        tasks = [
+            task
+            for task in asyncio.all_tasks(self.loop)
+            if task is not asyncio.current_task()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.client.aclose()
+
+
+_shared_loop: Optional[EventLoopThread] = None
+_shared_lock = threading.Lock()
+
+
+def shared_loop() -> EventLoopThread:
+    """Return the loop shared by the SyncTEDs, starting it on first use."""
+    global _shared_loop
+    with _shared_lock:
+        if _shared_loop is None or _shared_loop.loop.is_closed():
+            _shared_loop = EventLoopThread()
+        return _shared_loop
+
+
+class SyncTED:
+    """Thread-safe blocking client of a TED, run on a background event loop.
+
+    The model is detected when the client is created. Every SyncTED uses the
+    shared_loop() unless given another loop. If poll_interval is given, the
+    TED is updated in the background every poll_interval seconds, and the
+    error of the last failed poll is kept in error.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        loop: Optional[EventLoopThread] = None,
+        poll_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Init the client, probing the gateway (waiting up to timeout seconds)."""
+        self.loop = loop or shared_loop()
+        self.timeout = timeout
+        self.ted: TED = self.loop.run(createTED(host, self.loop.client), timeout)
+        self.error: Optional[Exception] = None
+        self._poller: "Optional[asyncio.Task[None]]" = None
+        if poll_interval is not None:
+            self._poller = self.loop.run(self._start_polling(poll_interval))
+
+    async def _start_polling(self, interval: float) -> "asyncio.Task[None]":
+        return asyncio.ensure_future(self._poll(interval))
+
+    async def _stop_polling(self, poller: "asyncio.Task[None]") -> None:
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+
+    async def _poll(self, interval: float) -> None:
+        """Update the TED every interval seconds, until cancelled."""
+        while True:
+            started = time.monotonic()
+            try:
+                await self.ted.update()
+                self.error = None
+            except Exception as err:  # Kept in error
+                _LOGGER.debug("Polling %s failed: %s", self.ted.host, err)
+                self.error = err
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    @property
+    def latest(self) -> Optional[TedSnapshot]:
+        """Return the latest snapshot, without waiting for the loop."""
+        return self.ted.snapshot
+
+    def update(self, max_age: Optional[float] = None) -> TedSnapshot:
+        """Update the TED (as TED.update()) and return its snapshot."""
+        self.loop.run(self.ted.update(max_age), self.timeout)
+        assert self.ted.snapshot is not None
+        return self.ted.snapshot
+
+    def snapshot(self, max_age: Optional[float] = None) -> TedSnapshot:
+        """Return the latest snapshot, updating the TED if there is none yet.
+
+        If max_age is given, the TED is also updated if the snapshot is more
+        than max_age seconds old.
+        """
+        snapshot = self.ted.snapshot
+        if snapshot is not None and (
+            max_age is None or time.time() - snapshot.timestamp < max_age
+        ):
+            return snapshot
+        return self.update(max_age)
+
+    def close(self) -> None:
+        """Stop polling and close the TED. The loop is left running."""
+        if self.loop.loop.is_closed():
+            return
+        if self._poller is not None:
+            self.loop.run(self._stop_polling(self._poller))
+            self._poller = None
+        self.loop.run(self.ted.close())
+
+    def __enter__(self) -> "SyncTED":
+        """Return the client for use as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close the client when leaving the context."""
+        self.close()
@@ -1,11 +1,28 @@
 """Base class for TED energy meters."""
+import asyncio
+import hashlib
 import logging
+import time
+from contextlib import AsyncExitStack, contextmanager, nullcontext
 from datetime import datetime
-from typing import Any, List
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from urllib.parse import urlsplit
 
 import httpx
-import xmltodict
 
+from .analytics import TedAnalytics
 from .dataclasses import EnergyYield, Power, SystemType, TedCtGroup, TedMtu, TedSpyder
 from .formatting import (
     format_ct,
@@ -14,31 +31,312 @@ from .formatting import (
     format_mtu,
     format_spyder,
 )
+from .history import TedHistory
+from .instrumentation import FetchEvent, Instrumentation, RequestTrace
+from .parsers import parse_xml
+from .retry import (
+    DEFAULT_RETRY_POLICY,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    RetryPolicy,
+)
+from .snapshot import TedChanges, TedSnapshot, diff_snapshots
+from .storage import ReadingLog
+from .streaming import Backpressure, stream
+from .subscriptions import TedSubscriptions
 
 _LOGGER = logging.getLogger(__name__)
 
+# The gateway's embedded web server handles only a few connections at once, so
+# keep a small pool of keep-alive connections open instead of reconnecting.
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=4, max_keepalive_connections=4, keepalive_expiry=30
+)
+
+# Timeout for the single request used to detect whether a host is a given model.
+PROBE_TIMEOUT = 5.0
+
+_NO_PHASE = nullcontext()
+
+# Settings and MTU/Spyder topology rarely change, so they are only refetched
+# once this many seconds have passed (or when refresh_config() is called).
+DEFAULT_CONFIG_TTL = 3600.0
+
+
+class _CachedEndpoint(NamedTuple):
+    """Validators and parsed result of the last response from an endpoint."""
+
+    digest: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    result: Any
+
 
 class TED:
     """Instance of TED."""
 
-    def __init__(self, host: str, async_client: httpx.AsyncClient = None) -> None:
-        """Init the TED."""
+    def __init__(
+        self,
+        host: str,
+        async_client: httpx.AsyncClient = None,
+        limits: httpx.Limits = None,
+        config_ttl: Optional[float] = DEFAULT_CONFIG_TTL,
+    ) -> None:
+        """Init the TED.
+
+        If no async_client is given, the TED creates and owns a pooled client
+        (configured with limits) which is kept open until close() is called.
+        A client passed in by the caller is never closed by the TED.
+
+        The gateway configuration is cached for config_ttl seconds; pass None
+        to only refetch it through refresh_config().
+        """
         self.host = host.lower()
 
         self.mtus: List[TedMtu] = []
         self.spyders: List[TedSpyder] = []
-        self._async_client = async_client
+        self._async_client: Optional[httpx.AsyncClient] = async_client
+        self._owns_client = async_client is None
+        self._limits = limits or DEFAULT_LIMITS
+        self.config_ttl = config_ttl
+        self._config_updated: Optional[float] = None
+        # Semaphores acquired (in order) around every request, e.g. to cap the
+        # number of requests in flight to this device or across many devices.
+        self.request_limiters: List[asyncio.Semaphore] = []
+        self.snapshot: Optional[TedSnapshot] = None
+        self.previous_snapshot: Optional[TedSnapshot] = None
+        # What changed in the last update, and which (attr, params) endpoints
+        # returned new content; unchanged endpoints are not parsed again.
+        self.changes: Optional[TedChanges] = None
+        self.changed_endpoints: Set[Any] = set()
+        # Endpoints with new content not yet decoded into a snapshot, which
+        # carry over to the next update if this one fails
+        self._pending_changes: Set[Any] = set()
+        self._pending_errors: Dict[Any, Exception] = {}
+        self._endpoint_cache: Dict[str, _CachedEndpoint] = {}
+        self._config_changed = False
+        # Settings the MTU and Spyder lists were last built from
+        self._topology_settings: Any = None
+        # If set, every snapshot is appended to the history
+        self.history: Optional[TedHistory] = None
+        # If set, every snapshot is written to the log, under the host's name
+        self.reading_log: Optional[ReadingLog] = None
+        # If set, the running statistics are updated with every snapshot
+        self.analytics: Optional[TedAnalytics] = None
+        # If set, the subscriptions are notified of the changes of every update
+        self.subscriptions: Optional[TedSubscriptions] = None
+        # If set, receives the timings of every request and update phase
+        self.instrumentation: Optional[Instrumentation] = None
+        self.retry_policy = DEFAULT_RETRY_POLICY
+        # In partial mode, endpoints that fail keep their previous data, and
+        # the errors are kept in endpoint_errors until the next update.
+        self.partial_updates = False
+        self.endpoint_errors: Dict[Any, Exception] = {}
+        # Time (from time.time()) of the last successful fetch of each endpoint
+        self.endpoint_updated: Dict[Any, float] = {}
+        self._deadline: Optional[float] = None
+        # Snapshots younger than max_age seconds are kept by update()
+        self.max_age: Optional[float] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._inflight_waiters = 0
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        """Return the policy used to retry and time out requests."""
+        return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, policy: RetryPolicy) -> None:
+        """Set the retry policy, resetting the circuit breaker."""
+        self._retry_policy = policy
+        self.circuit_breaker: Optional[CircuitBreaker] = policy.new_breaker()
 
     @property
     def async_client(self) -> httpx.AsyncClient:
-        """Return the httpx client."""
-        return self._async_client or httpx.AsyncClient()
+        """Return the httpx client, creating the pooled client on first use."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=self._limits)
+        return self._async_client
+
+    async def close(self) -> None:
+        """Close the connection pool if it is owned by this TED."""
+        if self._owns_client and self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def __aenter__(self) -> "TED":
+        """Return the TED for use as an async context manager."""
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Close the connection pool when leaving the context."""
+        await self.close()
+
+    async def update(self, max_age: Optional[float] = None) -> None:
+        """Fetch data from the endpoints, refreshing the config if it expired.
+
+        Concurrent calls share a single update. If the snapshot is less than
+        max_age (or the max_age attribute) seconds old, it is kept without
+        making any request. If the retry policy has a deadline, requests that
+        can't complete before it fail with DeadlineExceeded.
+        """
+        if max_age is None:
+            max_age = self.max_age
+        if (
+            max_age is not None
+            and self.snapshot is not None
+            and time.time() - self.snapshot.timestamp < max_age
+        ):
+            return
+
+        task = self._inflight
+        if task is None or task.done():
+            task = self._inflight = asyncio.ensure_future(self._single_update())
+            self._inflight_waiters = 0
+        self._inflight_waiters += 1
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The update is only abandoned once every caller gave up on it
+            if task is self._inflight and self._inflight_waiters == 1:
+                task.cancel()
+            raise
+        finally:
+            if task is self._inflight:
+                self._inflight_waiters -= 1
+
+    async def _single_update(self) -> None:
+        """Run the update shared by the concurrent update() calls."""
+        deadline = self._retry_policy.deadline
+        if deadline is not None:
+            self._deadline = time.monotonic() + deadline
+        try:
+            await self._update()
+        finally:
+            self._deadline = None
+            self._inflight = None
+
+    async def _update(self) -> None:
+        """Fetch data from the endpoints and build the snapshot.
+
+        The snapshot, changes and endpoint errors are replaced together once
+        every endpoint has been fetched, so readers never see half an update.
+        """
+        with self._phase("update"):
+            self._pending_errors = {}
+            if self._config_expired():
+                await self._refresh_config_or_keep()
+            await self._update_data()
+            with self._phase("derive"):
+                snapshot = self._build_snapshot()
+            errors = self._pending_errors
+            now = time.time()
+            stale = {key: now - self.endpoint_updated[key] for key in errors}
+            if stale or snapshot.stale:
+                snapshot = snapshot.replace(stale=stale)
+            changes = diff_snapshots(self.snapshot, snapshot, self._config_changed)
+
+            self.previous_snapshot = self.snapshot
+            self.snapshot = snapshot
+            self.changes = changes
+            self.changed_endpoints = self._pending_changes
+            self.endpoint_errors = errors
+            self._pending_changes = set()
+            self._config_changed = False
+            if self.history is not None:
+                self._feed("history", self.history.append, snapshot)
+            if self.reading_log is not None:
+                self._feed("reading log", self.reading_log.append, self.host, snapshot)
+            if self.analytics is not None:
+                self._feed("analytics", self.analytics.append, snapshot)
+            if self.subscriptions is not None:
+                self._feed(
+                    "subscriptions", self.subscriptions.publish, snapshot, changes
+                )
+
+    def _feed(self, name: str, sink: Callable[..., Any], *args: Any) -> None:
+        """Pass a snapshot to a sink, logging its errors (the update succeeded)."""
+        try:
+            sink(*args)
+        except Exception:  # The other sinks still get the snapshot
+            _LOGGER.exception("Error in the %s of %s", name, self.host)
+
+    def stream(
+        self,
+        interval: Optional[float] = None,
+        backpressure: Backpressure = Backpressure.LATEST_ONLY,
+        maxsize: int = 16,
+        only_changed: bool = False,
+    ) -> AsyncGenerator[TedSnapshot, None]:
+        """Poll on a fixed schedule and yield each snapshot.
+
+        See tedpy.streaming.stream for a description of the arguments.
+        """
+        return stream(self, interval, backpressure, maxsize, only_changed)
+
+    async def refresh_config(self) -> None:
+        """Fetch the gateway settings and rebuild the MTU and Spyder lists.
+
+        The lists are only rebuilt if the settings changed.
+        """
+        with self._phase("config"):
+            if await self._update_config():
+                self._config_changed = True
+            self._config_updated = time.monotonic()
+
+    async def _refresh_config_or_keep(self) -> None:
+        """Refresh the config, keeping the previous one in partial mode."""
+        if not self.partial_updates or self._config_updated is None:
+            await self.refresh_config()
+            return
+        try:
+            await self.refresh_config()
+        except Exception as err:
+            # Polling continues with the cached config, which is refetched in
+            # the next update since it is still expired
+            _LOGGER.warning("Keeping the config of %s: %s", self.host, err)
+
+    def _phase(self, phase: str) -> ContextManager[None]:
+        """Return a context manager reporting the time spent in a phase."""
+        if self.instrumentation is None:
+            return _NO_PHASE
+        return _timed_phase(self.instrumentation, self.host, phase)
 
-    async def update(self) -> None:
-        """Fetch data from the endpoints."""
+    def _config_expired(self) -> bool:
+        """Return whether the cached configuration needs to be refetched."""
+        if self._config_updated is None:
+            return True
+        if self.config_ttl is None:
+            return False
+        return time.monotonic() - self._config_updated >= self.config_ttl
+
+    async def _update_config(self) -> bool:
+        """Fetch the static configuration, returning whether it changed."""
+        raise NotImplementedError()
+
+    async def _update_data(self) -> None:
+        """Fetch the live energy data from the endpoints."""
+        raise NotImplementedError()
+
+    def _build_snapshot(self) -> TedSnapshot:
+        """Decode the fetched endpoint data into a snapshot."""
         raise NotImplementedError()
 
-    async def check(self) -> bool:
+    def _unchanged(self, *endpoints: Any) -> bool:
+        """Return whether the snapshot values decoded from endpoints are current.
+
+        Endpoints are given as (attr, params) tuples, as in changed_endpoints.
+        Endpoints that changed in an update that failed are still considered
+        changed.
+        """
+        return (
+            self.snapshot is not None
+            and not self._config_changed
+            and self._pending_changes.isdisjoint(endpoints)
+        )
+
+    async def check(self, timeout: float = PROBE_TIMEOUT) -> bool:
         """Check if the required endpoint are accessible."""
         raise NotImplementedError()
 
@@ -56,6 +354,11 @@ class TED:
         """Return the current time of the gateway."""
         raise NotImplementedError()
 
+    @property
+    def polling_delay(self) -> int:
+        """Return the delay between successive polls of MTU data."""
+        return 0
+
     @property
     def system_type(self) -> SystemType:
         """Return the system type of the gateway."""
@@ -63,57 +366,302 @@ class TED:
 
     def energy(self) -> EnergyYield:
         """Return net energy yield information for the whole system."""
-        raise NotImplementedError()
+        return self._snapshot.energy
 
     def consumption(self) -> EnergyYield:
         """Return energy load of the whole system."""
-        raise NotImplementedError()
+        return self._snapshot.consumption
 
     def production(self) -> EnergyYield:
         """Return energy generated by the whole system."""
-        raise NotImplementedError()
+        return self._snapshot.production
+
+    @property
+    def _snapshot(self) -> TedSnapshot:
+        """Return the latest snapshot, which requires update() to be called."""
+        if self.snapshot is None:
+            raise ValueError("update() must be called before reading values")
+        return self.snapshot
 
     def _mtu_energy(self, mtu: TedMtu) -> EnergyYield:
         """Return consumption or production information for a MTU."""
-        raise NotImplementedError()
+        return self._snapshot.mtu_energy[mtu.position]
 
     def _mtu_power(self, mtu: TedMtu) -> Power:
         """Return power information for a MTU."""
-        raise NotImplementedError()
+        return self._snapshot.mtu_power[mtu.position]
 
     def _ctgroup_energy(self, ctgroup: TedCtGroup) -> EnergyYield:
         """Return energy yield information for a spyder ctgroup."""
-        raise NotImplementedError()
+        return self._snapshot.ctgroup_energy[
+            (ctgroup.spyder_position, ctgroup.position)
+        ]
 
-    async def _check_endpoint(self, url: str, params: str = None) -> bool:
+    async def _check_endpoint(
+        self, url: str, params: str = None, timeout: float = PROBE_TIMEOUT
+    ) -> bool:
         formatted_url = url.format(self.host, params)
-        response = await self._async_fetch_with_retry(formatted_url)
+        response = await self._async_fetch_with_retry(
+            formatted_url, attempts=1, timeout=timeout
+        )
         return response.status_code < 300
 
-    async def _update_endpoint(self, attr: str, url: str, params: Any = None) -> None:
+    async def _fetch_endpoint(
+        self, attr: str, url: str, params: Any, parser: Callable[[str], Any]
+    ) -> Tuple[Any, bool]:
+        """Fetch and parse an endpoint, returning the result and if it changed.
+
+        Responses identical to the previous one (by HTTP validators or content
+        hash) are not parsed again; the previous result is reused instead.
+        """
         formatted_url = url.format(self.host, params)
-        response = await self._async_fetch_with_retry(formatted_url)
-        try:
-            if params is None:
-                # write to self[attr]
-                setattr(self, attr, xmltodict.parse(response.text))
+        cached = self._endpoint_cache.get(formatted_url)
+        headers = {}
+        if cached is not None and cached.etag is not None:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified is not None:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        response = await self._async_fetch_with_retry(formatted_url, headers=headers)
+        if cached is not None and response.status_code == 304:
+            result, changed = cached.result, False
+        else:
+            digest = hashlib.blake2b(response.content, digest_size=16).digest()
+            if cached is not None and cached.digest == digest:
+                result, changed = cached.result, False
             else:
-                # write to self[attr][param]; assume self[attr] was initialized to dict()
-                getattr(self, attr)[params] = xmltodict.parse(response.text)
-        except xmltodict.expat.ExpatError:
-            raise
+                result, changed = self._parse(formatted_url, response, parser), True
+            self._cache_response(formatted_url, response, result, digest)
+        if changed:
+            self._pending_changes.add((attr, params))
+
+        _LOGGER.debug(
+            "Fetched from %s: %s (%d bytes)",
+            formatted_url,
+            response,
+            len(response.content),
+        )
+        return result, changed
+
+    def _store_endpoint(self, attr: str, params: Any, result: Any) -> None:
+        """Store the parsed result of an endpoint."""
+        if params is None:
+            # write to self[attr]
+            setattr(self, attr, result)
+        else:
+            # write to self[attr][param]; assume self[attr] was initialized to dict()
+            getattr(self, attr)[params] = result
+        self.endpoint_updated[(attr, params)] = time.time()
+
+    async def _update_endpoints(
+        self,
+        *requests: Tuple[str, str, Any, Callable[[str], Any]],
+        all_or_nothing: bool = False
+    ) -> None:
+        """Fetch and parse several (attr, url, params, parser) endpoints at once.
+
+        The results are only stored once every request has completed. In
+        partial mode (unless all_or_nothing is set), endpoints that fail keep
+        their previous results and the errors are kept in endpoint_errors. An
+        error is only raised if every endpoint failed or one that failed has
+        never succeeded.
+        """
+        results = await asyncio.gather(
+            *(self._fetch_endpoint(*request) for request in requests),
+            return_exceptions=self.partial_updates and not all_or_nothing,
+        )
+        errors = self._pending_errors
+        for (attr, _, params, _), result in zip(requests, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result  # Such as cancellation
+                errors[(attr, params)] = result
+        if errors:
+            if len(errors) == len(requests):
+                raise next(iter(errors.values()))
+            for key, error in errors.items():
+                if key not in self.endpoint_updated:
+                    raise error
+        for (attr, _, params, _), result in zip(requests, results):
+            if not isinstance(result, BaseException):
+                self._store_endpoint(attr, params, result[0])
+
+    def _parse(
+        self, url: str, response: httpx.Response, parser: Callable[[str], Any]
+    ) -> Any:
+        """Parse the text of a response, reporting the time it took."""
+        if self.instrumentation is None:
+            return parser(response.text)
+        start = time.perf_counter()
+        result = parser(response.text)
+        self.instrumentation.on_parse(
+            self.host, url, len(response.content), time.perf_counter() - start
+        )
+        return result
+
+    def _cache_response(
+        self,
+        url: str,
+        response: httpx.Response,
+        result: Any,
+        digest: Optional[bytes] = None,
+    ) -> None:
+        """Remember the validators and parsed result of a response."""
+        if digest is None:
+            digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        self._endpoint_cache[url] = _CachedEndpoint(
+            digest,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            result,
+        )
 
-        _LOGGER.debug("Fetched from %s: %s: %s", formatted_url, response, response.text)
+    async def _async_fetch_with_retry(
+        self,
+        url: str,
+        attempts: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ) -> Any:
+        """Fetch the url, retrying and timing out according to the retry policy.
 
-    async def _async_fetch_with_retry(self, url: str, **kwargs: Any) -> Any:
-        """Retry 3 times to fetch the url if there is a transport error."""
-        for attempt in range(3):
+        attempts and timeout override those of the policy.
+        """
+        policy = self._retry_policy
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("Too many failed requests to " + self.host)
+        endpoint = urlsplit(url).path
+        if attempts is None:
+            attempts = policy.attempts
+        if timeout is None:
+            timeout = policy.timeout_for(endpoint)
+        hedge_after = None
+        if endpoint in policy.hedged_endpoints:
+            hedge_after = policy.hedge_after
+
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
+        trace: Optional[RequestTrace] = None
+        response: Optional[httpx.Response] = None
+        error: Optional[BaseException] = None
+        attempt = 0
+        hedged = False
+        async with AsyncExitStack() as stack:
+            for limiter in self.request_limiters:
+                await stack.enter_async_context(limiter)
+            queued = time.perf_counter() - start
             try:
-                async with self.async_client as client:
-                    return await client.get(url, timeout=30, **kwargs)
-            except httpx.TransportError:
-                if attempt == 2:
-                    raise
+                for attempt in range(attempts):
+                    delay = policy.backoff_delay(attempt)
+                    last = attempt == attempts - 1 or not self._before_deadline(delay)
+                    if instrumentation is not None:
+                        trace = RequestTrace()
+                        kwargs["extensions"] = {"trace": trace}
+                    attempt_timeout = self._attempt_timeout(timeout)
+                    try:
+                        response, hedged = await self._send(
+                            url, attempt_timeout, hedge_after, kwargs
+                        )
+                    except (httpx.TransportError, asyncio.TimeoutError):
+                        if last:
+                            raise
+                    else:
+                        if last or response.status_code not in policy.retry_statuses:
+                            break
+                    await asyncio.sleep(delay)
+            except BaseException as err:
+                error = err
+                raise
+            finally:
+                if breaker is not None and not isinstance(
+                    error, asyncio.CancelledError
+                ):
+                    if error is not None or (
+                        response is not None and response.status_code >= 500
+                    ):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if instrumentation is not None:
+                    instrumentation.on_fetch(
+                        FetchEvent(
+                            self.host,
+                            url,
+                            None if response is None else response.status_code,
+                            0 if response is None else len(response.content),
+                            attempt + 1,
+                            time.perf_counter() - start,
+                            queued,
+                            *(trace or RequestTrace()).phases(),
+                            error,
+                            hedged,
+                        )
+                    )
+        return response
+
+    def _before_deadline(self, delay: float) -> bool:
+        """Return whether there is time left for another attempt after delay."""
+        return self._deadline is None or time.monotonic() + delay < self._deadline
+
+    def _attempt_timeout(self, timeout: float) -> float:
+        """Return the timeout of an attempt, shortened to meet the deadline."""
+        if self._deadline is None:
+            return timeout
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Update deadline exceeded for " + self.host)
+        return min(timeout, remaining)
+
+    async def _send(
+        self,
+        url: str,
+        timeout: float,
+        hedge_after: Optional[float],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[httpx.Response, bool]:
+        """Send a request, and a second one if the first is slower than hedge_after.
+
+        Return the first response, and whether a second request was sent.
+        """
+        client = self.async_client
+        if hedge_after is None or hedge_after >= timeout:
+            response = await asyncio.wait_for(
+                client.get(url, timeout=timeout, **kwargs), timeout
+            )
+            return response, False
+
+        tasks = [
+            asyncio.ensure_future(
+                asyncio.wait_for(client.get(url, timeout=timeout, **kwargs), timeout)
+            )
+        ]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return tasks[0].result(), False
+            remaining = timeout - hedge_after
+            tasks.append(
+                asyncio.ensure_future(
+                    asyncio.wait_for(
+                        client.get(url, timeout=remaining, **kwargs), remaining
+                    )
+                )
+            )
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), True
+                if not pending:
+                    return tasks[0].result(), True  # Raises the first error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     def print_to_console(self) -> None:
         """Print all the settings and energy yield values to the console."""
@@ -139,3 +687,15 @@ class TED:
                 for c in g.member_cts:
                     print("      " + format_ct(c))
                 print("      Energy:", format_energy_yield(g.energy()))
+
+
+@contextmanager
+def _timed_phase(
+    instrumentation: Instrumentation, host: str, phase: str
+) -> Iterator[None]:
+    """Report the time spent in the body of the with statement."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation.on_phase(host, phase, time.perf_counter() - start)
@@ -1,12 +1,14 @@
 """Implementation for the TED5000 meter."""
-import asyncio
+import time
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
 
 import httpx
 
-from .dataclasses import EnergyYield, MtuType, Power, TedMtu
-from .ted import TED
+from .dataclasses import EnergyYield, MtuType, Power, TedMtu, intern_str, reuse_equal
+from .parsers import parse_live_data, parse_xml
+from .snapshot import TedSnapshot
+from .ted import DEFAULT_CONFIG_TTL, PROBE_TIMEOUT, TED
 
 ENDPOINT_URL_SETTINGS = "http://{}/api/SystemSettings.xml"
 ENDPOINT_URL_DATA = "http://{}/api/LiveData.xml"
@@ -15,25 +17,42 @@ ENDPOINT_URL_DATA = "http://{}/api/LiveData.xml"
 class TED5000(TED):
     """Instance of TED5000."""
 
-    def __init__(self, host: str, async_client: httpx.AsyncClient = None):
+    def __init__(
+        self,
+        host: str,
+        async_client: httpx.AsyncClient = None,
+        limits: httpx.Limits = None,
+        config_ttl: Optional[float] = DEFAULT_CONFIG_TTL,
+    ):
         """Init the TED5000."""
-        super().__init__(host, async_client)
+        super().__init__(host, async_client, limits, config_ttl)
 
         self.endpoint_settings_results: Any = None
         self.endpoint_data_results: Any = None
 
-    async def update(self) -> None:
-        """Fetch data from the endpoints."""
-        await asyncio.gather(
-            self._update_endpoint("endpoint_settings_results", ENDPOINT_URL_SETTINGS),
-            self._update_endpoint("endpoint_data_results", ENDPOINT_URL_DATA),
+    async def _update_config(self) -> bool:
+        """Fetch settings from the endpoints, returning whether they changed."""
+        await self._update_endpoints(
+            ("endpoint_settings_results", ENDPOINT_URL_SETTINGS, None, parse_xml),
+            all_or_nothing=True,
+        )
+        settings = self.endpoint_settings_results
+        if settings is self._topology_settings:
+            return False
+        with self._phase("topology"):
+            self._parse_mtus()
+        self._topology_settings = settings
+        return True
+
+    async def _update_data(self) -> None:
+        """Fetch power data from the endpoints."""
+        await self._update_endpoints(
+            ("endpoint_data_results", ENDPOINT_URL_DATA, None, parse_live_data)
         )
 
-        self._parse_mtus()
-
-    async def check(self) -> bool:
+    async def check(self, timeout: float = PROBE_TIMEOUT) -> bool:
         """Check if the required endpoint are accessible."""
-        return await self._check_endpoint(ENDPOINT_URL_DATA)
+        return await self._check_endpoint(ENDPOINT_URL_DATA, timeout=timeout)
 
     @property
     def gateway_id(self) -> str:
@@ -48,58 +67,54 @@ class TED5000(TED):
         ]
 
     def gateway_time(self) -> datetime:
-        data = self.endpoint_data_results["LiveData"]
-        hour = int(data["GatewayTime"]["Hour"])
-        minute = int(data["GatewayTime"]["Minute"])
-        second = int(data["GatewayTime"]["Second"])
-        month = int(data["GatewayTime"]["Month"])
-        day = int(data["GatewayTime"]["Day"])
-        year = int(data["GatewayTime"]["Year"]) + 2000
-        return datetime(year, month, day, hour, minute, second)
-
-    def energy(self) -> EnergyYield:
-        """Return energy yield information for the whole system."""
-        data = self.endpoint_data_results["LiveData"]
-        power_now = int(data["Power"]["Total"]["PowerNow"])
-        power_day = int(data["Power"]["Total"]["PowerTDY"])
-        power_mtd = int(data["Power"]["Total"]["PowerMTD"])
-        return EnergyYield(power_now, power_day, power_mtd)
-
-    def consumption(self) -> EnergyYield:
-        """Return load information for the whole system."""
-        load = EnergyYield(0, 0, 0)
-        for mtu in self.mtus:
-            if mtu.type == MtuType.LOAD:
-                load += mtu.energy()
-        return load
+        return self._snapshot.gateway_time
+
+    def _build_snapshot(self) -> TedSnapshot:
+        """Decode the fetched endpoint data into a snapshot."""
+        if self.snapshot is not None and self._unchanged(
+            ("endpoint_data_results", None)
+        ):
+            return self.snapshot.replace(timestamp=time.time())
 
-    def production(self) -> EnergyYield:
-        """Return generation information for the whole system."""
+        data = self.endpoint_data_results
+        mtu_energy = {mtu.position: self._decode_mtu_energy(mtu) for mtu in self.mtus}
+        mtu_power = {mtu.position: self._decode_mtu_power(mtu) for mtu in self.mtus}
+
+        load = EnergyYield(0, 0, 0)
         gen = EnergyYield(0, 0, 0)
         for mtu in self.mtus:
-            if mtu.type == MtuType.GENERATION:
-                gen += mtu.energy()
-        return gen
+            if mtu.type == MtuType.LOAD:
+                load += mtu_energy[mtu.position]
+            elif mtu.type == MtuType.GENERATION:
+                gen += mtu_energy[mtu.position]
+
+        return TedSnapshot(
+            time.time(),
+            data.gateway_time,
+            data.total,
+            load,
+            gen,
+            mtu_energy,
+            mtu_power,
+            {},
+        )
 
-    def _mtu_energy(self, mtu: TedMtu) -> EnergyYield:
+    def _decode_mtu_energy(self, mtu: TedMtu) -> EnergyYield:
         """Return consumption or production information for a MTU."""
-        data = self.endpoint_data_results["LiveData"]
-        power_now = int(data["Power"]["MTU%d" % mtu.position]["PowerNow"])
-        power_tdy = int(data["Power"]["MTU%d" % mtu.position]["PowerTDY"])
-        power_mtd = int(data["Power"]["MTU%d" % mtu.position]["PowerMTD"])
+        energy = self.endpoint_data_results.mtus[mtu.position].energy
         if mtu.type == MtuType.GENERATION:
-            return EnergyYield(-power_now, -power_tdy, -power_mtd)
-        return EnergyYield(power_now, power_tdy, power_mtd)
+            return EnergyYield(-energy.now, -energy.daily, -energy.mtd)
+        return energy
 
-    def _mtu_power(self, mtu: TedMtu) -> Power:
+    def _decode_mtu_power(self, mtu: TedMtu) -> Power:
         """Return power information for a MTU."""
-        data = self.endpoint_data_results["LiveData"]
-        power_now = int(data["Power"]["MTU%d" % mtu.position]["PowerNow"])
-        ap_power = int(data["Power"]["MTU%d" % mtu.position]["KVA"])
+        data = self.endpoint_data_results.mtus[mtu.position]
+        power_now = data.energy.now
+        ap_power = data.apparent_power
         power_factor = 0.0
         if ap_power != 0:
             power_factor = round(((power_now / ap_power) * 100), 1)
-        voltage = int(data["Voltage"]["MTU%d" % mtu.position]["VoltageNow"]) / 10
+        voltage = data.voltage / 10
         return Power(ap_power, power_factor, voltage)
 
     def _parse_mtu_type(self, mtu_type: int) -> MtuType:
@@ -112,8 +127,11 @@ class TED5000(TED):
         return switcher.get(mtu_type, MtuType.STAND_ALONE)
 
     def _parse_mtus(self) -> None:
-        """Fill the list of MTUs with MTUs parsed from the xml data."""
-        self.mtus = []
+        """Fill the list of MTUs with MTUs parsed from the xml data.
+
+        MTUs whose settings didn't change are kept.
+        """
+        mtus = []
 
         num_mtus = int(self.endpoint_settings_results["SystemSettings"]["NumberMTU"])
         mtu_settings = self.endpoint_settings_results["SystemSettings"]["MTUs"]["MTU"]
@@ -121,12 +139,13 @@ class TED5000(TED):
         for mtu_doc in mtu_settings[0:num_mtus]:
             mtu_number = int(mtu_doc["MTUNumber"])
             mtu = TedMtu(
-                mtu_doc["MTUID"],
+                intern_str(mtu_doc["MTUID"]),
                 mtu_number,
-                mtu_doc["MTUDescription"],
+                intern_str(mtu_doc["MTUDescription"]),
                 self._parse_mtu_type(int(solar_settings["SolarConfig%d" % mtu_number])),
                 int(mtu_doc["PowerCalibrationFactor"]),
                 int(mtu_doc["VoltageCalibrationFactor"]),
                 self,
             )
-            self.mtus.append(mtu)
+            mtus.append(mtu)
+        self.mtus = reuse_equal(self.mtus, mtus)
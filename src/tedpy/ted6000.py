@@ -1,7 +1,9 @@
 """Implementation for the TED6000 meter."""
-import asyncio
+import time
 from datetime import datetime
-from typing import Any, Dict
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from xml.parsers.expat import ExpatError
 
 import httpx
 
@@ -10,12 +12,21 @@ from .dataclasses import (
     MtuType,
     Power,
     SystemType,
-    TedCt,
     TedCtGroup,
     TedMtu,
     TedSpyder,
+    intern_str,
+    reuse_equal,
+    shared_ct,
 )
-from .ted import TED
+from .parsers import (
+    parse_dash_data,
+    parse_spyder_data,
+    parse_system_overview,
+    parse_xml,
+)
+from .snapshot import TedSnapshot
+from .ted import DEFAULT_CONFIG_TTL, PROBE_TIMEOUT, TED
 
 ENDPOINT_URL_SETTINGS = "http://{}/api/SystemSettings.xml"
 ENDPOINT_URL_RATE = "http://{}/api/Rate.xml"
@@ -24,13 +35,36 @@ ENDPOINT_URL_MTUDASHBOARD = "http://{}/api/DashData.xml?T=0&D=255&M={}"
 ENDPOINT_URL_MTU = "http://{}/api/SystemOverview.xml?T=0&D=0&M=0"
 ENDPOINT_URL_SPYDER = "http://{}/api/SpyderData.xml?T=0&M=0&D=0"
 
+# Consecutive polls in which the SystemOverview.xml and DashData.xml readings of
+# every MTU must agree before the per-MTU DashData.xml requests are dropped
+MATCHING_POLLS = 3
+
+
+class MtuEnergySource(Enum):
+    """Where the current power of each MTU is read from."""
+
+    AUTO = "auto"  # SystemOverview.xml, once it is seen to agree with DashData.xml
+    DASH_DATA = "dash_data"  # One DashData.xml request per MTU and poll
+    SYSTEM_OVERVIEW = "system_overview"  # SystemOverview.xml
+
+
+def _readings_match(overview: int, dash: int) -> bool:
+    """Return whether two power readings (in W) taken together agree."""
+    return abs(overview - dash) <= max(10, abs(dash) // 20)
+
 
 class TED6000(TED):
     """Instance of TED6000."""
 
-    def __init__(self, host: str, async_client: httpx.AsyncClient = None) -> None:
+    def __init__(
+        self,
+        host: str,
+        async_client: httpx.AsyncClient = None,
+        limits: httpx.Limits = None,
+        config_ttl: Optional[float] = DEFAULT_CONFIG_TTL,
+    ) -> None:
         """Init the TED6000."""
-        super().__init__(host, async_client)
+        super().__init__(host, async_client, limits, config_ttl)
 
         self.endpoint_settings_results: Any = None
         self.endpoint_rate_results: Any = None
@@ -38,35 +72,133 @@ class TED6000(TED):
         self.endpoint_spyder_results: Any = None
         self.endpoint_dash_results: Dict[int, Any] = dict()
         self.endpoint_mtudash_results: Dict[int, Any] = dict()
+        self._settings_prefetched = False
+        # With SystemOverview.xml as the source, the daily and month to date
+        # energy of the MTUs is refreshed from DashData.xml one MTU per poll.
+        self.mtu_energy_source = MtuEnergySource.AUTO
+        self._overview_energy = False
+        self._matching_polls = 0
+        self._next_mtu_dash = 0
+        # Whether the MTU energy of the snapshot was decoded with the overview
+        self._decoded_overview_energy = False
 
-    async def update(self) -> None:
-        """Fetch settings and power data from the endpoints."""
-        await asyncio.gather(
-            self._update_endpoint("endpoint_settings_results", ENDPOINT_URL_SETTINGS),
-            self._update_endpoint("endpoint_rate_results", ENDPOINT_URL_RATE),
-        )
+    async def _update_config(self) -> bool:
+        """Fetch settings from the endpoints, returning whether they changed."""
+        requests = [("endpoint_rate_results", ENDPOINT_URL_RATE, None, parse_xml)]
+        # Reuse the settings downloaded by check() the first time
+        if not self._settings_prefetched:
+            requests.append(
+                ("endpoint_settings_results", ENDPOINT_URL_SETTINGS, None, parse_xml)
+            )
+        # Rate.xml is only stored with the settings, since gateway_time()
+        # advances it by the time since the config was last updated
+        await self._update_endpoints(*requests, all_or_nothing=True)
+        self._settings_prefetched = False
+        # Rate.xml contains the current time, so only the settings are compared.
+        # Unchanged settings keep their parsed object, so the topology is only
+        # rebuilt if it wasn't built from the current one (even if an earlier
+        # refresh failed after the settings were fetched).
+        settings = self.endpoint_settings_results
+        if settings is self._topology_settings:
+            return False
+
+        with self._phase("topology"):
+            self._parse_mtus()
+            self._parse_spyders()
+        self._topology_settings = settings
+        # The firmware may have changed, so the endpoints are compared again
+        self._overview_energy = False
+        self._matching_polls = 0
+        return True
 
-        self._parse_mtus()
-        self._parse_spyders()
+    def _uses_overview_energy(self) -> bool:
+        """Return whether MTU power is read from SystemOverview.xml."""
+        if self.mtu_energy_source == MtuEnergySource.AUTO:
+            return self._overview_energy
+        return self.mtu_energy_source == MtuEnergySource.SYSTEM_OVERVIEW
 
-        # Fetch MTU/Spyder data results
-        await asyncio.gather(
-            self._update_endpoint("endpoint_mtu_results", ENDPOINT_URL_MTU),
-            self._update_endpoint("endpoint_spyder_results", ENDPOINT_URL_SPYDER),
-            self._update_endpoint("endpoint_dash_results", ENDPOINT_URL_DASHBOARD, 0),
-            self._update_endpoint("endpoint_dash_results", ENDPOINT_URL_DASHBOARD, 1),
-            self._update_endpoint("endpoint_dash_results", ENDPOINT_URL_DASHBOARD, 2),
+    def _mtu_dash_positions(self) -> List[int]:
+        """Return the MTUs whose DashData.xml is requested in this poll."""
+        if not self._uses_overview_energy() or not self.mtus:
+            return [mtu.position for mtu in self.mtus]
+        # Every MTU is fetched at least once, then one per poll in turn
+        self._next_mtu_dash = (self._next_mtu_dash + 1) % len(self.mtus)
+        positions = [self.mtus[self._next_mtu_dash].position]
+        for mtu in self.mtus:
+            if mtu.position not in self.endpoint_mtudash_results:
+                if mtu.position != positions[0]:
+                    positions.append(mtu.position)
+        return positions
+
+    async def _update_data(self) -> None:
+        """Fetch MTU and Spyder power data from the endpoints."""
+        positions = self._mtu_dash_positions()
+        await self._update_endpoints(
+            ("endpoint_mtu_results", ENDPOINT_URL_MTU, None, parse_system_overview),
+            ("endpoint_spyder_results", ENDPOINT_URL_SPYDER, None, parse_spyder_data),
+            *(
+                ("endpoint_dash_results", ENDPOINT_URL_DASHBOARD, d, parse_dash_data)
+                for d in range(3)
+            ),
             *(
-                self._update_endpoint(
-                    "endpoint_mtudash_results", ENDPOINT_URL_MTUDASHBOARD, mtu.position
+                (
+                    "endpoint_mtudash_results",
+                    ENDPOINT_URL_MTUDASHBOARD,
+                    position,
+                    parse_dash_data,
                 )
-                for mtu in self.mtus
-            )
+                for position in positions
+            ),
         )
+        if self.mtu_energy_source == MtuEnergySource.AUTO:
+            self._compare_mtu_sources(positions)
+
+    def _compare_mtu_sources(self, positions: List[int]) -> None:
+        """Choose the MTU power source from the readings fetched together.
+
+        SystemOverview.xml is used once every MTU read the same power in it
+        and in DashData.xml for MATCHING_POLLS consecutive polls, and
+        DashData.xml from when they disagree until they agree that long again
+        (the endpoints are fetched one after the other, so the load may change
+        in between).
+        """
+        errors = self._pending_errors
+        if ("endpoint_mtu_results", None) in errors:
+            return
+        compared = False
+        for position in positions:
+            if ("endpoint_mtudash_results", position) in errors:
+                continue
+            overview = self.endpoint_mtu_results.get(position)
+            dash = self.endpoint_mtudash_results[position].now
+            if overview is None or not _readings_match(overview.value, dash):
+                self._overview_energy = False
+                self._matching_polls = 0
+                return
+            compared = compared or dash != 0  # Idle MTUs match trivially
+        if compared and not self._overview_energy:
+            self._matching_polls += 1
+            if self._matching_polls >= MATCHING_POLLS:
+                self._overview_energy = True
 
-    async def check(self) -> bool:
-        """Check if the required endpoint are accessible."""
-        return await self._check_endpoint(ENDPOINT_URL_SETTINGS)
+    async def check(self, timeout: float = PROBE_TIMEOUT) -> bool:
+        """Check if the settings endpoint is accessible and is from a TED6000."""
+        url = ENDPOINT_URL_SETTINGS.format(self.host)
+        response = await self._async_fetch_with_retry(url, attempts=1, timeout=timeout)
+        if response.status_code >= 300:
+            return False
+        try:
+            settings = parse_xml(response.text)
+        except ExpatError:
+            return False
+        # The TED5000 also serves SystemSettings.xml, but without Configuration
+        if "Configuration" not in (settings.get("SystemSettings") or {}):
+            return False
+
+        self.endpoint_settings_results = settings
+        self._cache_response(url, response, settings)
+        self._settings_prefetched = True
+        return True
 
     @property
     def gateway_id(self) -> str:
@@ -82,17 +214,24 @@ class TED6000(TED):
 
     def gateway_time(self) -> datetime:
         timestamp = int(self.endpoint_rate_results["Rate"]["Time"])
+        # Rate.xml is cached with the config, so advance its timestamp by the
+        # time that has passed since it was fetched.
+        if self._config_updated is not None:
+            timestamp += int(time.monotonic() - self._config_updated)
         return datetime.fromtimestamp(timestamp)
 
+    def rate(self) -> Dict[str, str]:
+        """Return the fields of Rate.xml, as reported by the gateway.
+
+        Which fields are present depends on the firmware and on the rate
+        plan configured; the gateway time is always included (as Time).
+        """
+        return dict(self.endpoint_rate_results["Rate"])
+
     @property
     def polling_delay(self) -> int:
         """Return the delay between successive polls of MTU data."""
-        return self.endpoint_settings_results["SystemSettings"]["MTUPollingDelay"]
-
-    def energy(self) -> EnergyYield:
-        """Return energy yield information for the whole system."""
-        data = self.endpoint_dash_results[0]["DashData"]
-        return EnergyYield(int(data["Now"]), int(data["TDY"]), int(data["MTD"]))
+        return int(self.endpoint_settings_results["SystemSettings"]["MTUPollingDelay"])
 
     @property
     def system_type(self) -> SystemType:
@@ -100,44 +239,85 @@ class TED6000(TED):
         settings = self.endpoint_settings_results["SystemSettings"]
         return SystemType(int(settings["Configuration"]["SystemType"]))
 
-    def _mtu_energy(self, mtu: TedMtu) -> EnergyYield:
+    def _build_snapshot(self) -> TedSnapshot:
+        """Decode the fetched endpoint data into a snapshot."""
+        energy = self.endpoint_dash_results[0]
+        if self.system_type == SystemType.NET:
+            consumption = energy  # For NET type, consumption and energy are equal
+        else:
+            consumption = self.endpoint_dash_results[1]
+        gen = self.endpoint_dash_results[2]
+
+        # Share the values decoded from endpoints that didn't change
+        previous = self.snapshot
+        mtu_energy: Mapping[int, EnergyYield]
+        mtu_sources: List[Tuple[str, Optional[int]]] = [
+            ("endpoint_mtudash_results", mtu.position) for mtu in self.mtus
+        ]
+        overview_energy = self._uses_overview_energy()
+        if overview_energy:
+            mtu_sources.append(("endpoint_mtu_results", None))
+        if (
+            previous is not None
+            and overview_energy == self._decoded_overview_energy
+            and self._unchanged(*mtu_sources)
+        ):
+            mtu_energy = previous.mtu_energy
+        else:
+            self._decoded_overview_energy = overview_energy
+            mtu_energy = {
+                mtu.position: self._decode_mtu_energy(mtu) for mtu in self.mtus
+            }
+
+        mtu_power: Mapping[int, Power]
+        if previous is not None and self._unchanged(("endpoint_mtu_results", None)):
+            mtu_power = previous.mtu_power
+        else:
+            mtu_power = {mtu.position: self._decode_mtu_power(mtu) for mtu in self.mtus}
+
+        ctgroup_energy: Mapping[Tuple[int, int], EnergyYield]
+        if previous is not None and self._unchanged(("endpoint_spyder_results", None)):
+            ctgroup_energy = previous.ctgroup_energy
+        else:
+            ctgroups = {}
+            for spyder in self.spyders:
+                for group in spyder.ctgroups:
+                    key = (group.spyder_position, group.position)
+                    ctgroups[key] = self._decode_ctgroup_energy(group)
+            ctgroup_energy = ctgroups
+
+        return TedSnapshot(
+            time.time(),
+            self.gateway_time(),
+            energy,
+            consumption,
+            EnergyYield(-gen.now, -gen.daily, -gen.mtd),
+            mtu_energy,
+            mtu_power,
+            ctgroup_energy,
+        )
+
+    def _decode_mtu_energy(self, mtu: TedMtu) -> EnergyYield:
         """Return consumption or production information for a MTU."""
-        data = self.endpoint_mtudash_results[mtu.position]["DashData"]
-        now, today, month = int(data["Now"]), int(data["TDY"]), int(data["MTD"])
+        energy = self.endpoint_mtudash_results[mtu.position]
+        if self._uses_overview_energy():
+            power = self.endpoint_mtu_results[mtu.position].value
+            energy = EnergyYield(power, energy.daily, energy.mtd)
         if mtu.type == MtuType.GENERATION:
             # Invert GEN-type MTUs
-            return EnergyYield(-now, -today, -month)
+            return EnergyYield(-energy.now, -energy.daily, -energy.mtd)
         else:
-            return EnergyYield(now, today, month)
-
-    def consumption(self) -> EnergyYield:
-        """Return load information for the whole system."""
-        if self.system_type == SystemType.NET:
-            return self.energy()  # For NET type, consumption and energy are equal
-        data = self.endpoint_dash_results[1]["DashData"]
-        return EnergyYield(int(data["Now"]), int(data["TDY"]), int(data["MTD"]))
+            return energy
 
-    def production(self) -> EnergyYield:
-        """Return generation information for the whole system."""
-        data = self.endpoint_dash_results[2]["DashData"]
-        return EnergyYield(-int(data["Now"]), -int(data["TDY"]), -int(data["MTD"]))
-
-    def _mtu_power(self, mtu: TedMtu) -> Power:
+    def _decode_mtu_power(self, mtu: TedMtu) -> Power:
         """Return power information for a MTU."""
-        mtu_doc = self.endpoint_mtu_results["DialDataDetail"]["MTUVal"][
-            "MTU%d" % mtu.position
-        ]
-        ap_power = int(mtu_doc["KVA"])
-        power_factor = int(mtu_doc["PF"]) / 10
-        voltage = int(mtu_doc["Voltage"]) / 10
-        return Power(ap_power, power_factor, voltage)
+        data = self.endpoint_mtu_results[mtu.position]
+        return Power(data.apparent_power, data.power_factor / 10, data.voltage / 10)
 
-    def _ctgroup_energy(self, ctgroup: TedCtGroup) -> EnergyYield:
+    def _decode_ctgroup_energy(self, ctgroup: TedCtGroup) -> EnergyYield:
         """Return energy yield information for a spyder ctgroup."""
-        data = self.endpoint_spyder_results["SpyderData"]["Spyder"][
-            ctgroup.spyder_position
-        ]["Group"][ctgroup.position]
-        return EnergyYield(int(data["Now"]), int(data["TDY"]), int(data["MTD"]))
+        spyder_data = self.endpoint_spyder_results
+        return spyder_data.groups[ctgroup.spyder_position][ctgroup.position]
 
     def _parse_mtu_type(self, mtu_type: int) -> MtuType:
         switcher = {
@@ -149,8 +329,11 @@ class TED6000(TED):
         return switcher.get(mtu_type, MtuType.STAND_ALONE)
 
     def _parse_mtus(self) -> None:
-        """Fill the list of MTUs with MTUs parsed from the xml data."""
-        self.mtus = []
+        """Fill the list of MTUs with MTUs parsed from the xml data.
+
+        MTUs whose settings didn't change are kept.
+        """
+        mtus = []
 
         num_mtus = int(self.endpoint_settings_results["SystemSettings"]["NumberMTU"])
         mtu_settings = self.endpoint_settings_results["SystemSettings"]["MTUs"]["MTU"]
@@ -160,19 +343,24 @@ class TED6000(TED):
         for mtu_doc in mtu_settings[0:num_mtus]:
             mtu_number = int(mtu_doc["MTUNumber"])
             mtu = TedMtu(
-                mtu_doc["MTUID"],
+                intern_str(mtu_doc["MTUID"]),
                 mtu_number,
-                mtu_doc["MTUDescription"],
+                intern_str(mtu_doc["MTUDescription"]),
                 self._parse_mtu_type(int(config_settings["MTUType%d" % mtu_number])),
                 int(mtu_doc["PowerCalibrationFactor"]) / 10,
                 int(mtu_doc["VoltageCalibrationFactor"]) / 10,
                 self,
             )
-            self.mtus.append(mtu)
+            mtus.append(mtu)
+        self.mtus = reuse_equal(self.mtus, mtus)
 
     def _parse_spyders(self) -> None:
-        """Fill the list of Spyders with Spyders parsed from the xml data."""
-        self.spyders = []
+        """Fill the list of Spyders with Spyders parsed from the xml data.
+
+        Spyders and ctgroups whose settings didn't change are kept.
+        """
+        previous = self.spyders
+        spyders = []
         spyder_settings = self.endpoint_settings_results["SystemSettings"]["Spyders"][
             "Spyder"
         ]
@@ -190,7 +378,7 @@ class TED6000(TED):
                 )
 
             ct_list = [
-                TedCt(i, doc["Description"], int(doc["Type"]), int(doc["Mult"]))
+                shared_ct(i, doc["Description"], int(doc["Type"]), int(doc["Mult"]))
                 for i, doc in enumerate(spyder_doc["CT"])
             ]
 
@@ -206,10 +394,13 @@ class TED6000(TED):
                         TedCtGroup(
                             ctgroup_count,
                             spyder_count,
-                            group_doc["Description"],
+                            intern_str(group_doc["Description"]),
                             group_cts,
                             self,
                         )
                     )
 
-            self.spyders.append(spyder)
+            if spyder_count < len(previous):
+                reuse_equal(previous[spyder_count].ctgroups, spyder.ctgroups)
+            spyders.append(spyder)
+        self.spyders = reuse_equal(previous, spyders)
@@ -0,0 +1,53 @@
+"""Fixtures and builders shared by the tests."""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Tuple
+
+import respx
+from httpx import Response
+
+from tedpy.dataclasses import EnergyYield, Power
+from tedpy.snapshot import TedSnapshot
+
+FIXTURES = Path(__file__).parent / "fixtures"
+MIDNIGHT = 1_700_006_400.0  # 2023-11-15 00:00 UTC
+
+
+def load_fixture(version: str, name: str) -> str:
+    """Return the text of a fixture of a TED model."""
+    return (FIXTURES / version / name).read_text()
+
+
+def mock_ted5000() -> None:
+    """Mock the endpoints of a TED5000 with the fixtures (in a respx mock)."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=load_fixture("ted5000", "systemSettings.xml"))
+    )
+    respx.get("/api/LiveData.xml").mock(
+        return_value=Response(200, text=load_fixture("ted5000", "liveData.xml"))
+    )
+
+
+def gateway_time(timestamp: float) -> datetime:
+    """Return the time of a gateway (without timezone) set to UTC."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def make_snapshot(
+    timestamp: float,
+    energy: EnergyYield,
+    mtu_energy: Dict[int, EnergyYield],
+    mtu_power: Dict[int, Power],
+    ctgroup_energy: Dict[Tuple[int, int], EnergyYield],
+) -> TedSnapshot:
+    """Return a snapshot of a gateway on UTC, consuming energy."""
+    return TedSnapshot(
+        timestamp,
+        gateway_time(timestamp),
+        energy,
+        energy,
+        EnergyYield(0, 0, 0),
+        mtu_energy,
+        mtu_power,
+        ctgroup_energy,
+    )
@@ -0,0 +1,74 @@
+import pytest
+import respx
+from helpers import load_fixture, mock_ted5000
+from httpx import Response
+
+from tedpy import TED5000, TED6000, EnergyTable
+from tedpy.dataclasses import EnergyYield, MtuType, SystemType
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_group_mtus() -> None:
+    """Verify MTU rows are summed per type and gateway."""
+    mock_ted5000()
+    teds = [TED5000("127.0.0.1"), TED5000("127.0.0.2"), TED5000("127.0.0.3")]
+    for ted in teds[:2]:
+        await ted.update()
+        await ted.close()
+
+    table = EnergyTable.from_mtus(teds)
+    assert len(table) == 8  # The TED that wasn't updated is skipped
+
+    by_type = table.group_by("mtu_type")
+    assert by_type[MtuType.LOAD] == EnergyYield(2 * 6278, 2 * 30456, 2 * 237250)
+    assert sum(by_type.values(), EnergyYield(0, 0, 0)) == table.total()
+
+    by_gateway = table.group_by("gateway")
+    assert list(by_gateway) == ["127.0.0.1", "127.0.0.2"]
+    assert by_gateway["127.0.0.1"] == EnergyTable.from_mtus(teds[0]).total()
+    assert table.group_by("system_type") == {SystemType.NET: table.total()}
+
+    with pytest.raises(ValueError):
+        table.group_by("now")
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_group_ctgroups() -> None:
+    """Verify ctgroup rows are summed per custom tag."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=load_fixture("ted6000", "systemSettings.xml"))
+    )
+    respx.get("/api/Rate.xml").mock(
+        return_value=Response(200, text=load_fixture("ted6000", "rate.xml"))
+    )
+    respx.get("/api/SystemOverview.xml").mock(
+        return_value=Response(200, text=load_fixture("ted6000", "systemOverview.xml"))
+    )
+    respx.get("/api/SpyderData.xml").mock(
+        return_value=Response(200, text=load_fixture("ted6000", "spyderData.xml"))
+    )
+    respx.get(url__regex=r"/api/DashData.xml").mock(
+        return_value=Response(200, text=load_fixture("ted6000", "dashData_total.xml"))
+    )
+    ted = TED6000("127.0.0.1")
+    await ted.update()
+    await ted.close()
+
+    assert ted.snapshot is not None
+    energies = ted.snapshot.ctgroup_energy
+    table = EnergyTable.from_ctgroups(
+        ted, tags={("127.0.0.1", 0, 0): "kitchen", ("127.0.0.1", 0, 1): "kitchen"}
+    )
+    assert len(table) == len(energies)
+
+    by_tag = table.group_by("tag")
+    assert by_tag["kitchen"] == energies[(0, 0)] + energies[(0, 1)]
+    assert sum(by_tag.values(), EnergyYield(0, 0, 0)) == table.total()
+
+    # Rows can also be grouped by any function of the row index
+    by_spyder = table.group_by(lambda row: table.position[row][0])
+    assert by_spyder[0] == sum(
+        (e for (spyder, _), e in energies.items() if spyder == 0), EnergyYield(0, 0, 0)
+    )
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import pytest
+import respx
+from helpers import MIDNIGHT, gateway_time, mock_ted5000
+
+from tedpy import TED5000, TedAnalytics
+from tedpy.analytics import RunningStats
+from tedpy.dataclasses import EnergyYield
+
+
+def test_running_stats() -> None:
+    """Verify the rate, EWMA and windowed maximum of a series."""
+    stats = RunningStats(ewma_seconds=1e-9, max_seconds=1.5, demand_interval=900)
+    stats.add(MIDNIGHT, EnergyYield(1000, 500, 9000))
+    assert stats.stats().ewma == 1000
+    stats.add(MIDNIGHT + 36, EnergyYield(3000, 520, 9020))
+    assert stats.stats().rate == pytest.approx(2000)
+    assert stats.stats().ewma == pytest.approx(3000)
+    assert stats.stats().max == 3000
+    stats.add(MIDNIGHT + 37, EnergyYield(2000, 520, 9020))
+    stats.add(MIDNIGHT + 38, EnergyYield(1000, 520, 9020))
+    assert stats.stats().max == 2000  # 3000 left the window
+    stats.add(MIDNIGHT + 38, EnergyYield(9000, 520, 9020))
+    assert stats.stats().power == 1000  # Samples that are not newer are ignored
+
+    stats = RunningStats(ewma_seconds=10, max_seconds=60, demand_interval=900)
+    stats.add(MIDNIGHT, EnergyYield(0, 0, 0))
+    stats.add(MIDNIGHT + 10, EnergyYield(1000, 0, 0))
+    assert stats.stats().ewma == pytest.approx(1000 * (1 - 1 / 2.718281828))
+
+
+def test_demand_and_rollover() -> None:
+    """Verify demand intervals, daily and monthly peaks and costs."""
+    stats = RunningStats(ewma_seconds=60, max_seconds=60, demand_interval=900)
+    start = MIDNIGHT - 900
+    stats.add(start, EnergyYield(0, 10000, 50000), 0, gateway_time(start))
+    # 500 Wh in the first interval, and 100 Wh in the one after
+    stats.add(start + 600, EnergyYield(0, 10400, 50400), 0.5, gateway_time(start))
+    stats.add(start + 1200, EnergyYield(0, 10600, 50600), 0.5, gateway_time(start))
+    result = stats.stats()
+    assert result.demand == pytest.approx(2000)
+    assert result.peak_demand_day == result.peak_demand_month == result.demand
+    assert result.cost_today == pytest.approx(0.3)
+    assert result.cost_month == pytest.approx(0.3)
+
+    # The gateway resets the daily energy at midnight
+    stats.add(start + 1800, EnergyYield(0, 50, 50650), 0.5, gateway_time(MIDNIGHT))
+    result = stats.stats()
+    assert result.rate == pytest.approx(50 * 6)
+    assert result.demand == pytest.approx(100 * 4)  # The interval before midnight
+    assert result.peak_demand_day == 0
+    assert result.peak_demand_month == pytest.approx(2000)
+    assert result.cost_today == pytest.approx(0.025)
+    assert result.cost_month == pytest.approx(0.325)
+
+    # And the month to date energy on the first of the month
+    stats.add(start + 1900, EnergyYield(0, 10, 10), 0.5, datetime(2023, 12, 1))
+    result = stats.stats()
+    assert result.peak_demand_month == 0
+    assert result.cost_month == result.cost_today == pytest.approx(0.005)
+
+
+def test_peaks_after_midnight() -> None:
+    """Verify the daily peak only holds the intervals of the new day."""
+    stats = RunningStats(ewma_seconds=60, max_seconds=60, demand_interval=900)
+    for timestamp in range(int(MIDNIGHT) - 1770, int(MIDNIGHT) + 1800, 150):
+        if timestamp < MIDNIGHT:  # 9000 W before midnight, 120 W after
+            daily = 10000 + 9000 * (timestamp - (MIDNIGHT - 1800)) / 3600
+        else:
+            daily = 120 * (timestamp - MIDNIGHT) / 3600
+        energy = EnergyYield(0, round(daily), 50000 + round(daily))
+        stats.add(timestamp, energy, 0, gateway_time(timestamp))
+        if timestamp > MIDNIGHT:
+            assert stats.peak_demand_day <= 120
+            # Less the energy between the last sample and midnight, which is lost
+            assert stats.peak_demand_month == pytest.approx(8700)
+    assert stats.peak_demand_day == pytest.approx(120, rel=0.05)
+
+
+def test_decreasing_series() -> None:
+    """Verify generation and exporting series decrease without rolling over."""
+    stats = RunningStats(ewma_seconds=60, max_seconds=60, demand_interval=900)
+    today = gateway_time(MIDNIGHT)
+    stats.add(MIDNIGHT, EnergyYield(-1000, -500, -9000), 0, today)
+    stats.add(MIDNIGHT + 450, EnergyYield(-2000, -700, -9200), 0.5, today)
+    stats.add(MIDNIGHT + 900, EnergyYield(-2000, -950, -9450), 0.5, today)
+    result = stats.stats()
+    assert result.rate == pytest.approx(-2000)
+    assert result.demand == pytest.approx(-450 * 4)
+    assert result.cost_today == result.cost_month == pytest.approx(-0.225)
+
+    # An exporting net series turning back to importing
+    stats.add(MIDNIGHT + 1350, EnergyYield(500, -900, -9400), 0.5, today)
+    result = stats.stats()
+    assert result.rate == pytest.approx(400)
+    assert result.cost_today == result.cost_month == pytest.approx(-0.2)
+
+    # Only a new day of the gateway's clock is a rollover
+    tomorrow = gateway_time(MIDNIGHT + 86400)
+    stats.add(MIDNIGHT + 86400, EnergyYield(-100, -10, -9410), 0.5, tomorrow)
+    result = stats.stats()
+    assert result.cost_today == pytest.approx(-0.005)
+    assert result.cost_month == pytest.approx(-0.205)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_update_feeds_analytics() -> None:
+    """Verify every snapshot of a TED updates its analytics."""
+    mock_ted5000()
+    prices = iter([0.1, 0.2])
+    async with TED5000("127.0.0.1") as reader:
+        reader.analytics = TedAnalytics(price=lambda: next(prices))
+        await reader.update()
+        await reader.update(max_age=0)
+
+    analytics = reader.analytics
+    assert analytics.system.stats().power == reader.energy().now
+    assert sorted(analytics.mtus) == [mtu.position for mtu in reader.mtus]
+    assert analytics.mtu(1).power == reader.mtus[0].energy().now
+    assert analytics.mtu(1).max == reader.mtus[0].energy().now
+    assert analytics.system.stats().cost_today == 0  # Same energy in both
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from tedpy import TED6000, MetricsExporter, TedFleet
+from tedpy.simulator import SimulatedGateway
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.mark.asyncio
+async def test_render() -> None:
+    """Verify every reading is rendered, grouped by family."""
+    async with SimulatedGateway(FIXTURES, "TED6000", mtus=2, seed=1) as gateway:
+        async with TED6000(gateway.address) as reader:
+            exporter = MetricsExporter([reader, TED6000("127.0.0.2")])
+            assert exporter.render() == exporter.render()  # No snapshots yet
+            await reader.update()
+            text = exporter.render().decode()
+
+            mtu = reader.mtus[1]
+            assert (
+                'ted_mtu_power_watts{{gateway="{}",mtu="2",description="{}"}} {}\n'.format(
+                    reader.host, mtu.description, mtu.energy().now
+                )
+                in text
+            )
+            group = reader.spyders[0].ctgroups[1]
+            assert (
+                'ted_ctgroup_energy_month_watthours{{gateway="{}",spyder="0",'
+                'group="1",description="{}"}} {}\n'.format(
+                    reader.host, group.description, group.energy().mtd
+                )
+                in text
+            )
+            assert text.endswith("# EOF\n")
+            assert exporter.render() is exporter.render()  # Nothing changed
+            families = [
+                line.split()[2] for line in text.splitlines() if "# TYPE" in line
+            ]
+            assert len(families) == len(set(families))
+
+            # The labels are rendered again when the topology changes
+            mtu.description = 'Main "A"'
+            assert 'description="Main \\"A\\""' not in exporter.render().decode()
+            reader.mtus = list(reader.mtus)
+            assert 'description="Main \\"A\\""' in exporter.render().decode()
+
+
+@pytest.mark.asyncio
+async def test_serve_fleet() -> None:
+    """Verify the metrics of a fleet are served over HTTP."""
+    async with SimulatedGateway(FIXTURES, "TED5000", seed=1) as gateway:
+        address = gateway.address
+        async with TedFleet([address], jitter=False) as fleet:
+            await fleet.__anext__()
+            async with MetricsExporter(fleet=fleet) as exporter:
+                async with httpx.AsyncClient() as client:
+                    url = "http://{}/metrics".format(exporter.address)
+                    response = await client.get(url)
+                    missing = await client.get(url.replace("metrics", "other"))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/openmetrics-text")
+    assert 'ted_power_watts{{gateway="{}",kind="net"}}'.format(address) in response.text
+    assert missing.status_code == 404
@@ -0,0 +1,63 @@
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+from httpx import Response
+
+from tedpy import TED5000, TedFleet
+
+
+def _load_fixture(version: str, name: str) -> str:
+    with open(Path(__file__).parent / "fixtures" / version / name, "r") as read_in:
+        return read_in.read()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_fleet() -> None:
+    """Verify every gateway is polled and failures are reported per host."""
+    in_flight = 0
+    max_seen = 0
+
+    async def live_data(request: httpx.Request) -> Response:
+        nonlocal in_flight, max_seen
+        in_flight += 1
+        max_seen = max(max_seen, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+
+    for host in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+        respx.get("http://%s/api/SystemSettings.xml" % host).mock(
+            return_value=Response(
+                200, text=_load_fixture("ted5000", "systemSettings.xml")
+            )
+        )
+        respx.get("http://%s/api/LiveData.xml" % host).mock(side_effect=live_data)
+    respx.route(host="10.0.0.4").mock(side_effect=httpx.ConnectError("unreachable"))
+
+    hosts = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"]
+    results = []
+    async with TedFleet(hosts, interval=0.05, max_in_flight=2) as fleet:
+        async for result in fleet:
+            results.append(result)
+            if len(results) == 12:
+                break
+
+    assert max_seen <= 2
+    assert {r.host for r in results} == set(hosts)
+    for result in results:
+        if result.host == "10.0.0.4":
+            assert isinstance(result.error, httpx.ConnectError)
+            assert result.snapshot is None
+        else:
+            assert result.error is None
+            assert isinstance(result.ted, TED5000)
+            assert result.snapshot is not None
+            assert result.snapshot.energy.now == 9632
+
+    assert fleet.stats["10.0.0.4"].errors == fleet.stats["10.0.0.4"].polls
+    assert fleet.stats["10.0.0.1"].errors == 0
+    assert fleet.stats["10.0.0.1"].mean_latency > 0
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from tedpy.dataclasses import EnergyYield, Power
+from tedpy.history import ENERGY_COLUMNS, Bucket, SeriesBuffer, TedHistory
+from tedpy.snapshot import TedSnapshot
+
+
+def _filled_buffer(capacity: int, count: int) -> SeriesBuffer:
+    buffer = SeriesBuffer(capacity, ENERGY_COLUMNS)
+    for i in range(count):
+        buffer.append(float(i), i, i * 10, i * 100)
+    return buffer
+
+
+def test_ring_buffer_wraps() -> None:
+    buffer = _filled_buffer(4, 6)
+
+    assert len(buffer) == 4
+    window = buffer.window()
+    assert len(window) == 4
+    assert [list(s) for s in window.segments("now")] == [[2, 3], [4, 5]]
+    assert list(window.column("timestamp")) == [2.0, 3.0, 4.0, 5.0]
+    assert list(buffer.latest(2).column("mtd")) == [400, 500]
+
+
+def test_window_by_time() -> None:
+    buffer = _filled_buffer(8, 10)
+
+    window = buffer.window(start=3.5, end=7)
+    assert list(window.column("now")) == [4, 5, 6]
+    # Contiguous windows are views into the underlying arrays
+    assert isinstance(window.column("now"), memoryview)
+    assert len(buffer.window(start=20)) == 0
+
+
+def test_downsample() -> None:
+    buffer = _filled_buffer(16, 10)
+
+    assert buffer.window().downsample("now", 4) == [
+        Bucket(0.0, 0, 3, 1.5, 4),
+        Bucket(4.0, 4, 7, 5.5, 4),
+        Bucket(8.0, 8, 9, 8.5, 2),
+    ]
+
+
+def test_history_append() -> None:
+    history = TedHistory(10)
+    for i in range(3):
+        history.append(
+            TedSnapshot(
+                float(i),
+                datetime(2021, 1, 1),
+                EnergyYield(i, 2, 3),
+                EnergyYield(0, 0, 0),
+                EnergyYield(0, 0, 0),
+                {1: EnergyYield(i, 5, 6)},
+                {1: Power(100, 97.5, 120.0)},
+                {(0, 1): EnergyYield(7, 8, i)},
+            )
+        )
+
+    assert list(history.system.window().column("now")) == [0, 1, 2]
+    assert list(history.mtu(1).window().column("voltage")) == [120.0] * 3
+    assert list(history.ctgroup(0, 1).window().column("mtd")) == [0, 1, 2]
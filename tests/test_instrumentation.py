@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+from httpx import Response
+
+from tedpy import (
+    TED5000,
+    TED6000,
+    HistogramInstrumentation,
+    MultiInstrumentation,
+    SpanInstrumentation,
+)
+from tedpy.simulator import SimulatedGateway
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.mark.asyncio
+async def test_histograms() -> None:
+    """Verify every request and phase of an update is measured."""
+    histograms = HistogramInstrumentation()
+    spans = SpanInstrumentation()
+    async with SimulatedGateway(FIXTURES, "TED6000", seed=1) as gateway:
+        reader = TED6000(gateway.address)
+        reader.instrumentation = MultiInstrumentation(histograms, spans)
+        await reader.update()
+        await reader.close()
+
+    for phase in ("update", "config", "topology", "derive"):
+        assert histograms.histogram(phase).count == 1
+    dash = histograms.histogram("fetch", "/api/DashData.xml")
+    assert dash.count == 3 + len(reader.mtus)
+    assert 0 < dash.quantile(0.5) <= dash.max
+    assert histograms.histogram("wait", "/api/DashData.xml").count == dash.count
+    assert histograms.histogram("parse", "/api/SpyderData.xml").count == 1
+    settings_bytes = histograms.histogram("bytes", "/api/SystemSettings.xml")
+    assert settings_bytes.min > 1000
+    assert settings_bytes.bounds[0] == 1
+    assert settings_bytes.min <= settings_bytes.quantile(0.5) <= settings_bytes.max
+
+    fetch_spans = [s for s in spans.spans if s.name == "GET /api/SpyderData.xml"]
+    assert len(fetch_spans) == 1
+    assert fetch_spans[0].attributes["http.response.status_code"] == 200
+    assert fetch_spans[0].start_time <= fetch_spans[0].end_time
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_retries_and_errors() -> None:
+    """Verify retries and failed requests are counted."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(
+            200, text=(FIXTURES / "ted5000" / "systemSettings.xml").read_text()
+        )
+    )
+    live_data = respx.get("/api/LiveData.xml").mock(
+        side_effect=[
+            httpx.ConnectError("refused"),
+            Response(200, text=(FIXTURES / "ted5000" / "liveData.xml").read_text()),
+            httpx.ConnectError("refused"),
+            httpx.ConnectError("refused"),
+            httpx.ConnectError("refused"),
+        ]
+    )
+    histograms = HistogramInstrumentation()
+    reader = TED5000("127.0.0.1")
+    reader.instrumentation = histograms
+    await reader.update()
+    with pytest.raises(httpx.ConnectError):
+        await reader.update()
+    await reader.close()
+
+    assert live_data.call_count == 5
+    assert histograms.retries["/api/LiveData.xml"] == 3
+    assert histograms.errors["/api/LiveData.xml"] == 1
+    assert histograms.histogram("fetch", "/api/LiveData.xml").count == 2
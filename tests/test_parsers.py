@@ -0,0 +1,88 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+import xmltodict
+
+from tedpy import parsers
+from tedpy.dataclasses import EnergyYield
+
+
+def _load_fixture(version: str, name: str) -> str:
+    with open(Path(__file__).parent / "fixtures" / version / name, "r") as read_in:
+        return read_in.read()
+
+
+@pytest.mark.parametrize(
+    "parse,fallback,version,name",
+    [
+        (
+            parsers.parse_live_data,
+            parsers._dict_live_data,
+            "ted5000",
+            "liveData.xml",
+        ),
+        (
+            parsers.parse_dash_data,
+            parsers._dict_dash_data,
+            "ted6000",
+            "dashData_total.xml",
+        ),
+        (
+            parsers.parse_system_overview,
+            parsers._dict_system_overview,
+            "ted6000",
+            "systemOverview.xml",
+        ),
+        (
+            parsers.parse_spyder_data,
+            parsers._dict_spyder_data,
+            "ted6000",
+            "spyderData.xml",
+        ),
+    ],
+)
+def test_fast_parser_matches_fallback(
+    parse: object, fallback: object, version: str, name: str
+) -> None:
+    text = _load_fixture(version, name)
+    assert parse(text) == fallback(xmltodict.parse(text))  # type: ignore
+
+
+def test_spyder_data() -> None:
+    data = parsers.parse_spyder_data(_load_fixture("ted6000", "spyderData.xml"))
+
+    assert data.total == EnergyYield(3298, 35794, 944072)
+    assert len(data.groups) == 4
+    assert data.groups[0][1] == EnergyYield(568, 4672, 96045)
+
+
+def test_unknown_schema_falls_back_to_xmltodict() -> None:
+    @parsers._with_fallback(lambda doc: doc["Doc"]["Value"])
+    def parse(root: Any) -> str:
+        raise ValueError("unexpected schema")
+
+    assert parse("<Doc><Value>1</Value></Doc>") == "1"
+
+
+def test_empty_values_are_zero() -> None:
+    text = "<DashData><Now>1</Now><TDY></TDY><MTD>3</MTD></DashData>"
+    assert parsers.parse_dash_data(text) == EnergyYield(1, 0, 3)
+
+
+@pytest.mark.parametrize(
+    "parse,text",
+    [
+        (parsers.parse_dash_data, "<DashData><Now2>5</Now2></DashData>"),
+        (parsers.parse_spyder_data, "<SpyderData2><Spyder/></SpyderData2>"),
+        (
+            parsers.parse_system_overview,
+            "<DialDataDetail><MTUVal><MTU1><Value2>5</Value2></MTU1></MTUVal>"
+            "</DialDataDetail>",
+        ),
+    ],
+)
+def test_missing_fields_are_not_zero(parse: Any, text: str) -> None:
+    """Verify missing fields fail both parsers, rather than decoding as zeros."""
+    with pytest.raises(KeyError):
+        parse(text)
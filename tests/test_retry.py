@@ -0,0 +1,106 @@
+import asyncio
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+from httpx import Request, Response
+
+from tedpy import (
+    TED5000,
+    TED6000,
+    CircuitOpenError,
+    HistogramInstrumentation,
+    RetryPolicy,
+)
+from tedpy.simulator import SimulatedGateway
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _fixture(version: str, name: str) -> str:
+    return (FIXTURES / version / name).read_text()
+
+
+@pytest.mark.asyncio
+async def test_deadline() -> None:
+    """Verify an update against a slow gateway fails at the deadline."""
+    async with SimulatedGateway(FIXTURES, "TED5000", latency=1.0) as gateway:
+        reader = TED5000(gateway.address)
+        reader.retry_policy = RetryPolicy(deadline=0.2)
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await reader.update()
+        assert time.monotonic() - start < 0.5
+        await reader.close()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_retry_status_and_circuit_breaker() -> None:
+    """Verify unavailable responses are retried and failures open the breaker."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_fixture("ted5000", "systemSettings.xml"))
+    )
+    live_data = respx.get("/api/LiveData.xml").mock(
+        side_effect=[
+            Response(503),
+            Response(200, text=_fixture("ted5000", "liveData.xml")),
+            httpx.ConnectError("refused"),
+            httpx.ConnectError("refused"),
+        ]
+    )
+    reader = TED5000("127.0.0.1")
+    reader.retry_policy = RetryPolicy(
+        attempts=2, backoff=0, failure_threshold=1, reset_timeout=60
+    )
+    await reader.update()
+    assert live_data.call_count == 2
+    assert reader.circuit_breaker is not None
+    assert reader.circuit_breaker.state == "closed"
+
+    with pytest.raises(httpx.ConnectError):
+        await reader.update()
+    assert reader.circuit_breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await reader.update()
+    assert live_data.call_count == 4
+    await reader.close()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_hedged_dash_data() -> None:
+    """Verify a slow DashData request is hedged by a second one."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_fixture("ted6000", "systemSettings.xml"))
+    )
+    respx.get("/api/Rate.xml").mock(
+        return_value=Response(200, text=_fixture("ted6000", "rate.xml"))
+    )
+    respx.get("/api/SystemOverview.xml").mock(
+        return_value=Response(200, text=_fixture("ted6000", "systemOverview.xml"))
+    )
+    respx.get("/api/SpyderData.xml").mock(
+        return_value=Response(200, text=_fixture("ted6000", "spyderData.xml"))
+    )
+    calls = []
+
+    async def dash_data(request: Request) -> Response:
+        calls.append(request.url.params["D"])
+        if calls.count("0") == 1 and request.url.params["D"] == "0":
+            await asyncio.sleep(5)  # The first request for the total hangs
+        return Response(200, text=_fixture("ted6000", "dashData_total.xml"))
+
+    respx.get(url__regex=r"/api/DashData.xml").mock(side_effect=dash_data)
+    reader = TED6000("127.0.0.1")
+    reader.retry_policy = RetryPolicy(hedge_after=0.05)
+    reader.instrumentation = HistogramInstrumentation()
+    start = time.monotonic()
+    await reader.update()
+    await reader.close()
+
+    assert time.monotonic() - start < 1
+    assert calls.count("0") == 2
+    assert reader.instrumentation.hedges["/api/DashData.xml"] == 1
@@ -0,0 +1,84 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from tedpy import HashRing, ShardedFleet, WorkerError
+from tedpy.dataclasses import EnergyYield, Power
+from tedpy.fleet import FleetResult
+from tedpy.sharding import (
+    decode_result,
+    decode_snapshot,
+    encode_result,
+    encode_snapshot,
+)
+from tedpy.simulator import start_gateways
+from tedpy.snapshot import TedSnapshot
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_hash_ring() -> None:
+    """Verify removing a node only moves the keys it had."""
+    hosts = ["10.0.{}.{}".format(i // 256, i % 256) for i in range(2000)]
+    ring = HashRing(range(4))
+    smaller = HashRing(range(3))
+    counts = [0] * 4
+    for host in hosts:
+        node = ring.node(host)
+        counts[node] += 1
+        if node != 3:
+            assert smaller.node(host) == node
+    assert min(counts) > 2000 / 4 * 0.7
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_encode_snapshot() -> None:
+    """Verify snapshots and results survive their binary form."""
+    snapshot = TedSnapshot(
+        1_700_000_000.25,
+        datetime(2023, 11, 14, 23, 13, 20),
+        EnergyYield(3313, 35684, 943962),
+        EnergyYield(1591, 22846, 705341),
+        EnergyYield(-438, -1845, -9688),
+        {0: EnergyYield(1, 2, 3), 2: EnergyYield(4, 5, 6)},
+        {0: Power(10, 97.3, 121.5), 2: Power(0, 0.0, 0.0)},
+        {(0, 1): EnergyYield(7, 8, 9), (1, 0): EnergyYield(0, 0, 0)},
+    )
+    data = encode_snapshot(snapshot)
+    assert len(data) < 200
+    decoded = decode_snapshot(data)
+    for field in TedSnapshot.__slots__:
+        assert getattr(decoded, field) == getattr(snapshot, field)
+
+    result = decode_result(encode_result(FleetResult("h", None, snapshot, None, 0.5)))
+    assert (result.host, result.latency) == ("h", 0.5)
+    assert result.snapshot is not None
+    assert result.snapshot.mtu_power == snapshot.mtu_power
+    error = ValueError("Host is not a supported TED device.")
+    result = decode_result(encode_result(FleetResult("h", None, None, error, 1.0)))
+    assert isinstance(result.error, WorkerError)
+    assert str(result.error) == "ValueError: Host is not a supported TED device."
+
+
+@pytest.mark.asyncio
+async def test_sharded_fleet() -> None:
+    """Verify workers poll their shards and send the results back."""
+    gateways = await start_gateways(4, templates=FIXTURES, model="TED6000")
+    hosts = [gateway.address for gateway in gateways]
+    try:
+        async with ShardedFleet(hosts, workers=2, interval=0.05) as fleet:
+            assert sorted(sum(fleet.shards, [])) == sorted(hosts)
+            seen = set()
+            async for result in fleet:
+                assert result.error is None
+                assert result.snapshot is not None
+                assert len(result.snapshot.mtu_energy) == 3
+                seen.add(result.host)
+                if len(seen) == len(hosts):
+                    break
+        assert all(fleet.stats[host].polls >= 1 for host in hosts)
+    finally:
+        for gateway in gateways:
+            await gateway.close()
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from tedpy import TED5000, TED6000, MtuEnergySource, createTED
+from tedpy.simulator import SimulatedGateway
+from tedpy.ted6000 import MATCHING_POLLS
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("model", ["TED5000", "TED6000"])
+async def test_simulated_gateway(model: str) -> None:
+    """Verify the TED classes can poll a simulated gateway over HTTP."""
+    async with SimulatedGateway(FIXTURES, model, mtus=2, spyders=2, seed=1) as gw:
+        reader = await createTED(gw.address)
+        await reader.update()
+        await reader.close()
+
+    assert isinstance(reader, TED5000 if model == "TED5000" else TED6000)
+    assert [mtu.description for mtu in reader.mtus][:1] == [
+        "Pan 1" if model == "TED5000" else "Panel1"
+    ]
+    assert reader.snapshot is not None
+    assert len(reader.snapshot.mtu_energy) == 2
+    if model == "TED6000":
+        assert [len(spyder.ctgroups) for spyder in reader.spyders] == [6, 6]
+        assert reader.energy() == reader.consumption()
+    assert gw.requests["/api/SystemSettings.xml"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_injected_failures() -> None:
+    """Verify failures are injected and unknown documents aren't found."""
+    async with SimulatedGateway(FIXTURES, failure_rate=1.0) as gateway:
+        async with httpx.AsyncClient() as client:
+            url = "http://{}/api/Rate.xml".format(gateway.address)
+            assert (await client.get(url)).status_code == 500
+
+    gateway = SimulatedGateway(FIXTURES, "TED5000")
+    assert gateway.render("/api/Rate.xml") is None
+    assert "<LiveData>" in (gateway.render("/api/LiveData.xml") or "")
+    with pytest.raises(ValueError):
+        SimulatedGateway(FIXTURES, mtus=5)
+
+
+async def _requests_per_poll(
+    gateway: SimulatedGateway, reader: TED6000, polls: int
+) -> float:
+    before = sum(gateway.requests.values())
+    for _ in range(polls):
+        await reader.update()
+    return (sum(gateway.requests.values()) - before) / polls
+
+
+@pytest.mark.asyncio
+async def test_mtu_energy_from_system_overview() -> None:
+    """Verify per-MTU DashData requests are dropped once SystemOverview agrees."""
+    async with SimulatedGateway(FIXTURES, "TED6000", mtus=4, seed=1) as gateway:
+        async with TED6000(gateway.address) as reader:
+            assert isinstance(reader, TED6000)
+            await reader.update()  # Fetches the config
+            assert (
+                await _requests_per_poll(gateway, reader, MATCHING_POLLS - 1) == 5 + 4
+            )
+            assert await _requests_per_poll(gateway, reader, 8) == 5 + 1
+            overview = reader.endpoint_mtu_results[1]
+            assert reader.mtus[0].energy().now == overview.value
+            assert reader.mtus[0].energy().daily > 0
+
+            reader.mtu_energy_source = MtuEnergySource.DASH_DATA
+            assert await _requests_per_poll(gateway, reader, 2) == 5 + 4
+
+
+@pytest.mark.asyncio
+async def test_mtu_energy_source_recovers_from_mismatch() -> None:
+    """Verify SystemOverview is used again once it agrees after a mismatch."""
+    async with SimulatedGateway(FIXTURES, "TED6000", mtus=4, seed=1) as gateway:
+        async with TED6000(gateway.address) as reader:
+            assert isinstance(reader, TED6000)
+            await _requests_per_poll(gateway, reader, MATCHING_POLLS + 1)
+            assert await _requests_per_poll(gateway, reader, 1) == 5 + 1
+
+            # The load changed between the requests of one poll
+            dash_data = gateway._routes["/api/DashData.xml"]
+            gateway._routes["/api/DashData.xml"] = lambda query: dash_data(
+                query
+            ).replace("<Now>", "<Now>9", 1)
+            await reader.update()
+            gateway._routes["/api/DashData.xml"] = dash_data
+
+            assert await _requests_per_poll(gateway, reader, MATCHING_POLLS) == 5 + 4
+            assert await _requests_per_poll(gateway, reader, 2) == 5 + 1
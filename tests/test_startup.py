@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import tedpy
+
+
+def _loaded_after(code: str) -> str:
+    """Return the modules among httpx, xmltodict and asyncio loaded by code."""
+    check = "; import sys; print(sorted({'httpx', 'xmltodict', 'asyncio'} & set(sys.modules)))"
+    return subprocess.run(
+        [sys.executable, "-c", code + check],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    ).stdout.strip()
+
+
+def test_lazy_imports() -> None:
+    """Verify the HTTP client and XML parser are only loaded when needed."""
+    assert (
+        _loaded_after(
+            "import tedpy; tedpy.EnergyYield; tedpy.TedSnapshot; tedpy.TedHistory; "
+            "tedpy.EnergyTable; "
+            "import tedpy.formatting"
+        )
+        == "[]"
+    )
+    assert "'httpx'" in _loaded_after("from tedpy import TED6000")
+    assert (
+        _loaded_after("from tedpy.parsers import parse_xml; parse_xml('<a/>')")
+        == "['xmltodict']"
+    )
+
+
+def test_public_names() -> None:
+    """Verify every public name can be imported and is listed."""
+    for name in tedpy.__all__:
+        assert getattr(tedpy, name) is not None
+    assert set(tedpy.__all__) <= set(dir(tedpy))
+    assert "createTED" in dir(tedpy)
@@ -0,0 +1,125 @@
+import struct
+from pathlib import Path
+
+import pytest
+import respx
+from helpers import MIDNIGHT, make_snapshot, mock_ted5000
+
+from tedpy import TED5000, ReadingLog, TedAnalytics
+from tedpy.dataclasses import EnergyYield, Power
+from tedpy.snapshot import TedSnapshot
+from tedpy.storage import CTGROUP, MAGIC, MTU, RECORD, SYSTEM
+
+
+def _snapshot(timestamp: float, now: int) -> TedSnapshot:
+    energy = EnergyYield(now, 2 * now, 3 * now)
+    return make_snapshot(
+        timestamp,
+        energy,
+        {1: energy, 2: energy},
+        {1: Power(now, 97.3, 121.5), 2: Power(0, 0.0, 0.0)},
+        {(0, 0): energy},
+    )
+
+
+def test_append_and_query(tmp_path: Path) -> None:
+    """Verify records are buffered, split per day and queried by time."""
+    log = ReadingLog(tmp_path, flush_bytes=30 * RECORD.size, flush_interval=3600)
+    for second in range(-5, 5):
+        log.append("10.0.0.1:80", _snapshot(MIDNIGHT + second, second + 10))
+    log.append("10.0.0.2", _snapshot(MIDNIGHT, 1))
+    # Only the records of the first day were written, when the day changed
+    files = sorted(p.name for p in (tmp_path / "10.0.0.1_80").iterdir())
+    assert files == ["20231114.tedlog"]
+    assert not (tmp_path / "10.0.0.2").exists()
+
+    records = list(log.query("10.0.0.1:80", MIDNIGHT - 1, MIDNIGHT + 2))
+    assert len(records) == 3 * 4
+    assert {record.timestamp for record in records} == {
+        MIDNIGHT - 1,
+        MIDNIGHT,
+        MIDNIGHT + 1,
+    }
+    assert [r.kind for r in records[:5]] == [SYSTEM, MTU, MTU, CTGROUP, SYSTEM]
+    mtu = records[1]
+    assert (mtu.position, mtu.now, mtu.daily, mtu.mtd) == (1, 9, 18, 27)
+    assert (mtu.apparent_power, mtu.power_factor, mtu.voltage) == (9, 97.3, 121.5)
+
+    systems = list(log.query("10.0.0.1:80", kind=SYSTEM))
+    assert [r.now for r in systems] == list(range(5, 15))
+    assert list(log.query("10.0.0.1:80", MIDNIGHT + 10)) == []
+    assert list(log.query("unknown")) == []
+    partial = log.query("10.0.0.1:80")
+    next(partial)
+    partial.close()  # Releases the memory map
+    log.close()
+    assert log.gateways() == ["10.0.0.1_80", "10.0.0.2"]
+
+    # A partly written record is ignored
+    path = tmp_path / "10.0.0.2" / "20231115.tedlog"
+    assert path.read_bytes().startswith(MAGIC)
+    with open(path, "ab") as file:
+        file.write(b"\0" * 7)
+    assert len(list(ReadingLog(tmp_path).query("10.0.0.2"))) == 4
+
+
+def test_negative_power_factor(tmp_path: Path) -> None:
+    """Verify the power factor of a generating MTU keeps its sign."""
+    log = ReadingLog(tmp_path)
+    snapshot = _snapshot(MIDNIGHT, -5).replace(
+        mtu_power={1: Power(500, -85.2, 120.0), 2: Power(0, 0.0, 0.0)}
+    )
+    log.append("10.0.0.1", snapshot)
+    mtu = list(log.query("10.0.0.1", kind=MTU))[0]
+    assert (mtu.apparent_power, mtu.power_factor, mtu.voltage) == (500, -85.2, 120.0)
+
+
+def test_out_of_range_readings(tmp_path: Path) -> None:
+    """Verify out of range power factors are clamped, and bad snapshots dropped."""
+    log = ReadingLog(tmp_path)
+    snapshot = _snapshot(MIDNIGHT, 5).replace(
+        mtu_power={1: Power(1, 5000.0, 120.0), 2: Power(1, -5000.0, 120.0)}
+    )
+    log.append("10.0.0.1", snapshot)
+    mtus = list(log.query("10.0.0.1", kind=MTU))
+    assert [mtu.power_factor for mtu in mtus] == [3276.7, -3276.8]
+
+    # A snapshot that can't be packed isn't partly logged
+    too_large = EnergyYield(2**40, 0, 0)
+    with pytest.raises(struct.error):
+        log.append("10.0.0.1", snapshot.replace(mtu_energy={1: too_large}))
+    assert len(list(log.query("10.0.0.1"))) == 4
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_update_writes_log(tmp_path: Path) -> None:
+    """Verify every snapshot of a TED is written to its log."""
+    mock_ted5000()
+    async with TED5000("127.0.0.1") as reader:
+        reader.reading_log = ReadingLog(tmp_path)
+        await reader.update()
+        await reader.update()
+
+    system = list(reader.reading_log.query("127.0.0.1", kind=SYSTEM))
+    assert [r.now for r in system] == [reader.energy().now] * 2
+    assert len(list(reader.reading_log.query("127.0.0.1", kind=MTU))) == 8
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_failing_log_does_not_fail_update(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Verify an error of the log is logged, and the other sinks still run."""
+    mock_ted5000()
+    directory = tmp_path / "log"
+    directory.write_text("")  # Not a directory, so writing fails
+    async with TED5000("127.0.0.1") as reader:
+        reader.reading_log = ReadingLog(directory, flush_bytes=0)
+        reader.analytics = TedAnalytics()
+        await reader.update()
+
+    assert reader.snapshot is not None
+    assert reader.analytics.system.timestamp == reader.snapshot.timestamp
+    assert "Error in the reading log of 127.0.0.1" in caplog.text
@@ -0,0 +1,74 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import respx
+from httpx import Response
+
+from tedpy import TED5000, Backpressure
+from tedpy.streaming import next_deadline
+
+
+def _load_fixture(version: str, name: str) -> str:
+    with open(Path(__file__).parent / "fixtures" / version / name, "r") as read_in:
+        return read_in.read()
+
+
+def _mock_ted5000() -> respx.Route:
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "systemSettings.xml"))
+    )
+    return respx.get("/api/LiveData.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+    )
+
+
+def test_next_deadline() -> None:
+    assert next_deadline(10.2, 0.5) == 10.5
+    assert next_deadline(10.5, 0.5) == 11.0
+
+
+@pytest.mark.parametrize("interval", [0, -1.0])
+def test_stream_rejects_non_positive_interval(interval: float) -> None:
+    reader = TED5000("127.0.0.1")
+    with pytest.raises(ValueError):
+        reader.stream(interval=interval)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_stream() -> None:
+    """Verify snapshots are yielded and slow consumers only see the latest."""
+    data = _mock_ted5000()
+
+    async with TED5000("127.0.0.1") as reader:
+        snapshots = []
+        stream = reader.stream(interval=0.01)
+        async for snapshot in stream:
+            snapshots.append(snapshot)
+            await asyncio.sleep(0.05)
+            if len(snapshots) == 3:
+                break
+        await stream.aclose()
+
+        assert snapshots[-1].energy.now == 9632
+        assert len({id(s) for s in snapshots}) == 3
+        # Polling continued while the consumer was sleeping
+        assert data.call_count > 3
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_stream_only_changed() -> None:
+    """Verify snapshots with unchanged readings are skipped."""
+    data = _mock_ted5000()
+
+    async with TED5000("127.0.0.1") as reader:
+        stream = reader.stream(
+            interval=0.01, backpressure=Backpressure.BLOCK, only_changed=True
+        )
+        await stream.__anext__()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(stream.__anext__(), 0.1)
+        await stream.aclose()
+        assert data.call_count > 2
@@ -0,0 +1,120 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+import respx
+from helpers import make_snapshot, mock_ted5000
+
+from tedpy import TED5000, ChangeEvent, TedSubscriptions
+from tedpy.dataclasses import EnergyYield, Power
+from tedpy.snapshot import TedSnapshot, diff_snapshots
+from tedpy.subscriptions import CTGROUP, MTU
+
+
+def _snapshot(timestamp: float, mtu_now: int, voltage: float) -> TedSnapshot:
+    energy = EnergyYield(mtu_now, 100, 1000)
+    return make_snapshot(
+        timestamp,
+        energy,
+        {0: energy, 1: EnergyYield(5, 6, 7)},
+        {0: Power(mtu_now, 97.3, voltage), 1: Power(5, 50.0, 120.0)},
+        {(0, 0): energy},
+    )
+
+
+class _Recorder:
+    def __init__(self, subscriptions: TedSubscriptions) -> None:
+        self.subscriptions = subscriptions
+        self.snapshot: Optional[TedSnapshot] = None
+
+    def publish(self, snapshot: TedSnapshot) -> None:
+        changes = diff_snapshots(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        self.subscriptions.publish(snapshot, changes)
+
+
+def test_filters() -> None:
+    """Verify deadbands, bands and wildcard subscriptions."""
+    subscriptions = TedSubscriptions()
+    recorder = _Recorder(subscriptions)
+    now: List[ChangeEvent] = []
+    voltage: List[ChangeEvent] = []
+    every: List[ChangeEvent] = []
+    subscriptions.mtu(0, "now", callback=now.append, deadband=50)
+    subscriptions.mtu(0, "voltage", callback=voltage.append, band=(114, 126))
+    subscription = subscriptions.ctgroup(None, None, "now", callback=every.append)
+    with pytest.raises(ValueError):
+        subscriptions.mtu(0, "current")
+
+    for timestamp, (mtu_now, volts) in enumerate(
+        [(1000, 120.0), (1040, 121.0), (1060, 127.5), (1100, 128.0), (1000, 125.0)]
+    ):
+        recorder.publish(_snapshot(timestamp, mtu_now, volts))
+
+    assert [(e.previous, e.value) for e in now] == [
+        (None, 1000),
+        (1000, 1060),
+        (1060, 1000),
+    ]
+    assert [(e.timestamp, e.value) for e in voltage] == [
+        (0, 120.0),
+        (2, 127.5),
+        (4, 125.0),
+    ]
+    assert [e.value for e in every] == [1000, 1040, 1060, 1100, 1000]
+    assert {(e.part, e.key, e.field) for e in every} == {(CTGROUP, (0, 0), "now")}
+
+    subscription.cancel()
+    subscription.cancel()
+    recorder.publish(_snapshot(5, 2000, 125.0))
+    assert len(every) == 5
+    assert now[-1].value == 2000
+
+
+def test_unchanged_parts_are_skipped() -> None:
+    """Verify only the parts listed as changed are looked at."""
+    subscriptions = TedSubscriptions()
+    recorder = _Recorder(subscriptions)
+    events: List[ChangeEvent] = []
+    subscriptions.subscribe(MTU, 1, "now", callback=events.append)
+    subscriptions.system("consumption_now", callback=events.append)
+    first = _snapshot(0, 1000, 120.0)
+    recorder.publish(first)
+    assert [e.field for e in events] == ["consumption_now", "now"]
+    second = first.replace(mtu_energy={**first.mtu_energy, 1: EnergyYield(9, 9, 9)})
+    subscriptions.publish(second, diff_snapshots(first, first))
+    assert len(events) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_iteration() -> None:
+    """Verify events can be iterated over until the subscription is cancelled."""
+    subscriptions = TedSubscriptions()
+    recorder = _Recorder(subscriptions)
+    subscription = subscriptions.system("now", max_queued=2)
+
+    async def consume() -> List[float]:
+        return [event.value async for event in subscription]
+
+    task = asyncio.ensure_future(consume())
+    for timestamp in range(4):
+        recorder.publish(_snapshot(timestamp, 1000 + timestamp, 120.0))
+    subscription.cancel()
+    assert await task == [1002, 1003]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_update_publishes_changes() -> None:
+    """Verify the subscriptions of a TED are checked after every update."""
+    mock_ted5000()
+    events: List[ChangeEvent] = []
+    async with TED5000("127.0.0.1") as reader:
+        reader.subscriptions = TedSubscriptions()
+        reader.subscriptions.mtu(None, "voltage", callback=events.append)
+        await reader.update()
+        await reader.update(max_age=0)
+
+    assert sorted((e.key, e.value) for e in events) == [
+        (mtu.position, mtu.power().voltage) for mtu in reader.mtus
+    ]
@@ -0,0 +1,60 @@
+import asyncio
+import concurrent.futures
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from tedpy import TED6000, EventLoopThread, SyncTED
+from tedpy.simulator import SimulatedGateway
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def loop() -> Iterator[EventLoopThread]:
+    loop = EventLoopThread()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def gateway(loop: EventLoopThread) -> Iterator[SimulatedGateway]:
+    gateway = SimulatedGateway(FIXTURES, "TED6000", latency=0.05)
+    loop.run(gateway.start())
+    yield gateway
+    loop.run(gateway.close())
+
+
+def test_sync_ted(loop: EventLoopThread, gateway: SimulatedGateway) -> None:
+    """Verify blocking updates from many threads share the loop and requests."""
+    with SyncTED(gateway.address, loop) as reader:
+        assert isinstance(reader.ted, TED6000)
+        assert reader.latest is None
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            snapshots = list(pool.map(lambda _: reader.update(), range(8)))
+        assert all(snapshot is snapshots[0] for snapshot in snapshots)
+        assert gateway.requests["/api/SystemOverview.xml"] == 1
+        assert reader.latest is snapshots[0]
+        assert reader.snapshot() is snapshots[0]
+        assert reader.snapshot(max_age=3600) is snapshots[0]
+        assert reader.snapshot(max_age=0) is not snapshots[0]
+        assert reader.ted._async_client is loop.client
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        loop.run(asyncio.sleep(1), timeout=0.01)
+
+
+def test_background_polling(loop: EventLoopThread, gateway: SimulatedGateway) -> None:
+    """Verify the TED is polled in the background until closed."""
+    reader = SyncTED(gateway.address, loop, poll_interval=0.01)
+    deadline = time.monotonic() + 5
+    while reader.latest is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reader.latest is not None
+    assert reader.error is None
+    reader.close()
+    polls = gateway.requests["/api/SystemOverview.xml"]
+    time.sleep(0.1)
+    assert gateway.requests["/api/SystemOverview.xml"] == polls
@@ -1,10 +1,20 @@
+import asyncio
+import operator
 from pathlib import Path
 
+import httpx
 import pytest
 import respx
-from httpx import Response
+from httpx import AsyncClient, Request, Response
 
-from tedpy import createTED
+from tedpy import (
+    TED5000,
+    TED6000,
+    ProbeCache,
+    ProbeCacheEntry,
+    RetryPolicy,
+    createTED,
+)
 from tedpy.dataclasses import EnergyYield, MtuType, SystemType, TedCt
 
 
@@ -89,6 +99,9 @@ async def test_ted_6000() -> None:
     respx.get("/api/SystemSettings.xml").mock(
         return_value=Response(200, text=_load_fixture("ted6000", "systemSettings.xml"))
     )
+    respx.get("/api/Rate.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "rate.xml"))
+    )
     respx.get("/api/SystemOverview.xml").mock(
         return_value=Response(200, text=_load_fixture("ted6000", "systemOverview.xml"))
     )
@@ -118,6 +131,8 @@ async def test_ted_6000() -> None:
     await reader.update()
 
     assert reader.system_type == SystemType.NET_GEN
+    assert isinstance(reader, TED6000)
+    assert reader.rate() == {"Time": "1635281047"}
 
     assert reader.energy().now == 3313
     assert reader.energy().daily == 35684
@@ -186,3 +201,416 @@ async def test_ted_6000() -> None:
     assert grp4.energy() == EnergyYield(0, 0, 10034)
     assert grp5.energy() == EnergyYield(473, 7968, 253156)
     assert grp6.energy() == EnergyYield(0, 0, 0)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_lifecycle() -> None:
+    """Verify the connection pool is reused and only owned clients are closed."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "systemSettings.xml"))
+    )
+    respx.get("/api/LiveData.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+    )
+
+    async with AsyncClient() as client:
+        reader = await createTED("127.0.0.1", client)
+        await reader.update()
+        await reader.close()
+        assert reader.async_client is client
+        assert not client.is_closed
+
+    async with TED5000("127.0.0.1") as reader:
+        await reader.update()
+        owned = reader.async_client
+        await reader.update()
+        assert reader.async_client is owned
+    assert owned.is_closed
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_config_cache() -> None:
+    """Verify settings are only refetched when the config is refreshed."""
+    settings = respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "systemSettings.xml"))
+    )
+    data = respx.get("/api/LiveData.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+    )
+
+    async with TED5000("127.0.0.1") as reader:
+        await reader.update()
+        mtus = reader.mtus
+        await reader.update()
+        assert settings.call_count == 1
+        assert data.call_count == 2
+        assert reader.mtus is mtus
+
+        # Unchanged settings don't rebuild the MTUs
+        await reader.refresh_config()
+        assert settings.call_count == 2
+        assert reader.mtus is mtus
+
+        settings.mock(
+            return_value=Response(
+                200,
+                text=_load_fixture("ted5000", "systemSettings.xml").replace(
+                    "Pan 1", "Panel 1"
+                ),
+            )
+        )
+        await reader.refresh_config()
+        assert settings.call_count == 3
+        assert reader.mtus is not mtus
+        assert reader.mtus[0].description == "Panel 1"
+
+    async with TED5000("127.0.0.1", config_ttl=0) as reader:
+        await reader.update()
+        await reader.update()
+        assert settings.call_count == 5
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_snapshot() -> None:
+    """Verify each update produces an immutable snapshot of the readings."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "systemSettings.xml"))
+    )
+    respx.get("/api/LiveData.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+    )
+
+    async with TED5000("127.0.0.1") as reader:
+        await reader.update()
+        first = reader.snapshot
+        assert first is not None
+        assert reader.previous_snapshot is None
+        assert first.energy == reader.energy()
+        assert first.mtu_energy[1] == reader.mtus[0].energy()
+        assert first.mtu_power[1] == reader.mtus[0].power()
+
+        with pytest.raises(AttributeError):
+            first.energy = EnergyYield(0, 0, 0)  # type: ignore
+        with pytest.raises(TypeError):
+            first.mtu_energy[1] = EnergyYield(0, 0, 0)  # type: ignore
+
+        await reader.update()
+        assert reader.previous_snapshot is first
+        assert reader.snapshot is not first
+
+
+def _mock_ted6000() -> None:
+    respx.get("/api/LiveData.xml").mock(return_value=Response(404, text=""))
+    respx.get("/api/Rate.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "rate.xml"))
+    )
+    respx.get("/api/SystemOverview.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "systemOverview.xml"))
+    )
+    respx.get("/api/SpyderData.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "spyderData.xml"))
+    )
+    respx.get(url__regex=r"/api/DashData.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "dashData_total.xml"))
+    )
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_probe_reuses_settings(tmp_path: Path) -> None:
+    """Verify the probe's settings are reused and the model is cached."""
+    _mock_ted6000()
+    settings = respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "systemSettings.xml"))
+    )
+
+    cache = ProbeCache(tmp_path / "probe_cache.json")
+    reader = await createTED("127.0.0.1", probe_cache=cache)
+    await reader.update()
+    await reader.close()
+    assert isinstance(reader, TED6000)
+    assert settings.call_count == 1
+    assert cache.get("127.0.0.1") == ProbeCacheEntry("TED6000", "1234")
+
+    # A new cache instance reads the entry back from disk, skipping detection
+    reader = await createTED(
+        "127.0.0.1", probe_cache=ProbeCache(tmp_path / "probe_cache.json")
+    )
+    await reader.close()
+    assert isinstance(reader, TED6000)
+    assert settings.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+@pytest.mark.parametrize("probe", [False, True])
+async def test_failed_first_config_refresh(probe: bool) -> None:
+    """Verify the topology is built once a failed config refresh succeeds."""
+    _mock_ted6000()
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "systemSettings.xml"))
+    )
+    respx.get("/api/Rate.xml").mock(
+        side_effect=[
+            httpx.ConnectError("refused"),
+            Response(200, text=_load_fixture("ted6000", "rate.xml")),
+        ]
+    )
+    if probe:
+        reader = await createTED("127.0.0.1")
+    else:
+        reader = TED6000("127.0.0.1")
+    reader.retry_policy = RetryPolicy(attempts=1)
+    with pytest.raises(httpx.ConnectError):
+        await reader.update()
+    await reader.update()
+    await reader.close()
+
+    assert len(reader.mtus) == 3
+    assert len(reader.spyders) == 1
+    assert reader.changes is not None and reader.changes.config
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_failed_config_refresh_stores_nothing() -> None:
+    """Verify a config refresh that fails partway keeps the previous config."""
+    _mock_ted6000()
+    settings_xml = _load_fixture("ted6000", "systemSettings.xml")
+    respx.get("/api/SystemSettings.xml").mock(
+        side_effect=[Response(200, text=settings_xml), httpx.ConnectError("refused")]
+    )
+    async with TED6000("127.0.0.1") as reader:
+        assert isinstance(reader, TED6000)
+        reader.retry_policy = RetryPolicy(attempts=1)
+        await reader.update()
+        rate = reader.rate()
+        respx.get("/api/Rate.xml").mock(
+            return_value=Response(200, text="<Rate><Time>1700000000</Time></Rate>")
+        )
+        with pytest.raises(httpx.ConnectError):
+            await reader.refresh_config()
+        assert reader.rate() == rate
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_probe_ted5000_settings_are_not_ted6000() -> None:
+    """Verify a TED5000's settings endpoint doesn't match the TED6000 probe."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "systemSettings.xml"))
+    )
+
+    async def slow_live_data(request: Request) -> Response:
+        await asyncio.sleep(0.05)
+        return Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+
+    respx.get("/api/LiveData.xml").mock(side_effect=slow_live_data)
+
+    reader = await createTED("127.0.0.1")
+    await reader.close()
+    assert isinstance(reader, TED5000)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_unchanged_endpoints() -> None:
+    """Verify unchanged endpoints are not decoded again and changes are reported."""
+    _mock_ted6000()
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "systemSettings.xml"))
+    )
+    mtu2_dash = _load_fixture("ted6000", "dashData_mtu2.xml")
+
+    def dash_data(request: Request) -> Response:
+        if request.url.params["M"] == "2":
+            return Response(200, text=mtu2_dash)
+        return Response(200, text=_load_fixture("ted6000", "dashData_total.xml"))
+
+    respx.get(url__regex=r"/api/DashData.xml").mock(side_effect=dash_data)
+
+    async with TED6000("127.0.0.1") as reader:
+        await reader.update()
+        assert reader.changes is not None and reader.changes.config
+        first = reader.snapshot
+        assert first is not None
+
+        await reader.update()
+        assert not reader.changes
+        assert reader.changed_endpoints == set()
+        assert reader.snapshot is not None
+        assert reader.snapshot.mtu_energy is first.mtu_energy
+        assert reader.snapshot.ctgroup_energy is first.ctgroup_energy
+
+        mtu2_dash = mtu2_dash.replace("<Now>5840</Now>", "<Now>5900</Now>")
+        await reader.update()
+        assert reader.changed_endpoints == {("endpoint_mtudash_results", 2)}
+        assert reader.changes.mtus == {2}
+        assert not reader.changes.system and not reader.changes.ctgroups
+        assert reader.mtus[1].energy().now == 5900
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_partial_updates() -> None:
+    """Verify failed endpoints keep their previous data in partial mode."""
+    _mock_ted6000()
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "systemSettings.xml"))
+    )
+    failing = {"1"}
+
+    def dash_data(request: Request) -> Response:
+        if request.url.params["M"] in failing:
+            raise httpx.ConnectError("refused")
+        return Response(200, text=_load_fixture("ted6000", "dashData_mtu2.xml"))
+
+    respx.get(url__regex=r"/api/DashData.xml").mock(side_effect=dash_data)
+
+    async with TED6000("127.0.0.1") as reader:
+        reader.retry_policy = RetryPolicy(attempts=1)
+        reader.partial_updates = True
+        # MTU 1 has never been fetched, so there is no data to fall back to
+        with pytest.raises(httpx.ConnectError):
+            await reader.update()
+
+        failing = set()
+        await reader.update()
+        assert reader.snapshot is not None
+        assert reader.snapshot.stale == {}
+        energy = reader.mtus[0].energy()
+
+        failing = {"1"}
+        await reader.update()
+        assert set(reader.endpoint_errors) == {("endpoint_mtudash_results", 1)}
+        assert reader.snapshot is not None
+        assert reader.snapshot.stale[("endpoint_mtudash_results", 1)] >= 0
+        assert reader.mtus[0].energy() == energy
+
+        reader.partial_updates = False
+        with pytest.raises(httpx.ConnectError):
+            await reader.update()
+
+        failing = set()
+        await reader.update()
+        assert reader.snapshot is not None
+        assert reader.snapshot.stale == {}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_coalesced_updates() -> None:
+    """Verify concurrent updates share their requests and fresh snapshots are kept."""
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted5000", "systemSettings.xml"))
+    )
+
+    async def live_data(request: Request) -> Response:
+        await asyncio.sleep(0.05)
+        return Response(200, text=_load_fixture("ted5000", "liveData.xml"))
+
+    route = respx.get("/api/LiveData.xml").mock(side_effect=live_data)
+
+    async with TED5000("127.0.0.1") as reader:
+        await asyncio.gather(*(reader.update() for _ in range(3)))
+        assert route.call_count == 1
+
+        await reader.update(max_age=60)
+        reader.max_age = 60
+        await reader.update()
+        assert route.call_count == 1
+
+        # Cancelling one caller doesn't cancel the update shared with another
+        reader.max_age = None
+        first = asyncio.ensure_future(reader.update())
+        second = asyncio.ensure_future(reader.update())
+        await asyncio.sleep(0)
+        first.cancel()
+        await second
+        assert first.cancelled()
+        assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_changes_survive_failed_update() -> None:
+    """Verify endpoints that changed in a failed update are decoded in the next."""
+    _mock_ted6000()
+    respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=_load_fixture("ted6000", "systemSettings.xml"))
+    )
+    mtu2_dash = _load_fixture("ted6000", "dashData_mtu2.xml")
+    failing = False
+
+    async def dash_data(request: Request) -> Response:
+        if request.url.params["M"] == "1" and failing:
+            await asyncio.sleep(0.05)
+            raise httpx.ConnectError("refused")
+        if request.url.params["M"] == "2":
+            return Response(200, text=mtu2_dash)
+        return Response(200, text=_load_fixture("ted6000", "dashData_total.xml"))
+
+    respx.get(url__regex=r"/api/DashData.xml").mock(side_effect=dash_data)
+
+    async with TED6000("127.0.0.1") as reader:
+        reader.retry_policy = RetryPolicy(attempts=1)
+        await reader.update()
+        energy = reader.mtus[1].energy()
+
+        failing = True
+        mtu2_dash = mtu2_dash.replace("<Now>5840</Now>", "<Now>5900</Now>")
+        with pytest.raises(httpx.ConnectError):
+            await reader.update()
+        # Nothing from the failed update is visible
+        assert reader.mtus[1].energy() == energy
+
+        failing = False
+        await reader.update()
+        assert reader.changed_endpoints == {("endpoint_mtudash_results", 2)}
+        assert reader.mtus[1].energy().now == 5900
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_topology_reuse() -> None:
+    """Verify unchanged parts of the topology are kept and CTs are shared."""
+    _mock_ted6000()
+    text = _load_fixture("ted6000", "systemSettings.xml")
+    settings = respx.get("/api/SystemSettings.xml").mock(
+        return_value=Response(200, text=text)
+    )
+
+    async with TED6000("127.0.0.1") as reader, TED6000("127.0.0.2") as other:
+        await reader.update()
+        await other.update()
+        mtus = list(reader.mtus)
+        groups = list(reader.spyders[0].ctgroups)
+        assert reader.spyders[0].ctgroups[0].member_cts[0] is (
+            other.spyders[0].ctgroups[0].member_cts[0]
+        )
+        assert not hasattr(mtus[0], "__dict__")
+
+        settings.mock(
+            return_value=Response(
+                200, text=text.replace("<Description>Obj2<", "<Description>Lights<")
+            )
+        )
+        await reader.refresh_config()
+        assert reader.mtus == mtus and all(map(operator.is_, reader.mtus, mtus))
+        new_groups = reader.spyders[0].ctgroups
+        assert new_groups[0] is groups[0]
+        assert new_groups[1] is not groups[1]
+        assert new_groups[1].description == "Lights"
+
+
+def test_energy_yield_arithmetic() -> None:
+    """Verify EnergyYields only add to and subtract from EnergyYields."""
+    assert EnergyYield(1, 2, 3) + EnergyYield(1, 1, 1) == EnergyYield(2, 3, 4)
+    assert EnergyYield(1, 2, 3) - EnergyYield(1, 1, 1) == EnergyYield(0, 1, 2)
+    with pytest.raises(ValueError):
+        EnergyYield(1, 2, 3) + (1, 1, 1)
+    with pytest.raises(ValueError):
+        EnergyYield(1, 2, 3) - 1